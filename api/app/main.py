@@ -3,7 +3,10 @@ import os
 import json
 import jwt
 import asyncio
+import atexit
 import logging
+import queue
+from logging.handlers import QueueHandler, QueueListener
 from typing import Dict, Set, Optional, List
 
 from fastapi import (
@@ -49,6 +52,34 @@ from .providers import twilio as twilio_provider
 from .providers import meta as meta_provider
 from .realtime import hub
 
+# -----------------------------
+# Logging dos serviços
+# -----------------------------
+# Loggers "app.*" (ex: app.services.automation_engine): nível via LOG_LEVEL (padrão INFO;
+# em produção WARNING corta os logs de ORDEM/delay dos pacotes).
+# Abaixo do nível, a mensagem nem é formatada (logs com %-args)
+_app_logger = logging.getLogger("app")
+_log_level_name = os.getenv("LOG_LEVEL", "INFO").upper()
+# Nível inválido (ex: LOG_LEVEL=verbose) não derruba o import: cai para INFO com aviso
+_log_level = logging.getLevelNamesMapping().get(_log_level_name)
+_app_logger.setLevel(_log_level if _log_level is not None else logging.INFO)
+if not _app_logger.handlers:
+    _log_handler = logging.StreamHandler()
+    # phone/trigger: lead e gatilho da automação em curso (AutomationContextFilter); "-" fora dela
+    _log_handler.setFormatter(logging.Formatter(
+        "%(levelname)s %(name)s [%(phone)s %(trigger)s]: %(message)s",
+        defaults={"phone": "-", "trigger": "-"},
+    ))
+    # Quem loga (corrotinas de envio) só enfileira; a escrita no stdout fica numa thread própria
+    _log_queue = queue.SimpleQueue()
+    _log_listener = QueueListener(_log_queue, _log_handler, respect_handler_level=True)
+    _log_listener.start()
+    atexit.register(_log_listener.stop)  # Escreve o que ainda estiver na fila ao sair
+    _app_logger.addHandler(QueueHandler(_log_queue))
+    _app_logger.propagate = False
+if _log_level is None:
+    _app_logger.warning("LOG_LEVEL inválido (%r); usando INFO", _log_level_name)
+
 # -----------------------------
 # App & CORS
 # -----------------------------
@@ -867,6 +898,45 @@ def seed_user_and_migrate():
     finally:
         db.close()
 
+
+@app.on_event("startup")
+def init_automation_audio_urls():
+    # Pré-resolve as URLs dos áudios das campanhas (BF / recuperação 50%) e das imagens do funil
+    from .services.automation_engine import init_audio_urls, campaign_audio_paths
+    from .services.funnel_packages import refresh_image_urls
+    init_audio_urls()
+    refresh_image_urls()
+    
+    # Confere no boot se os arquivos existem (o Twilio receberia 404 no envio)
+    for code, audio_path in campaign_audio_paths().items():
+        if not _find_file(audio_path.lstrip("/")):
+            logging.getLogger("uvicorn.error").warning(
+                f"[BOOT] ⚠️ Áudio de campanha '{code}' não encontrado: {audio_path}"
+            )
+
+
+_dead_letter_task: Optional[asyncio.Task] = None
+
+
+@app.on_event("startup")
+async def start_dead_letter_replay():
+    # Reenvia em background os envios de automação que falharam no Twilio
+    global _dead_letter_task
+    from .services.automation_engine import dead_letter_replay_loop
+    _dead_letter_task = asyncio.create_task(dead_letter_replay_loop())
+
+
+@app.on_event("shutdown")
+async def close_twilio_http_client():
+    # Espera os textos de campanha agendados e fecha o pool keep-alive com api.twilio.com
+    from .services.automation_engine import drain_pending_sends
+    from .services.funnel_packages import drain_pending_persists
+    if _dead_letter_task is not None:
+        _dead_letter_task.cancel()
+    await drain_pending_sends()
+    await drain_pending_persists()
+    await twilio_provider.aclose()
+
 # Endpoint manual caso queira rodar o fix on-demand
 @app.get("/debug/fix-threads-meta")
 def debug_fix_threads_meta(db: Session = Depends(get_db)):
@@ -877,6 +947,13 @@ def debug_fix_threads_meta(db: Session = Depends(get_db)):
         db.rollback()
         raise HTTPException(500, f"fix_failed: {e}")
 
+@app.get("/debug/reload-templates")
+def debug_reload_templates():
+    """Limpa os caches de templates/áudios e recalcula as URLs dos áudios de campanha"""
+    from .services.automation_engine import reload_templates
+    reload_templates()
+    return {"ok": True, "reloaded": True}
+
 @app.get("/debug/fix-contacts-table")
 def debug_fix_contacts_table(db: Session = Depends(get_db)):
     """Endpoint para executar migração de contacts manualmente"""
@@ -1363,11 +1440,9 @@ async def send_message(
         # Envia mensagem de encaminhamento
         takeover_msg = "Perfeita! 💖 Vou te passar com o time que cuida disso, tá bem? Um minutinho…"
         try:
-            import asyncio
-            from .providers import twilio as twilio_provider
             phone = (t.external_user_phone or "").strip()
             if phone:
-                await asyncio.to_thread(twilio_provider.send_text, phone, takeover_msg, "BOT")
+                await twilio_provider.send_text_async(phone, takeover_msg, "BOT")
         except Exception as e:
             print(f"[MESSAGE] Erro ao enviar mensagem de takeover: {e}")
         
@@ -1919,7 +1994,7 @@ async def twilio_webhook(req: Request, db: Session = Depends(get_db)):
         # Envia resposta imediata "Estou processando..."
         processing_msg = "📎 Recebi sua mídia. Estou analisando, um minuto..."
         try:
-            await asyncio.to_thread(twilio_provider.send_text, from_, processing_msg, "BOT")
+            await twilio_provider.send_text_async(from_, processing_msg, "BOT")
             logger.info(f"[WEBHOOK-TWILIO] Sent processing message to {from_}")
         except Exception as e:
             logger.error(f"[WEBHOOK-TWILIO] Error sending processing message: {str(e)}")
@@ -2115,7 +2190,7 @@ async def _process_message_for_llm(t: Thread, phone_to_send: str, full_content:
         # Envia mensagem de encaminhamento
         takeover_msg = "Perfeita! 💖 Vou te passar com o time que cuida disso, tá bem? Um minutinho…"
         try:
-            await asyncio.to_thread(twilio_provider.send_text, phone_to_send, takeover_msg, "BOT")
+            await twilio_provider.send_text_async(phone_to_send, takeover_msg, "BOT")
             logger.info(f"[WEBHOOK-TWILIO] ✅ Takeover ativado e mensagem enviada para thread {t.id}")
         except Exception as e:
             logger.error(f"[WEBHOOK-TWILIO] Erro ao enviar mensagem de takeover: {e}")
@@ -2436,7 +2511,7 @@ async def _process_message_for_llm(t: Thread, phone_to_send: str, full_content:
         # Tenta enviar mensagem de erro
         try:
             error_msg = "Desculpe, houve um problema técnico. Nossa equipe foi notificada."
-            await asyncio.to_thread(twilio_provider.send_text, phone_to_send, error_msg, "BOT")
+            await twilio_provider.send_text_async(phone_to_send, error_msg, "BOT")
         except:
             logger.error(f"[WEBHOOK-TWILIO] Failed to send error message too")
     
@@ -1,15 +1,35 @@
 # app/models.py
 from __future__ import annotations
 
+import json
+
 from sqlalchemy import (
     Column, Integer, String, Boolean, DateTime, ForeignKey, Text, func
 )
 from sqlalchemy.orm import declarative_base, relationship
-from sqlalchemy.types import JSON
+from sqlalchemy.types import JSON, TypeDecorator
 
 Base = declarative_base()
 
 
+class JSONDict(TypeDecorator):
+    """
+    JSON que já chega decodificado ao carregar.
+    Linhas antigas gravadas como string JSON são convertidas uma única vez no load,
+    então `thread.meta` é sempre dict (ou None) para quem lê.
+    """
+    impl = JSON
+    cache_ok = True
+
+    def process_result_value(self, value, dialect):
+        if isinstance(value, str):
+            try:
+                return json.loads(value)
+            except ValueError:
+                return {}
+        return value
+
+
 class User(Base):
     __tablename__ = "users"
 
@@ -39,7 +59,7 @@ class Thread(Base):
     lead_stage = Column(String(64), nullable=True, index=True)  # Etapa atual do funil
 
     # ⚠️ Coluna real no banco: "meta"
-    meta = Column(JSON, name="meta", nullable=True)
+    meta = Column(JSONDict, name="meta", nullable=True)
 
     user = relationship("User", back_populates="threads")
     messages = relationship("Message", back_populates="thread", cascade="all, delete-orphan")
@@ -220,3 +240,19 @@ class CartEvent(Base):
     created_at = Column(DateTime, server_default=func.now(), index=True)
 
     contact = relationship("Contact", backref="cart_events")
+
+
+class DeadLetter(Base):
+    """Envios de automação que falharam no Twilio - guardados para reenvio em background"""
+    __tablename__ = "dead_letters"
+
+    id = Column(Integer, primary_key=True)
+    phone = Column(String(64), nullable=False, index=True)
+    trigger = Column(String(64), nullable=False)  # ex: "Black Friday", "Recuperação 50% (Follow-up 2)"
+    kind = Column(String(16), nullable=False)  # "audio" ou "text"
+    content = Column(Text, nullable=False)  # URL do áudio ou texto da mensagem
+    error = Column(Text, nullable=True)  # Último erro do envio
+    attempts = Column(Integer, default=1, nullable=False)
+    created_at = Column(DateTime, server_default=func.now(), index=True)
+    last_attempt_at = Column(DateTime, server_default=func.now())
+    resolved_at = Column(DateTime, nullable=True, index=True)  # Preenchido quando o reenvio funciona
@@ -0,0 +1,43 @@
+# app/providers/rate_limit.py
+"""
+Limitador de taxa (token bucket) para envios assíncronos aos provedores de mensagem.
+Controla a vazão da conta inteira (todos os destinatários somados); a ordem e os delays
+de cada conversa continuam com quem envia.
+"""
+import asyncio
+import time
+
+
+class TokenBucket:
+    """
+    Token bucket assíncrono: libera em média `rate` tokens por segundo,
+    com rajada de até `capacity` tokens quando o balde está cheio.
+    Quem chama primeiro é atendido primeiro (asyncio.Lock é FIFO).
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        if rate <= 0 or capacity <= 0:
+            raise ValueError("rate e capacity devem ser positivos")
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        """Repõe os tokens acumulados desde a última leitura (até a capacidade)"""
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, tokens: float = 1) -> None:
+        """Espera até haver `tokens` disponíveis e os consome"""
+        if tokens > self.capacity:
+            raise ValueError(f"Pedido de {tokens} tokens excede a capacidade ({self.capacity})")
+        async with self._lock:
+            self._refill()
+            while self._tokens < tokens:
+                # Dorme só o necessário para o déficit ser reposto
+                await asyncio.sleep((tokens - self._tokens) / self.rate)
+                self._refill()
+            self._tokens -= tokens
@@ -2,8 +2,14 @@
 import os
 import time
 import re
+import asyncio
+from typing import Callable, Dict, Optional
+from urllib.parse import quote_plus
+import httpx
 from twilio.rest import Client
 
+from .rate_limit import TokenBucket
+
 # 🔧 Configurações de ambiente
 ACCOUNT_SID = os.getenv("TWILIO_ACCOUNT_SID")
 AUTH_TOKEN = os.getenv("TWILIO_AUTH_TOKEN")
@@ -20,6 +26,39 @@ if ACCOUNT_SID and AUTH_TOKEN:
     except Exception:
         pass
 
+# Remetente já no formato whatsapp:+55... (fixo no processo)
+FROM_WHATSAPP = FROM if FROM.startswith("whatsapp:") else f"whatsapp:{FROM}"
+
+# Cliente HTTP assíncrono (keep-alive com api.twilio.com), criado sob demanda e reutilizado
+TWILIO_API_BASE = "https://api.twilio.com/2010-04-01"
+_MESSAGES_PATH = f"/Accounts/{ACCOUNT_SID}/Messages.json"
+_async_client: Optional[httpx.AsyncClient] = None
+
+# Circuit breaker do envio assíncrono: após N falhas seguidas do Twilio (rede/5xx/429),
+# recusa envios na hora por alguns segundos em vez de esperar o timeout de cada um
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("TWILIO_CIRCUIT_THRESHOLD", "5"))
+CIRCUIT_RESET_SECONDS = float(os.getenv("TWILIO_CIRCUIT_RESET_SECONDS", "30"))
+_consecutive_failures = 0
+_circuit_open_until = 0.0
+
+
+# Vazão da conta no envio assíncrono (todos os destinatários somados): mídia tem limite
+# bem menor que texto no WhatsApp. Os delays por conversa (ordem de entrega) ficam nos pacotes
+MEDIA_BUCKET = TokenBucket(
+    rate=float(os.getenv("TWILIO_MEDIA_RATE", "1.4")),
+    capacity=float(os.getenv("TWILIO_MEDIA_BURST", "2")),
+)
+TEXT_BUCKET = TokenBucket(
+    rate=float(os.getenv("TWILIO_TEXT_RATE", "20")),
+    capacity=float(os.getenv("TWILIO_TEXT_BURST", "5")),
+)
+# Requisições simultâneas ao Twilio: o excedente espera aqui em vez de estourar o pool do httpx
+_SEND_SEMAPHORE = asyncio.Semaphore(int(os.getenv("TWILIO_MAX_IN_FLIGHT", "25")))
+
+
+class TwilioCircuitOpenError(RuntimeError):
+    """Envio recusado sem chamar o Twilio (circuito aberto após falhas consecutivas)"""
+
 
 def is_configured() -> bool:
     """Verifica se o Twilio está configurado corretamente"""
@@ -193,7 +232,7 @@ def send_text(to_e164: str, body: str, sender: str = "BOT") -> str:
         return ""
 
     to = _fmt_whatsapp(to_e164)
-    from_ = FROM if FROM.startswith("whatsapp:") else f"whatsapp:{FROM}"
+    from_ = FROM_WHATSAPP
 
     # Divide a mensagem se necessário
     chunks = _split_message(body, TWILIO_MAX_LENGTH)
@@ -259,7 +298,7 @@ def send_audio(to_e164: str, audio_url: str, sender: str = "BOT") -> str:
         return ""
 
     to = _fmt_whatsapp(to_e164)
-    from_ = FROM if FROM.startswith("whatsapp:") else f"whatsapp:{FROM}"
+    from_ = FROM_WHATSAPP
     
     print(f"\033[93m[TWILIO][send_audio]    to (formatado): {to}\033[0m")
     print(f"\033[93m[TWILIO][send_audio]    from: {from_}\033[0m")
@@ -285,8 +324,6 @@ def send_audio(to_e164: str, audio_url: str, sender: str = "BOT") -> str:
         return msg.sid
     except Exception as e:
         print(f"\033[91m[TWILIO][send_audio] ❌ ERRO ao enviar áudio: {str(e)}\033[0m")
-        import traceback
-        traceback.print_exc()
         raise
 
 
@@ -313,7 +350,7 @@ def send_image(to_e164: str, image_url: str, sender: str = "BOT", body: str = No
         return ""
 
     to = _fmt_whatsapp(to_e164)
-    from_ = FROM if FROM.startswith("whatsapp:") else f"whatsapp:{FROM}"
+    from_ = FROM_WHATSAPP
     
     try:
         # Constrói parâmetros da mensagem
@@ -337,6 +374,228 @@ def send_image(to_e164: str, image_url: str, sender: str = "BOT", body: str = No
         return msg.sid
     except Exception as e:
         print(f"\033[91m[TWILIO][send_image] ❌ ERRO ao enviar imagem: {str(e)}\033[0m")
-        import traceback
-        traceback.print_exc()
+        raise
+
+
+# ==================== ENVIO ASSÍNCRONO (REST DIRETO) ====================
+
+def _get_async_client() -> httpx.AsyncClient:
+    """Retorna o cliente HTTP assíncrono compartilhado (lazy singleton)"""
+    global _async_client
+    if _async_client is None or _async_client.is_closed:
+        _async_client = httpx.AsyncClient(
+            base_url=TWILIO_API_BASE,
+            auth=(ACCOUNT_SID, AUTH_TOKEN),
+            timeout=15.0,
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=50),
+        )
+    return _async_client
+
+
+async def aclose() -> None:
+    """Fecha o cliente HTTP assíncrono compartilhado (chamado no shutdown da API)"""
+    global _async_client
+    if _async_client is not None:
+        await _async_client.aclose()
+        _async_client = None
+
+
+_FORM_HEADERS = {"Content-Type": "application/x-www-form-urlencoded"}
+
+
+# Textos fixos já codificados (remetente + textos registrados pelos pacotes do funil).
+# Só constantes entram aqui: respostas da LLM/humanas e números de lead não ficam em memória
+_PRE_ENCODED: Dict[str, str] = {FROM_WHATSAPP: quote_plus(FROM_WHATSAPP)}
+
+
+def preencode_form_values(*values: str) -> None:
+    """Codifica uma vez textos fixos enviados com frequência (chamado no import de quem os define)"""
+    for value in values:
+        _PRE_ENCODED[value] = quote_plus(value)
+
+
+def _form_value(value: str) -> str:
+    """Valor codificado para o corpo x-www-form-urlencoded (mesma codificação do `data=` do httpx)"""
+    encoded = _PRE_ENCODED.get(value)
+    return encoded if encoded is not None else quote_plus(value)
+
+
+def _check_circuit() -> None:
+    """Falha rápido enquanto o circuito estiver aberto; após o intervalo deixa os envios tentarem de novo"""
+    if _consecutive_failures >= CIRCUIT_FAILURE_THRESHOLD and time.monotonic() < _circuit_open_until:
+        raise TwilioCircuitOpenError(
+            f"Twilio indisponível ({_consecutive_failures} falhas seguidas), envio recusado"
+        )
+
+
+def _record_result(failed: bool) -> None:
+    """Atualiza o contador de falhas seguidas e abre o circuito ao atingir o limite"""
+    global _consecutive_failures, _circuit_open_until
+    if not failed:
+        _consecutive_failures = 0
+        return
+    _consecutive_failures += 1
+    if _consecutive_failures >= CIRCUIT_FAILURE_THRESHOLD:
+        _circuit_open_until = time.monotonic() + CIRCUIT_RESET_SECONDS
+        print(f"\033[91m[TWILIO] ⛔ Circuito aberto por {CIRCUIT_RESET_SECONDS}s após {_consecutive_failures} falhas seguidas\033[0m")
+
+
+async def _create_message_async(
+    to: str,
+    from_: str,
+    body: str = None,
+    media_url: str = None,
+    on_send_start: Optional[Callable[[], None]] = None,
+) -> str:
+    """
+    Cria uma mensagem via API REST do Twilio sem bloquear o event loop.
+    Equivalente a `_client.messages.create(...)`. Retorna o SID da mensagem.
+    `on_send_start` é chamado quando a requisição sai de fato (depois da espera no rate limit).
+    
+    Raises:
+        TwilioCircuitOpenError: Se o circuito estiver aberto (nenhuma requisição é feita)
+    """
+    _check_circuit()
+    
+    fields = [("To", to), ("From", from_)]
+    if body:
+        fields.append(("Body", body))
+    if media_url:
+        fields.append(("MediaUrl", media_url))
+    content = "&".join(f"{key}={_form_value(value)}" for key, value in fields).encode("utf-8")
+    
+    await (MEDIA_BUCKET if media_url else TEXT_BUCKET).acquire()
+    # O circuito pode ter aberto enquanto a mensagem esperava na fila do rate limit
+    _check_circuit()
+    try:
+        async with _SEND_SEMAPHORE:
+            if on_send_start:
+                on_send_start()
+            resp = await _get_async_client().post(_MESSAGES_PATH, content=content, headers=_FORM_HEADERS)
+    except httpx.TransportError:
+        _record_result(failed=True)
+        raise
+    
+    # Só indisponibilidade do Twilio conta como falha (4xx de número inválido etc. não)
+    _record_result(failed=resp.status_code >= 500 or resp.status_code == 429)
+    resp.raise_for_status()
+    return resp.json()["sid"]
+
+
+async def send_text_async(to_e164: str, body: str, sender: str = "BOT") -> str:
+    """
+    Versão assíncrona de send_text (mesma divisão em partes e mesmos logs).
+    Usa conexão HTTP reaproveitada em vez de ocupar uma thread por envio.
+    Retorna o SID da primeira mensagem enviada.
+    """
+    if not is_configured():
+        print(f"\033[93m[TWILIO] ⚠️ Twilio não configurado. Mensagem não enviada: {body[:50]}...\033[0m")
+        return ""
+
+    to = _fmt_whatsapp(to_e164)
+    from_ = FROM_WHATSAPP
+
+    chunks = _split_message(body, TWILIO_MAX_LENGTH)
+    
+    if len(chunks) > 1:
+        print(f"\033[93m[TWILIO] Mensagem longa detectada ({len(body)} chars), dividindo em {len(chunks)} partes\033[0m")
+    
+    first_sid = None
+    
+    for i, chunk in enumerate(chunks):
+        try:
+            sid = await _create_message_async(to, from_, body=chunk)
+            
+            if first_sid is None:
+                first_sid = sid
+            
+            part_info = f" ({i+1}/{len(chunks)})" if len(chunks) > 1 else ""
+            if sender.upper() == "BOT":
+                print(f"\033[94m[TWILIO][BOT] → {to}{part_info} | SID={sid} | {len(chunk)} chars\033[0m")  # azul
+            else:
+                print(f"\033[92m[TWILIO][HUMANO] → {to}{part_info} | SID={sid} | {len(chunk)} chars\033[0m")  # verde
+            
+            # Mantém a ordem e o intervalo entre partes (sem bloquear o loop)
+            if i < len(chunks) - 1:
+                await asyncio.sleep(0.5)
+                
+        except Exception as e:
+            print(f"\033[91m[TWILIO] Erro ao enviar parte {i+1}/{len(chunks)}: {str(e)}\033[0m")
+            if i == 0:
+                raise
+    
+    return first_sid or ""
+
+
+async def send_audio_async(
+    to_e164: str,
+    audio_url: str,
+    sender: str = "BOT",
+    on_send_start: Optional[Callable[[], None]] = None,
+) -> str:
+    """
+    Versão assíncrona de send_audio.
+    
+    Args:
+        to_e164: Número do destinatário (formato E.164)
+        audio_url: URL pública do áudio (deve ser acessível pelo Twilio)
+        sender: "BOT" ou "HUMANO" (apenas para log)
+        on_send_start: Chamado quando a requisição sai (após a fila do rate limit);
+            usado para contar o delay até o próximo envio a partir do envio real
+    
+    Returns:
+        SID da mensagem enviada
+    """
+    if not is_configured():
+        print(f"\033[93m[TWILIO][send_audio] ⚠️ Twilio não configurado. Áudio não enviado.\033[0m")
+        return ""
+
+    to = _fmt_whatsapp(to_e164)
+    from_ = FROM_WHATSAPP
+
+    try:
+        sid = await _create_message_async(to, from_, media_url=audio_url, on_send_start=on_send_start)
+        
+        if sender.upper() == "BOT":
+            print(f"\033[94m[TWILIO][BOT] → {to} | ÁUDIO | SID={sid} | URL={audio_url}\033[0m")
+        else:
+            print(f"\033[92m[TWILIO][HUMANO] → {to} | ÁUDIO | SID={sid} | URL={audio_url}\033[0m")
+        
+        return sid
+    except Exception as e:
+        print(f"\033[91m[TWILIO][send_audio] ❌ ERRO ao enviar áudio: {str(e)}\033[0m")
+        raise
+
+
+async def send_image_async(to_e164: str, image_url: str, sender: str = "BOT", body: str = None) -> str:
+    """
+    Versão assíncrona de send_image.
+    
+    Args:
+        to_e164: Número do destinatário (formato E.164)
+        image_url: URL pública da imagem (deve ser acessível pelo Twilio)
+        sender: "BOT" ou "HUMANO" (apenas para log)
+        body: Texto opcional (legenda da imagem)
+    
+    Returns:
+        SID da mensagem enviada
+    """
+    if not is_configured():
+        print(f"\033[93m[TWILIO][send_image] ⚠️ Twilio não configurado. Imagem não enviada.\033[0m")
+        return ""
+
+    to = _fmt_whatsapp(to_e164)
+    from_ = FROM_WHATSAPP
+
+    try:
+        sid = await _create_message_async(to, from_, body=body, media_url=image_url)
+        
+        if sender.upper() == "BOT":
+            print(f"\033[94m[TWILIO][BOT] → {to} | IMAGEM | SID={sid} | URL={image_url}\033[0m")
+        else:
+            print(f"\033[92m[TWILIO][HUMANO] → {to} | IMAGEM | SID={sid} | URL={image_url}\033[0m")
+        
+        return sid
+    except Exception as e:
+        print(f"\033[91m[TWILIO][send_image] ❌ ERRO ao enviar imagem: {str(e)}\033[0m")
         raise
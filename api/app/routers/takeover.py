@@ -2,7 +2,6 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
-import asyncio
 from app.db import get_db
 from app.models import Thread, Message, User
 from app.schemas import TakeoverToggle, HumanReplyBody
@@ -82,7 +81,7 @@ async def send_audio(thread_id: int, body: SendAudioRequest,
 
     try:
         # Envia áudio via Twilio
-        sid = await asyncio.to_thread(twilio_provider.send_audio, phone, audio_url, "HUMANO")
+        sid = await twilio_provider.send_audio_async(phone, audio_url, "HUMANO")
         if not sid:
             raise HTTPException(500, "Twilio não configurado ou erro ao enviar áudio")
 
@@ -4,6 +4,7 @@ Biblioteca de assets (áudios e imagens) mapeados por IDs.
 Usado para resolver URLs a partir de IDs simples usados pela LLM.
 """
 import os
+from functools import lru_cache
 from typing import Optional, Dict
 
 # ==================== BIBLIOTECA DE ÁUDIOS ====================
@@ -112,6 +113,34 @@ IMAGE_LIBRARY: Dict[str, str] = {
 }
 
 
+@lru_cache(maxsize=1)
+def _resolve_base_url() -> str:
+    """
+    URL pública base dos assets: PUBLIC_BASE_URL, depois PUBLIC_FILES_BASE_URL, senão localhost.
+    Resolvida uma única vez por processo (limpar com `clear_caches()`).
+    """
+    public_base = os.getenv("PUBLIC_BASE_URL", "")
+    files_base = os.getenv("PUBLIC_FILES_BASE_URL", "")
+    
+    if public_base and "localhost" not in public_base:
+        return public_base.rstrip("/")
+    elif files_base and "localhost" not in files_base:
+        return files_base.rstrip("/")
+    else:
+        return "http://localhost:8000"
+
+
+def _build_audio_url(audio_path: str) -> str:
+    """Monta a URL do endpoint /audios/{path} (aceita caminho com ou sem /audios/ no início)"""
+    audio_path_clean = audio_path.lstrip("/")
+    if audio_path_clean.startswith("audios/"):
+        audio_path_clean = audio_path_clean[7:]  # Remove "audios/"
+    return f"{_resolve_base_url()}/audios/{audio_path_clean}"
+
+
+# IDs vêm de um conjunto fixo (pacotes do funil e tags da LLM): a URL é montada uma vez
+# por ID. IDs inexistentes também ficam em cache (None), sem repetir a busca
+@lru_cache(maxsize=256)
 def resolve_audio_url(audio_id: str) -> Optional[str]:
     """
     Resolve um ID de áudio para a URL completa.
@@ -126,25 +155,10 @@ def resolve_audio_url(audio_id: str) -> Optional[str]:
     if not audio_path:
         return None
     
-    # Resolve base URL
-    public_base = os.getenv("PUBLIC_BASE_URL", "")
-    files_base = os.getenv("PUBLIC_FILES_BASE_URL", "")
-    
-    if public_base and "localhost" not in public_base:
-        base_url = public_base.rstrip("/")
-    elif files_base and "localhost" not in files_base:
-        base_url = files_base.rstrip("/")
-    else:
-        base_url = "http://localhost:8000"
-    
-    # Remove /audios/ do path se já estiver
-    audio_path_clean = audio_path.lstrip("/")
-    if audio_path_clean.startswith("audios/"):
-        audio_path_clean = audio_path_clean[7:]  # Remove "audios/"
-    
-    return f"{base_url}/audios/{audio_path_clean}"
+    return _build_audio_url(audio_path)
 
 
+@lru_cache(maxsize=256)
 def resolve_image_url(image_id: str) -> Optional[str]:
     """
     Resolve um ID de imagem para a URL completa.
@@ -159,18 +173,14 @@ def resolve_image_url(image_id: str) -> Optional[str]:
     if not image_filename:
         return None
     
-    # Resolve base URL
-    public_base = os.getenv("PUBLIC_BASE_URL", "")
-    files_base = os.getenv("PUBLIC_FILES_BASE_URL", "")
-    
-    if public_base and "localhost" not in public_base:
-        base_url = public_base.rstrip("/")
-    elif files_base and "localhost" not in files_base:
-        base_url = files_base.rstrip("/")
-    else:
-        base_url = "http://localhost:8000"
-    
-    return f"{base_url}/images/{image_filename}"
+    return f"{_resolve_base_url()}/images/{image_filename}"
+
+
+def clear_caches() -> None:
+    """Limpa a URL base e as URLs resolvidas (após mudar PUBLIC_BASE_URL ou as bibliotecas)"""
+    _resolve_base_url.cache_clear()
+    resolve_audio_url.cache_clear()
+    resolve_image_url.cache_clear()
 
 
 def get_all_audio_ids() -> list[str]:
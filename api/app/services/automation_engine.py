@@ -1,14 +1,95 @@
 # api/app/services/automation_engine.py
 """Engine completa de automações - processa triggers e executa ações"""
 import os
+import re
+import time
 import asyncio
-import json
-from typing import Dict, Optional, Any, List, Tuple
+import logging
+from contextvars import ContextVar
+from typing import Callable, Dict, Optional, Any, List, Set, Tuple, TypedDict
 from datetime import datetime, timedelta
+from dataclasses import dataclass
+from functools import lru_cache
+from types import MappingProxyType
+from urllib.parse import urljoin, urlparse
 
+from ..db import SessionLocal
+from ..models import Thread, Message, DeadLetter
 from ..providers import twilio as twilio_provider
-from .template_loader import load_template, get_audio_path, get_template_by_code
+from .template_loader import get_audio_path, get_template_by_code, clear_caches as _clear_template_caches
+from .assets_library import clear_caches as _clear_asset_caches
 from .support_detector import detect_support
+from .keyword_matcher import compile_keywords, anchor_chars, fold_accents, normalize_message
+from .intent_classifier import detect_plans_intent, extract_plan_choice
+from .funnel_packages import execute_pacote_fase_2, execute_pacote_fase_3, refresh_image_urls, DELAY_AFTER_AUDIO
+
+logger = logging.getLogger(__name__)
+
+# Lead/gatilho em execução - herdado pelas tasks criadas dentro do gatilho (asyncio copia o contexto)
+_log_context: ContextVar[Dict[str, str]] = ContextVar("automation_log_context", default={})
+
+
+class AutomationContextFilter(logging.Filter):
+    """
+    Anexa `phone` e `trigger` do contexto atual ao LogRecord, para formatters/sinks
+    estruturados (ex: `%(phone)s`). Só roda para registros com nível habilitado.
+    """
+    def filter(self, record: logging.LogRecord) -> bool:
+        context = _log_context.get()
+        record.phone = context.get("phone", "-")
+        record.trigger = context.get("trigger", "-")
+        return True
+
+
+logger.addFilter(AutomationContextFilter())
+
+
+# ==================== CONFIGURAÇÃO ====================
+
+def _first_public_url(*candidates: str) -> str:
+    """Primeira URL configurada que não aponta para localhost (senão localhost, que o Twilio não acessa)"""
+    for url in candidates:
+        if url and "localhost" not in url:
+            return url
+    return "http://localhost:8000"
+
+
+@dataclass(frozen=True, slots=True)
+class AutomationConfig:
+    """Configuração das automações, lida do ambiente uma única vez no import (fixa no processo)"""
+    public_base_url: str  # Funil longo: PUBLIC_BASE_URL (ngrok) > PUBLIC_FILES_BASE_URL, sem barra final
+    campaign_base_url: str  # Campanhas BF/recuperação: PUBLIC_FILES_BASE_URL > PUBLIC_BASE_URL
+    # Envia áudio + texto em paralelo (sem o delay de ordem) nos gatilhos de _TRIGGER_SPECS
+    # (BF e follow-ups da recuperação 50%). Padrão: sequencial, áudio -> DELAY_AFTER_AUDIO -> texto.
+    # Os pacotes do funil longo (FASE 2/3) não entram aqui: texto/áudio/imagens ali dependem da ordem.
+    parallel_send: bool
+    # Dead letters: tentativas (incluindo o envio original), espera base entre reenvios
+    # (dobra a cada tentativa) e intervalo do consumidor em background
+    dead_letter_max_attempts: int
+    dead_letter_backoff_seconds: float
+    dead_letter_replay_interval: float
+    
+    @classmethod
+    def load(cls) -> "AutomationConfig":
+        public_base = os.getenv("PUBLIC_BASE_URL", "")
+        files_base = os.getenv("PUBLIC_FILES_BASE_URL", "")
+        
+        # Se não tem PUBLIC_BASE_URL configurado, avisa
+        if not public_base or "localhost" in public_base:
+            logger.warning("[AUTOMATION] ⚠️ PUBLIC_BASE_URL não configurado ou é localhost. Twilio não conseguirá acessar o áudio!")
+            logger.warning("[AUTOMATION] ⚠️ Configure PUBLIC_BASE_URL no .env com sua URL do ngrok (ex: https://abc123.ngrok-free.app)")
+        
+        return cls(
+            public_base_url=_first_public_url(public_base, files_base).rstrip("/"),
+            campaign_base_url=_first_public_url(files_base, public_base),
+            parallel_send=os.getenv("BF_PARALLEL_SEND", "false").lower() == "true",
+            dead_letter_max_attempts=int(os.getenv("DEAD_LETTER_MAX_ATTEMPTS", "5")),
+            dead_letter_backoff_seconds=float(os.getenv("DEAD_LETTER_BACKOFF_SECONDS", "60")),
+            dead_letter_replay_interval=float(os.getenv("DEAD_LETTER_REPLAY_INTERVAL", "60")),
+        )
+
+
+CONFIG = AutomationConfig.load()
 
 
 # ==================== CONSTANTES DE ETAPAS ====================
@@ -32,8 +113,9 @@ RECUP_50_OFERTA_ENVIADA = "recup_50_oferta_enviada"
 RECUP_50_SEM_RESPOSTA_1 = "recup_50_sem_resposta_1"
 RECUP_50_SEM_RESPOSTA_2 = "recup_50_sem_resposta_2"
 
-# Lista completa de estágios válidos
-VALID_STAGES = [
+# Grupos de estágios por funil (frozenset: `stage in GRUPO` em O(1), e direto em
+# `Thread.lead_stage.in_(GRUPO)` para filtrar os leads de cada gatilho pelo índice da coluna)
+FUNIL_LONGO_STAGES = frozenset((
     FUNIL_LONGO_FASE_1_FRIO,
     FUNIL_LONGO_FASE_2_AQUECIMENTO,
     FUNIL_LONGO_FASE_3_AQUECIDO,
@@ -41,18 +123,26 @@ VALID_STAGES = [
     FUNIL_LONGO_POS_COMPRA,
     FUNIL_LONGO_FATURA_PENDENTE,
     FUNIL_LONGO_RECUPERACAO,
+))
+BF_STAGES = frozenset((
     BF_AQUECIDO,
     BF_QUENTE,
     BF_FOLLOWUP_ENVIADO,
+))
+RECUP_50_STAGES = frozenset((
     RECUP_50_OFERTA_ENVIADA,
     RECUP_50_SEM_RESPOSTA_1,
     RECUP_50_SEM_RESPOSTA_2,
-]
+))
+
+# Conjunto completo de estágios válidos
+VALID_STAGES = FUNIL_LONGO_STAGES | BF_STAGES | RECUP_50_STAGES
 
 
 # ==================== MAPEAMENTO DE EVENTOS PARA ESTÁGIOS ====================
 
-EVENT_TO_STAGE_MAP = {
+# Somente leitura (MappingProxyType): nenhum módulo altera o mapa em runtime
+EVENT_TO_STAGE_MAP = MappingProxyType({
     # Funil Longo
     "USER_SENT_FIRST_MESSAGE": FUNIL_LONGO_FASE_1_FRIO,
     "IA_SENT_AUDIO_DOR": FUNIL_LONGO_FASE_2_AQUECIMENTO,
@@ -70,160 +160,266 @@ EVENT_TO_STAGE_MAP = {
     "RECUP_50_DISPARADO": RECUP_50_OFERTA_ENVIADA,
     "RECUP_50_FOLLOWUP_1": RECUP_50_SEM_RESPOSTA_1,
     "RECUP_50_FOLLOWUP_2": RECUP_50_SEM_RESPOSTA_2,
-}
+})
+
+
+# ==================== PALAVRAS-CHAVE DO FUNIL LONGO ====================
+# Compiladas uma única vez no import (uma passada por mensagem em vez de N buscas).
+# A busca ignora acentos ("preco" casa "preço", "nao sei" casa "não sei"), então
+# as listas não precisam repetir a grafia sem acento
+
+# Menção a preços/planos: NÃO dispara áudio 1, deixa o LLM lidar (Fase 3)
+PRECO_KEYWORDS = (
+    "preço", "quanto custa", "valores", "planos", "opções de plano",
+    "me passa os preços", "quais os valores",
+    "quero saber dos planos", "me mostra os planos", "investimento"
+)
+
+FUNCIONAMENTO_KEYWORDS = (
+    "como funciona", "como é", "me explica", "me fala mais", "conta pra mim"
+)
+
+# Palavras-chave de entrada (verifica ANTES de verificar "como funciona")
+ENTRY_KEYWORDS = (
+    "quero saber do life",
+    "quero ser gostosa",
+    "quero emagrecer",
+    "quero transformar",
+    "preciso fazer algo",
+    "quero mudar",
+    "quero melhorar",
+    "me tornarei",
+    "tornar",
+    "gostosa",
+    "grande gostosa",
+    "life",
+    "quero saber",
+)
+
+# Contexto de transformação (valida "como funciona" como entrada)
+TRANSFORMACAO_KEYWORDS = (
+    "quero ser gostosa", "quero emagrecer", "quero transformar",
+    "preciso fazer algo", "quero mudar", "quero melhorar",
+    "me tornarei", "tornar", "gostosa", "grande gostosa"
+)
+
+# Interesse/aceitação após ver as imagens (Fase 2)
+INTERESSE_KEYWORDS = (
+    "falta de vergonha", "falta vergonha", "falta vergonha na cara", "vergonha na cara",
+    "legal", "ok", "entendi", "faz sentido", "gostei", "quero saber",
+    "quero ver", "me mostra", "me fala", "conta pra mim",
+    "quero saber os planos", "quero saber sobre os planos",
+    "como funciona o pagamento", "quanto custa", "preço", "planos",
+    "quais são os planos", "me fala dos planos",
+    "me passa os preços", "quais os valores", "investimento"
+)
+
+# Dor/objetivo (Fase 1 -> Fase 2). Compartilhada com a varredura do histórico
+DOR_KEYWORDS = (
+    "dor", "problema", "incomoda", "quero emagrecer", "quero perder peso",
+    "barriga", "flacidez", "celulite", "autoestima",
+    "tenho vergonha", "sinto vergonha", "me dá vergonha", "vergonha de",
+    "não gosto", "me incomoda", "me derruba", "travamento", "objetivo",
+    "quero definir", "quero ganhar massa", "pochete", "papada",
+    "gordinha", "gordo", "gorda", "meio gordinha", "meio gordo", "meio gorda",
+    "gorda", "obesa", "obeso", "estou gorda", "me sinto gorda", "sou gorda",
+    "triste", "me sinto", "me sinto muito", "sentindo", "estou me sentindo",
+    "insatisfeita", "insatisfeito", "não gosto do meu", "não gosto da minha",
+    "evito", "não consigo", "sempre desisto", "falta disciplina",
+    "emagrecer", "emagrecer msm", "queria emagrecer", "preciso emagrecer",
+    # Expressões de frustração/necessidade de mudança
+    "impossível continuar", "não dá mais", "não aguento mais", "não aguento",
+    "preciso mudar", "preciso mudar isso", "tem que mudar", "tem q mudar",
+    "não posso mais", "não consigo mais", "não dá pra continuar", "não dá pra continuar assim",
+    "preciso fazer algo", "preciso fazer alguma coisa", "algo tem que mudar",
+    "tem que ser diferente", "tem q ser diferente", "preciso de uma solução",
+    # Respostas vagas/indecisas que indicam necessidade de ajuda
+    "não sei", "n sei", "não sei o que", "n sei o que", "não sei bem",
+    "n sei bem", "não sei exatamente", "n sei exatamente", "não sei exataemnte",
+    "n sei exataemnte", "não sei direito", "n sei direito", "não sei como",
+    "n sei como", "não tenho certeza", "n tenho certeza", "não sei ao certo",
+    "n sei ao certo", "tô perdida", "estou perdida", "tô confusa",
+    "estou confusa", "não entendo", "n entendo", "não entendi",
+    "n entendi", "me ajuda", "me ajuda aí", "preciso de ajuda",
+    "preciso ajuda", "me orienta", "me oriente", "me explica", "me fala"
+)
+
+
+# Todo contexto de transformação já é palavra-chave de entrada, então "como funciona" +
+# transformação nunca dispara sozinho: basta a varredura de ENTRY_KEYWORDS
+assert set(TRANSFORMACAO_KEYWORDS) <= set(ENTRY_KEYWORDS)
+
+# word_start: palavras curtas só casam no início de palavra ("ok" não casa em "facebook",
+# "tornar" não casa em "retornar", "dor" não casa em "adoro")
+_PRECO_RE = compile_keywords(PRECO_KEYWORDS, word_start=True, accent_insensitive=True)
+_ENTRY_RE = compile_keywords(ENTRY_KEYWORDS, word_start=True, accent_insensitive=True)
+_INTERESSE_RE = compile_keywords(INTERESSE_KEYWORDS, word_start=True, accent_insensitive=True)
+_DOR_RE = compile_keywords(DOR_KEYWORDS, word_start=True, accent_insensitive=True)
+
+# Pré-filtro por caractere: sem nenhuma âncora na mensagem a regex nem roda
+_PRECO_ANCHORS = anchor_chars(PRECO_KEYWORDS, word_start=True, accent_insensitive=True)
+_ENTRY_ANCHORS = anchor_chars(ENTRY_KEYWORDS, word_start=True, accent_insensitive=True)
+_INTERESSE_ANCHORS = anchor_chars(INTERESSE_KEYWORDS, word_start=True, accent_insensitive=True)
+_DOR_ANCHORS = anchor_chars(DOR_KEYWORDS, word_start=True, accent_insensitive=True)
+
+
+def _has_keyword(anchors: frozenset, pattern: re.Pattern, message_lower: str) -> bool:
+    """Testa a regex do bucket só se a mensagem contém alguma âncora dele"""
+    return not anchors.isdisjoint(message_lower) and pattern.search(message_lower) is not None
+
+# "falta de vergonha"/"falta vergonha na cara"/"vergonha na cara" indicam interesse, não dor.
+# Aceita espaços repetidos entre as palavras ("falta  de vergonha")
+_VERGONHA_EXCLUSAO_RE = re.compile(r"(?<!\w)(?:falta\s+de\s+vergonha|vergonha\s+na\s+cara)")
+
+# Menor palavra-chave capaz de disparar um gatilho ("ok"). Mensagens mais curtas
+# que isso não casam nada, então nem passam pelas varreduras. Os padrões do
+# intent_classifier são todos mais longos ("valor", "anual").
+_MIN_TRIGGER_KEYWORD_LEN = min(map(len, (
+    *PRECO_KEYWORDS, *ENTRY_KEYWORDS, *FUNCIONAMENTO_KEYWORDS,
+    *INTERESSE_KEYWORDS, *DOR_KEYWORDS,
+)))
+
+
+# ==================== MENSAGENS DE CHECKOUT (FALLBACK) ====================
+# Usadas quando o template de fechamento não é encontrado
+
+FALLBACK_CHECKOUT_ANUAL = """Amoo! 🔥 Bora garantir sua transformação agoraaaa!! 💖
+
+Aqui está o link pra você finalizar o *Plano Anual* do LIFE:
+
+➡️ https://edzz.la/DO408?a=10554737
+
+💳 Gatinha, antes de finalizar, ajusta o limite do cartão lá no app do seu banco para algo em torno de R$50.  
+
+Isso não vai comprometer o seu limite total, é só pra autorização da primeira parcela mesmo.
+
+O sistema vai cobrar apenas a parcela mensal certinha, tá?
+
+Assim que finalizar, me avisa aqui que eu já te envio todos os acessos e te coloco no caminho da sua melhor versão.  
+
+Tô te esperando do outro lado! 🚀✨"""
+
+FALLBACK_CHECKOUT_MENSAL = """🔥 Bora garantir sua transformação agoraaaa!! 💖
+
+Aqui tá o link do *Plano Mensal* pra você finalizar:
+
+➡️ https://edzz.la/GQRLF?a=10554737
+
+É super simples: você assina, já recebe os acessos e começa hoje mesmo com treino e dieta alinhadinhos com o que você me contou. 😍
+
+Assim que finalizar, me avisa aqui que eu já te envio tudo e organizo seu passo a passo no LIFE.  
+
+Tô aqui pra caminhar contigo, gata! ✨"""
 
 
 # ==================== GATILHOS DO FUNIL LONGO ====================
 
+@lru_cache(maxsize=64)
+def _public_audio_url(audio_path: str) -> str:
+    """
+    Monta a URL pública do endpoint /audios/{path} para um caminho do mapa de áudios.
+    A base e os caminhos são fixos no processo, então cada URL é montada uma única vez.
+    """
+    # Remove barra inicial do audio_path se houver
+    audio_path_clean = audio_path.lstrip("/")
+    # O endpoint é /audios/{path}, então precisa remover /audios/ do path se já estiver
+    if audio_path_clean.startswith("audios/"):
+        audio_path_clean = audio_path_clean[7:]  # Remove "audios/"
+    return f"{CONFIG.public_base_url}/audios/{audio_path_clean}"
+
+
+def _check_sem_stage(message: str, message_lower: str) -> Optional[str]:
+    """Lead sem stage: entrada -> interesse/escolha de plano -> dor"""
+    # Gatilho de entrada: palavra-chave de entrada OU "como funciona" com contexto de
+    # transformação (coberto por ENTRY_KEYWORDS, ver acima)
+    if _has_keyword(_ENTRY_ANCHORS, _ENTRY_RE, message_lower):
+        return "ENTRY_FUNIL_LONGO"
+    
+    # CORREÇÃO D: Usa intent_classifier para distinguir ASK_PLANS vs CHOOSE_PLAN
+    intent = detect_plans_intent(message, None)
+    if intent == "ASK_PLANS":
+        return "INTERESSE_PLANO"
+    elif intent == "CHOOSE_PLAN":
+        return "ESCOLHEU_PLANO"
+    
+    return _check_dor(message, message_lower)
+
+
+def _check_entrada(message: str, message_lower: str) -> Optional[str]:
+    """Stage vazio (""): só o gatilho de entrada"""
+    if _has_keyword(_ENTRY_ANCHORS, _ENTRY_RE, message_lower):
+        return "ENTRY_FUNIL_LONGO"
+    return None
+
+
+def _check_dor(message: str, message_lower: str) -> Optional[str]:
+    """
+    FRIO (lead já recebeu áudio 1) ou sem stage: detecta dor.
+    Em FRIO uma entrada repetida não muda nada, então só a dor importa.
+    """
+    # Exclui "falta de vergonha" e "vergonha na cara" que indicam interesse, não dor
+    if _VERGONHA_EXCLUSAO_RE.search(message_lower):
+        return None
+    if _has_keyword(_DOR_ANCHORS, _DOR_RE, message_lower):
+        return "DOR_DETECTADA"
+    return None
+
+
+def _check_interesse(message: str, message_lower: str) -> Optional[str]:
+    """
+    AQUECIMENTO (já recebeu áudio 2 + imagens): respostas positivas indicam interesse.
+    Não detecta mais dor (já passou dessa fase).
+    """
+    if _has_keyword(_INTERESSE_ANCHORS, _INTERESSE_RE, message_lower):
+        return "INTERESSE_PLANO"
+    return None
+
+
+def _check_planos(message: str, message_lower: str) -> Optional[str]:
+    """AQUECIDO: pergunta sobre planos ou escolha de plano (CORREÇÃO D: intent_classifier)"""
+    intent = detect_plans_intent(message, FUNIL_LONGO_FASE_3_AQUECIDO)
+    if intent == "ASK_PLANS":
+        return "INTERESSE_PLANO"
+    elif intent == "CHOOSE_PLAN":
+        return "ESCOLHEU_PLANO"
+    return None
+
+
+# Só o handler do stage atual roda; stages fora do funil longo não têm gatilho
+_STAGE_HANDLERS = MappingProxyType({
+    None: _check_sem_stage,
+    "": _check_entrada,
+    FUNIL_LONGO_FASE_1_FRIO: _check_dor,
+    FUNIL_LONGO_FASE_2_AQUECIMENTO: _check_interesse,
+    FUNIL_LONGO_FASE_3_AQUECIDO: _check_planos,
+})
+
+
 def detect_funil_longo_trigger(message: str, thread_meta: Optional[Dict] = None) -> Optional[str]:
     """
     Detecta gatilhos de entrada do funil longo.
+    Sem logs nem efeitos colaterais: roda dentro de _classify_message (memoizada).
     
     Returns:
         Nome do gatilho ou None
     """
-    message_lower = message.lower().strip()
+    # Minúsculas e sem acentos uma única vez; todas as varreduras usam esse texto
+    message_lower = fold_accents(normalize_message(message))
+    # Mensagens vazias/triviais não casam nenhuma palavra-chave
+    if len(message_lower) < _MIN_TRIGGER_KEYWORD_LEN:
+        return None
     current_stage = thread_meta.get("lead_stage") if thread_meta else None
-    print(f"[AUTOMATION][detect_funil_longo_trigger] Mensagem: '{message_lower}', Stage atual: {current_stage}")
-    
-    # 🚨 PRIORIDADE: Verifica se há menção a preços/planos/funcionamento ANTES de qualquer outra coisa
-    # Se mencionar preços/planos/funcionamento, NÃO dispara áudio 1, deixa o LLM lidar (Fase 3)
-    preco_keywords = [
-        "preço", "preços", "quanto custa", "valores", "planos", "opções de plano",
-        "quero ver os precos", "me passa os preços", "quais os valores",
-        "quero saber dos planos", "me mostra os planos", "investimento"
-    ]
     
-    funcionamento_keywords = [
-        "como funciona", "como é", "me explica", "me fala mais", "conta pra mim"
-    ]
-    
-    # Se mencionar preços, NÃO dispara automação - deixa LLM responder com Fase 3
-    if any(keyword in message_lower for keyword in preco_keywords):
+    handler = _STAGE_HANDLERS.get(current_stage)
+    if handler is None:
         return None
     
-    # Gatilho de entrada (primeira mensagem ou sem stage definido)
-    if not current_stage or current_stage == FUNIL_LONGO_FASE_1_FRIO:
-        # Palavras-chave de entrada (verifica ANTES de verificar "como funciona")
-        entry_keywords = [
-            "quero saber do life",
-            "quero ser gostosa",
-            "quero emagrecer",
-            "quero transformar",
-            "preciso fazer algo",
-            "quero mudar",
-            "quero melhorar",
-            "me tornarei",
-            "tornar",
-            "gostosa",
-            "grande gostosa",
-            "life",
-            "quero saber",
-        ]
-        
-        # Verifica se tem palavras-chave de entrada
-        tem_entry_keyword = any(keyword in message_lower for keyword in entry_keywords)
-        
-        # Se tem "como funciona", verifica se tem contexto de transformação
-        tem_como_funciona = any(keyword in message_lower for keyword in funcionamento_keywords)
-        tem_contexto_transformacao = any(keyword in message_lower for keyword in [
-            "quero ser gostosa", "quero emagrecer", "quero transformar", 
-            "preciso fazer algo", "quero mudar", "quero melhorar",
-            "me tornarei", "tornar", "gostosa", "grande gostosa"
-        ])
-        
-        # Se tem palavra-chave de entrada OU (tem "como funciona" E tem contexto de transformação)
-        if tem_entry_keyword or (tem_como_funciona and tem_contexto_transformacao):
-            # Se não tem stage, dispara ENTRY_FUNIL_LONGO
-            if not current_stage:
-                return "ENTRY_FUNIL_LONGO"
-            # Se está em FRIO mas não mencionou dor ainda, pode ser entrada repetida
-            # Vamos permitir que avance para dor se mencionar objetivo
-            pass
-    
-    # 🚨 PRIORIDADE: Detecta interesse em planos ANTES de detectar dor
-    # Se está em AQUECIMENTO (já recebeu áudio 2 + imagens), respostas positivas indicam interesse
-    if current_stage == FUNIL_LONGO_FASE_2_AQUECIMENTO:
-        # Palavras-chave que indicam interesse/aceitação após ver as imagens
-        interesse_keywords = [
-            "falta de vergonha", "falta vergonha", "falta vergonha na cara", "vergonha na cara",
-            "legal", "ok", "entendi", "faz sentido", "gostei", "quero saber",
-            "quero ver", "me mostra", "me fala", "conta pra mim",
-            "quero saber os planos", "quero saber sobre os planos",
-            "como funciona o pagamento", "quanto custa", "preço", "planos",
-            "quais são os planos", "me fala dos planos", "quero ver os precos",
-            "me passa os preços", "quais os valores", "investimento"
-        ]
-        if any(keyword in message_lower for keyword in interesse_keywords):
-            print(f"[AUTOMATION] ✅ INTERESSE_PLANO detectado após Fase 2: '{message_lower}'")
-            return "INTERESSE_PLANO"
-    
-    # Gatilho de interesse em plano (está em AQUECIDO ou sem stage)
-    # CORREÇÃO D: Usa intent_classifier para distinguir ASK_PLANS vs CHOOSE_PLAN
-    if current_stage in [FUNIL_LONGO_FASE_3_AQUECIDO, None]:
-        from .intent_classifier import detect_plans_intent
-        intent = detect_plans_intent(message, current_stage)
-        
-        if intent == "ASK_PLANS":
-            return "INTERESSE_PLANO"
-        elif intent == "CHOOSE_PLAN":
-            return "ESCOLHEU_PLANO"
-    
-    # Gatilho de dor (está na etapa 1 - FRIO ou sem stage)
-    # IMPORTANTE: Detecta dor mesmo se já está em FRIO (lead já recebeu áudio 1)
-    # MAS: Remove "vergonha" isolada - só detecta se for "vergonha" como dor (ex: "tenho vergonha")
-    # E: NÃO detecta dor se já está em AQUECIMENTO (já passou da fase de dor)
-    if current_stage == FUNIL_LONGO_FASE_2_AQUECIMENTO:
-        # Se já está em AQUECIMENTO, não detecta mais dor - deve detectar interesse em planos
-        print(f"[AUTOMATION] ⚠️ Stage é AQUECIMENTO, pulando detecção de dor (já passou dessa fase)")
+    # 🚨 PRIORIDADE: Verifica se há menção a preços/planos/funcionamento ANTES de qualquer outra coisa
+    # Se mencionar preços, NÃO dispara automação - deixa LLM responder com Fase 3
+    if _has_keyword(_PRECO_ANCHORS, _PRECO_RE, message_lower):
         return None
     
-    if current_stage == FUNIL_LONGO_FASE_1_FRIO or current_stage is None:
-        dor_keywords = [
-            "dor", "problema", "incomoda", "quero emagrecer", "quero perder peso",
-            "barriga", "flacidez", "celulite", "autoestima",
-            "tenho vergonha", "sinto vergonha", "me dá vergonha", "vergonha de",
-            "não gosto", "me incomoda", "me derruba", "travamento", "objetivo",
-            "quero definir", "quero ganhar massa", "pochete", "papada",
-            "gordinha", "gordo", "gorda", "meio gordinha", "meio gordo", "meio gorda",
-            "gorda", "obesa", "obeso", "estou gorda", "me sinto gorda", "sou gorda",
-            "triste", "me sinto", "me sinto muito", "sentindo", "estou me sentindo",
-            "insatisfeita", "insatisfeito", "não gosto do meu", "não gosto da minha",
-            "evito", "não consigo", "sempre desisto", "falta disciplina",
-            "emagrecer", "emagrecer msm", "queria emagrecer", "preciso emagrecer",
-            # Expressões de frustração/necessidade de mudança
-            "impossível continuar", "não dá mais", "não aguento mais", "não aguento",
-            "preciso mudar", "preciso mudar isso", "tem que mudar", "tem q mudar",
-            "não posso mais", "não consigo mais", "não dá pra continuar", "não dá pra continuar assim",
-            "preciso fazer algo", "preciso fazer alguma coisa", "algo tem que mudar",
-            "tem que ser diferente", "tem q ser diferente", "preciso de uma solução",
-            # Respostas vagas/indecisas que indicam necessidade de ajuda
-            "não sei", "n sei", "não sei o que", "n sei o que", "não sei bem",
-            "n sei bem", "não sei exatamente", "n sei exatamente", "não sei exataemnte",
-            "n sei exataemnte", "não sei direito", "n sei direito", "não sei como",
-            "n sei como", "não tenho certeza", "n tenho certeza", "não sei ao certo",
-            "n sei ao certo", "tô perdida", "to perdida", "estou perdida", "tô confusa",
-            "to confusa", "estou confusa", "não entendo", "n entendo", "não entendi",
-            "n entendi", "me ajuda", "me ajuda ai", "me ajuda aí", "preciso de ajuda",
-            "preciso ajuda", "me orienta", "me oriente", "me explica", "me fala"
-        ]
-        # Exclui "falta de vergonha" e "vergonha na cara" que indicam interesse, não dor
-        if "falta de vergonha" in message_lower or "falta vergonha na cara" in message_lower or "vergonha na cara" in message_lower:
-            return None
-        if any(keyword in message_lower for keyword in dor_keywords):
-            print(f"[AUTOMATION] ✅ DOR_DETECTADA: '{message_lower}' contém palavra-chave de dor")
-            return "DOR_DETECTADA"
-    
-    # Gatilho de escolha de plano (está em AQUECIDO)
-    # CORREÇÃO D: Usa intent_classifier para detectar CHOOSE_PLAN
-    if current_stage == FUNIL_LONGO_FASE_3_AQUECIDO:
-        from .intent_classifier import detect_plans_intent
-        intent = detect_plans_intent(message, current_stage)
-        
-        if intent == "CHOOSE_PLAN":
-            return "ESCOLHEU_PLANO"
-    
-    return None
+    return handler(message, message_lower)
 
 
 # ==================== AÇÕES DO FUNIL LONGO ====================
@@ -250,53 +446,31 @@ async def execute_funil_longo_action(
         # Envia áudio 1
         audio_path = get_audio_path("audio1_boas_vindas")
         if not audio_path:
-            print(f"[AUTOMATION] ❌ Áudio 1 não encontrado no mapeamento")
+            logger.error("[AUTOMATION] ❌ Áudio 1 não encontrado no mapeamento")
             messages_sent.append("[Erro: áudio 1 não encontrado]")
         else:
-            # Prioriza PUBLIC_BASE_URL (ngrok) que é acessível pelo Twilio
-            public_base = os.getenv("PUBLIC_BASE_URL", "")
-            files_base = os.getenv("PUBLIC_FILES_BASE_URL", "")
-            
-            # Se não tem PUBLIC_BASE_URL configurado, avisa
-            if not public_base or "localhost" in public_base:
-                print(f"[AUTOMATION] ⚠️ PUBLIC_BASE_URL não configurado ou é localhost. Twilio não conseguirá acessar o áudio!")
-                print(f"[AUTOMATION] ⚠️ Configure PUBLIC_BASE_URL no .env com sua URL do ngrok (ex: https://abc123.ngrok-free.app)")
-            
-            # Usa PUBLIC_BASE_URL se disponível, senão tenta PUBLIC_FILES_BASE_URL, senão localhost (não funcionará)
-            if public_base and "localhost" not in public_base:
-                base_url = public_base.rstrip("/")
-            elif files_base and "localhost" not in files_base:
-                base_url = files_base.rstrip("/")
-            else:
-                base_url = "http://localhost:8000"
-            
-            # Remove barra inicial do audio_path se houver e constrói URL
-            audio_path_clean = audio_path.lstrip("/")
-            # O endpoint é /audios/{path}, então precisa remover /audios/ do path se já estiver
-            if audio_path_clean.startswith("audios/"):
-                audio_path_clean = audio_path_clean[7:]  # Remove "audios/"
-            audio_url = f"{base_url}/audios/{audio_path_clean}"
+            base_url = CONFIG.public_base_url
+            audio_url = _public_audio_url(audio_path)
             
-            print(f"[AUTOMATION] 🎵 Enviando áudio 1:")
-            print(f"[AUTOMATION]    URL: {audio_url}")
-            print(f"[AUTOMATION]    Path: {audio_path}")
-            print(f"[AUTOMATION]    Base: {base_url}")
-            print(f"[AUTOMATION]    Phone: {phone_number}")
+            logger.debug("[AUTOMATION] 🎵 Enviando áudio 1:")
+            logger.debug("[AUTOMATION]    URL: %s", audio_url)
+            logger.debug("[AUTOMATION]    Path: %s", audio_path)
+            logger.debug("[AUTOMATION]    Base: %s", base_url)
+            logger.debug("[AUTOMATION]    Phone: %s", phone_number)
             
             try:
-                print(f"[AUTOMATION] 📞 Chamando send_audio...")
-                sid = await asyncio.to_thread(twilio_provider.send_audio, phone_number, audio_url, "BOT")
-                print(f"[AUTOMATION] ✅ Áudio 1 enviado com sucesso! SID: {sid}")
+                logger.debug("[AUTOMATION] 📞 Chamando send_audio...")
+                sid = await twilio_provider.send_audio_async(phone_number, audio_url, "BOT")
+                logger.info("[AUTOMATION] ✅ Áudio 1 enviado com sucesso! SID: %s", sid)
                 messages_sent.append(f"[Áudio enviado: 01-boas-vindas-qualificacao | SID: {sid}]")
                 
                 # FASE 1: Apenas áudio, sem texto adicional (o LLM vai responder depois)
                     
             except Exception as e:
-                print(f"[AUTOMATION] ❌ ERRO ao enviar áudio 1: {str(e)}")
-                import traceback
-                traceback.print_exc()
-                # Mesmo com erro, continua o fluxo
-                messages_sent.append(f"[Erro ao enviar áudio 1: {str(e)}]")
+                logger.exception("[AUTOMATION] ❌ ERRO ao enviar áudio 1: %s", e)
+                # Mesmo com erro, continua o fluxo. O histórico guarda só o tipo do erro;
+                # o detalhe (corpo da resposta do Twilio) fica no log
+                messages_sent.append(f"[Erro ao enviar áudio 1: {type(e).__name__}]")
         
         new_stage = FUNIL_LONGO_FASE_1_FRIO
         metadata["audio_sent"] = "01-boas-vindas-qualificacao"
@@ -306,9 +480,8 @@ async def execute_funil_longo_action(
     elif trigger == "DOR_DETECTADA":
         # FASE 2: Executa PACOTE_FASE_2 fixo (sem LLM)
         # Pacote fixo: áudio2 + 8 imagens + textos com delays corretos
-        print(f"[AUTOMATION] 🎯 Fase 2 detectada (dor), executando PACOTE_FASE_2 fixo")
+        logger.info("[AUTOMATION] 🎯 Fase 2 detectada (dor), executando PACOTE_FASE_2 fixo")
         
-        from .funnel_packages import execute_pacote_fase_2
         
         # Detecta qual áudio usar baseado na mensagem (por enquanto usa genérico)
         # TODO: Pode melhorar para escolher áudio específico baseado na dor mencionada
@@ -323,11 +496,9 @@ async def execute_funil_longo_action(
             )
             messages_sent.extend(msgs_sent)
             metadata.update(pkg_metadata)
-            print(f"[AUTOMATION] ✅ PACOTE_FASE_2 executado com sucesso")
+            logger.info("[AUTOMATION] ✅ PACOTE_FASE_2 executado com sucesso")
         except Exception as e:
-            print(f"[AUTOMATION] ❌ Erro ao executar PACOTE_FASE_2: {e}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("[AUTOMATION] ❌ Erro ao executar PACOTE_FASE_2: %s", e)
         
         new_stage = FUNIL_LONGO_FASE_2_AQUECIMENTO
         metadata["event"] = "DOR_DETECTADA"
@@ -337,9 +508,8 @@ async def execute_funil_longo_action(
     elif trigger == "INTERESSE_PLANO":
         # FASE 3: Executa PACOTE_FASE_3 fixo (sem LLM)
         # Pacote fixo: intro + áudio3 + planos + pergunta com delays corretos
-        print(f"[AUTOMATION] 🎯 Interesse em planos detectado, executando PACOTE_FASE_3 fixo")
+        logger.info("[AUTOMATION] 🎯 Interesse em planos detectado, executando PACOTE_FASE_3 fixo")
         
-        from .funnel_packages import execute_pacote_fase_3
         
         try:
             msgs_sent, pkg_metadata = await execute_pacote_fase_3(
@@ -349,11 +519,9 @@ async def execute_funil_longo_action(
             )
             messages_sent.extend(msgs_sent)
             metadata.update(pkg_metadata)
-            print(f"[AUTOMATION] ✅ PACOTE_FASE_3 executado com sucesso")
+            logger.info("[AUTOMATION] ✅ PACOTE_FASE_3 executado com sucesso")
         except Exception as e:
-            print(f"[AUTOMATION] ❌ Erro ao executar PACOTE_FASE_3: {e}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("[AUTOMATION] ❌ Erro ao executar PACOTE_FASE_3: %s", e)
         
         new_stage = FUNIL_LONGO_FASE_3_AQUECIDO
         metadata["event"] = "IA_SENT_EXPLICACAO_PLANOS"
@@ -361,7 +529,6 @@ async def execute_funil_longo_action(
     
     elif trigger == "ESCOLHEU_PLANO":
         # CORREÇÃO D: Usa intent_classifier para detectar plano escolhido
-        from .intent_classifier import extract_plan_choice
         # Usa a mensagem atual passada como parâmetro, não last_message do meta
         message_text = message or thread_meta.get("last_message", "") or ""
         plan_choice = extract_plan_choice(message_text)
@@ -372,65 +539,31 @@ async def execute_funil_longo_action(
         template_code = "fechamento-anual" if is_anual else "fechamento-mensal"
         template_text = get_template_by_code(template_code)
         if template_text:
-            await asyncio.to_thread(twilio_provider.send_text, phone_number, template_text, "BOT")
+            await twilio_provider.send_text_async(phone_number, template_text, "BOT")
             messages_sent.append(template_text)
-            print(f"[AUTOMATION] ✅ Template '{template_code}' enviado para {phone_number}")
+            logger.info("[AUTOMATION] ✅ Template '%s' enviado para %s", template_code, phone_number)
         else:
             # Fallback: envia mensagem hardcoded se template não for encontrado
-            print(f"[AUTOMATION] ⚠️ Template '{template_code}' não encontrado, usando fallback")
-            if is_anual:
-                fallback_msg = """Amoo! 🔥 Bora garantir sua transformação agoraaaa!! 💖
-
-Aqui está o link pra você finalizar o *Plano Anual* do LIFE:
-
-➡️ https://edzz.la/DO408?a=10554737
-
-💳 Gatinha, antes de finalizar, ajusta o limite do cartão lá no app do seu banco para algo em torno de R$50.  
-
-Isso não vai comprometer o seu limite total, é só pra autorização da primeira parcela mesmo.
-
-O sistema vai cobrar apenas a parcela mensal certinha, tá?
-
-Assim que finalizar, me avisa aqui que eu já te envio todos os acessos e te coloco no caminho da sua melhor versão.  
-
-Tô te esperando do outro lado! 🚀✨"""
-            else:
-                fallback_msg = """🔥 Bora garantir sua transformação agoraaaa!! 💖
-
-Aqui tá o link do *Plano Mensal* pra você finalizar:
-
-➡️ https://edzz.la/GQRLF?a=10554737
-
-É super simples: você assina, já recebe os acessos e começa hoje mesmo com treino e dieta alinhadinhos com o que você me contou. 😍
-
-Assim que finalizar, me avisa aqui que eu já te envio tudo e organizo seu passo a passo no LIFE.  
-
-Tô aqui pra caminhar contigo, gata! ✨"""
-            await asyncio.to_thread(twilio_provider.send_text, phone_number, fallback_msg, "BOT")
+            logger.warning("[AUTOMATION] ⚠️ Template '%s' não encontrado, usando fallback", template_code)
+            fallback_msg = FALLBACK_CHECKOUT_ANUAL if is_anual else FALLBACK_CHECKOUT_MENSAL
+            await twilio_provider.send_text_async(phone_number, fallback_msg, "BOT")
             messages_sent.append(fallback_msg)
-            print(f"[AUTOMATION] ✅ Mensagem de checkout (fallback) enviada para {phone_number}")
+            logger.info("[AUTOMATION] ✅ Mensagem de checkout (fallback) enviada para %s", phone_number)
         
         # Marca que checkout foi enviado (evita reenvio de áudio3)
         if thread_id and db_session:
             try:
-                from ..models import Thread
-                from datetime import datetime
                 thread = db_session.get(Thread, thread_id)
                 if thread:
-                    meta = thread.meta or {}
-                    if isinstance(meta, str):
-                        try:
-                            import json
-                            meta = json.loads(meta)
-                        except:
-                            meta = {}
+                    # Copia para o SQLAlchemy detectar a mudança na coluna JSON
+                    meta = dict(thread.meta or {})
                     meta["checkout_sent_at"] = datetime.now().isoformat()
                     meta["last_checkout_plan"] = "anual" if is_anual else "mensal"
                     thread.meta = meta
-                    db_session.commit()
-                    print(f"[AUTOMATION] ✅ Marcado checkout_sent_at (plano: {'anual' if is_anual else 'mensal'})")
+                    # Sem commit aqui: vai no mesmo commit das mensagens salvas no fim da função
+                    logger.info("[AUTOMATION] ✅ Marcado checkout_sent_at (plano: %s)", "anual" if is_anual else "mensal")
             except Exception as e:
-                print(f"[AUTOMATION] ⚠️ Erro ao marcar checkout_sent_at: {e}")
+                logger.exception("[AUTOMATION] ⚠️ Erro ao marcar checkout_sent_at: %s", e)
         
         new_stage = FUNIL_LONGO_FASE_4_QUENTE
         metadata["template_sent"] = template_code
@@ -440,18 +573,38 @@ Tô aqui pra caminhar contigo, gata! ✨"""
     
     # Salva mensagens no banco se tiver thread_id e db_session
     if thread_id and db_session and messages_sent:
-        from ..models import Message
-        for msg_content in messages_sent:
-            msg = Message(thread_id=thread_id, role="assistant", content=msg_content)
-            db_session.add(msg)
+        # Um único INSERT multi-linha em vez de um objeto ORM por mensagem
+        db_session.bulk_insert_mappings(Message, [
+            {"thread_id": thread_id, "role": "assistant", "content": msg_content}
+            for msg_content in messages_sent
+        ])
         db_session.commit()
-        print(f"[AUTOMATION] ✅ {len(messages_sent)} mensagens salvas no banco para thread {thread_id}")
+        logger.info("[AUTOMATION] ✅ %d mensagens salvas no banco para thread %s", len(messages_sent), thread_id)
     
     return new_stage, metadata
 
 
 # ==================== PROCESSAMENTO PRINCIPAL ====================
 
+@lru_cache(maxsize=1024)
+def _classify_message(message: str, current_stage: Optional[str]) -> Tuple[Optional[str], str]:
+    """
+    Parte pura da classificação: (mensagem, etapa atual) -> (gatilho, intent).
+    
+    Não tem efeitos colaterais, então é memoizada: reenvios do webhook e mensagens
+    repetidas ("oi", "quero emagrecer") não refazem as varreduras de palavras-chave.
+    """
+    # CORREÇÃO D: Usa intent_classifier para distinguir ASK_PLANS vs CHOOSE_PLAN ANTES de detectar trigger
+    # Detecta intent primeiro para ajustar trigger
+    intent = detect_plans_intent(message, current_stage)
+    
+    # Se for CHOOSE_PLAN, força trigger ESCOLHEU_PLANO (não passa por detect_funil_longo_trigger)
+    if intent == "CHOOSE_PLAN":
+        return "ESCOLHEU_PLANO", intent
+    
+    return detect_funil_longo_trigger(message, {"lead_stage": current_stage}), intent
+
+
 async def process_automation(
     message: str,
     phone_number: str,
@@ -486,9 +639,9 @@ async def process_automation(
     if is_support:
         # Envia mensagem de encaminhamento
         takeover_msg = "Gata, pra isso o meu time de suporte é perfeito, tá? 💖\n\nVou te passar pra uma pessoa da equipe que resolve rapidinho esse tipo de coisa, combinado?"
-        await asyncio.to_thread(twilio_provider.send_text, phone_number, takeover_msg, "BOT")
+        await twilio_provider.send_text_async(phone_number, takeover_msg, "BOT")
         
-        print(f"[AUTOMATION] 🚨 SUPORTE DETECTADO: {support_reason}")
+        logger.warning("[AUTOMATION] 🚨 SUPORTE DETECTADO: %s", support_reason)
         return None, {"support_detected": True, "reason": support_reason, "need_human": True}, True
     
     # 2. DETECÇÃO DE GATILHOS DO FUNIL LONGO
@@ -499,45 +652,22 @@ async def process_automation(
     # Verifica se há mensagens anteriores com dor (apenas se está em FRIO)
     has_previous_pain = False
     if current_stage == FUNIL_LONGO_FASE_1_FRIO and message_history:
-        # Lista de palavras-chave de dor (mesma lista usada em detect_funil_longo_trigger)
-        dor_keywords = [
-            "dor", "problema", "incomoda", "quero emagrecer", "quero perder peso",
-            "barriga", "flacidez", "celulite", "autoestima",
-            "tenho vergonha", "sinto vergonha", "me dá vergonha", "vergonha de",
-            "não gosto", "me incomoda", "me derruba", "travamento", "objetivo",
-            "quero definir", "quero ganhar massa", "pochete", "papada",
-            "gordinha", "gordo", "gorda", "meio gordinha", "meio gordo", "meio gorda",
-            "gorda", "obesa", "obeso", "estou gorda", "me sinto gorda", "sou gorda",
-            "triste", "me sinto", "me sinto muito", "sentindo", "estou me sentindo",
-            "insatisfeita", "insatisfeito", "não gosto do meu", "não gosto da minha",
-            "evito", "não consigo", "sempre desisto", "falta disciplina",
-            "emagrecer", "emagrecer msm", "queria emagrecer", "preciso emagrecer",
-            "impossível continuar", "não dá mais", "não aguento mais", "não aguento",
-            "preciso mudar", "preciso mudar isso", "tem que mudar", "tem q mudar",
-            "não posso mais", "não consigo mais", "não dá pra continuar", "não dá pra continuar assim",
-            "preciso fazer algo", "preciso fazer alguma coisa", "algo tem que mudar",
-            "tem que ser diferente", "tem q ser diferente", "preciso de uma solução",
-            "não sei", "n sei", "não sei o que", "n sei o que", "não sei bem",
-            "n sei bem", "não sei exatamente", "n sei exatamente", "não sei exataemnte",
-            "n sei exataemnte", "não sei direito", "n sei direito", "não sei como",
-            "n sei como", "não tenho certeza", "n tenho certeza", "não sei ao certo",
-            "n sei ao certo", "tô perdida", "to perdida", "estou perdida", "tô confusa",
-            "to confusa", "estou confusa", "não entendo", "n entendo", "não entendi",
-            "n entendi", "me ajuda", "me ajuda ai", "me ajuda aí", "preciso de ajuda",
-            "preciso ajuda", "me orienta", "me oriente", "me explica", "me fala"
+        # Mensagens anteriores do usuário (role="user")
+        user_contents = [
+            fold_accents(msg.get("content", "").lower())
+            for msg in message_history
+            if msg.get("role") == "user"
         ]
-        
-        # Verifica mensagens anteriores do usuário (role="user")
-        for msg in message_history:
-            if msg.get("role") == "user":
-                msg_content = msg.get("content", "").lower()
-                # Verifica se contém palavras-chave de dor
-                if any(keyword in msg_content for keyword in dor_keywords):
-                    # Exclui "falta de vergonha" que indica interesse, não dor
-                    if "falta de vergonha" not in msg_content and "falta vergonha na cara" not in msg_content and "vergonha na cara" not in msg_content:
-                        has_previous_pain = True
-                        print(f"[AUTOMATION] ✅ Dor detectada em mensagem anterior: '{msg_content[:100]}'")
-                        break
+        # Uma passada sobre o histórico inteiro descarta o caso comum (nenhuma dor);
+        # nenhuma palavra-chave contém "\n", então a junção não cria falsos positivos.
+        # Só quando há alguma dor é que verifica mensagem a mensagem (exclusão de vergonha).
+        if _DOR_RE.search("\n".join(user_contents)):
+            for msg_content in user_contents:
+                # Exclui "falta de vergonha" que indica interesse, não dor
+                if _DOR_RE.search(msg_content) and not _VERGONHA_EXCLUSAO_RE.search(msg_content):
+                    has_previous_pain = True
+                    logger.info("[AUTOMATION] ✅ Dor detectada em mensagem anterior: '%.100s'", msg_content)
+                    break
     
     # Inicializa intent como None
     intent = None
@@ -546,23 +676,22 @@ async def process_automation(
     if has_previous_pain and current_stage == FUNIL_LONGO_FASE_1_FRIO:
         trigger = "DOR_DETECTADA"
         intent = "OTHER"  # Define intent para evitar erro no print
-        print(f"[AUTOMATION] 🎯 Dor anterior detectada + mensagem subsequente -> DOR_DETECTADA (bypass detect_funil_longo_trigger)")
+        logger.info("[AUTOMATION] 🎯 Dor anterior detectada + mensagem subsequente -> DOR_DETECTADA (bypass detect_funil_longo_trigger)")
     else:
-        # CORREÇÃO D: Usa intent_classifier para distinguir ASK_PLANS vs CHOOSE_PLAN ANTES de detectar trigger
-        from .intent_classifier import detect_plans_intent
-        
-        # Detecta intent primeiro para ajustar trigger
-        intent = detect_plans_intent(message, current_stage)
-        
-        # Se for CHOOSE_PLAN, força trigger ESCOLHEU_PLANO (não passa por detect_funil_longo_trigger)
+        trigger, intent = _classify_message(message, current_stage)
+        # Logs fora da função memoizada: saem também quando a classificação vem do cache
         if intent == "CHOOSE_PLAN":
-            trigger = "ESCOLHEU_PLANO"
-            print(f"[AUTOMATION] 🎯 Intent CHOOSE_PLAN detectado -> trigger ESCOLHEU_PLANO (bypass detect_funil_longo_trigger)")
-        else:
-            trigger = detect_funil_longo_trigger(message, thread_meta)
+            logger.info("[AUTOMATION] 🎯 Intent CHOOSE_PLAN detectado -> trigger ESCOLHEU_PLANO (bypass detect_funil_longo_trigger)")
+        elif trigger == "DOR_DETECTADA":
+            logger.info("[AUTOMATION] ✅ DOR_DETECTADA: '%.100s' contém palavra-chave de dor", message)
+        elif trigger == "INTERESSE_PLANO" and current_stage == FUNIL_LONGO_FASE_2_AQUECIMENTO:
+            logger.info("[AUTOMATION] ✅ INTERESSE_PLANO detectado após Fase 2: '%.100s'", message)
     
     if trigger:
-        print(f"[AUTOMATION] 🎯 Gatilho detectado: {trigger} (mensagem: '{message[:100]}', stage: {thread_meta.get('lead_stage')}, intent: {intent})")
+        logger.info(
+            "[AUTOMATION] 🎯 Gatilho detectado: %s (mensagem: '%.100s', stage: %s, intent: %s)",
+            trigger, message, thread_meta.get("lead_stage"), intent,
+        )
         new_stage, metadata = await execute_funil_longo_action(
             trigger, phone_number, thread_meta, db_session, thread_id, message
         )
@@ -602,9 +731,378 @@ def update_lead_stage_from_event(event: str, current_stage: Optional[str] = None
     Returns:
         Novo lead_stage ou None se não houver mudança
     """
-    if event in EVENT_TO_STAGE_MAP:
-        return EVENT_TO_STAGE_MAP[event]
-    return None
+    return EVENT_TO_STAGE_MAP.get(event)
+
+
+# ==================== CAMPANHAS (BF / RECUPERAÇÃO 50%) ====================
+
+# Textos de acompanhamento das campanhas (enviados DEPOIS do áudio)
+BF_OFERTA_TEXT = "Gataaaaa, olha issoooo 🔥🔥🔥\n\nSaiu uma condição INSANA da Black Friday, só HOJE!!\n\nQuer saber como funciona pra você aproveitar?"
+BF_FOLLOWUP_TEXT = "Só passando aqui rapidinho porque essa promoção é literalmente a mais forte do ano 🔥\n\nSe ainda fizer sentido pra você, me chama aqui que te explico antes de acabar!"
+RECUP_50_FOLLOWUP_1_TEXT = "Te mandei uma condição muito especial pro LIFE e não queria que passasse batido por você, gata. 💖\n\nMe chama aqui se ainda tiver vontade de aproveitar essa oportunidade!"
+RECUP_50_FOLLOWUP_2_TEXT = "Prometo que é a última vez que apareço aqui sobre essa condição 🙈\n\nSe ainda bater aquela vontade de começar sua transformação com 50% OFF, é agora ou só na próxima… 😅🔥"
+
+
+class TriggerMetadata(TypedDict, total=False):
+    """Metadados retornados pelos gatilhos de campanha (montados num único literal)"""
+    audio_sent: str
+    template_sent: str
+    event: str
+    dead_letters: List[str]  # Partes ("audio"/"text") que falharam e foram para a fila de reenvio
+
+
+@dataclass(frozen=True, slots=True)
+class TriggerSpec:
+    """Gatilho de campanha: áudio -> texto, ou só texto de template (só mudam os dados, o fluxo é o mesmo)"""
+    label: str  # Nome da etapa para log
+    new_stage: str
+    event: str
+    text: Optional[str] = None  # Texto de acompanhamento (DEPOIS do áudio)
+    template_code: Optional[str] = None  # Template do template_loader enviado como texto (sem áudio)
+    audio_code: Optional[str] = None  # Código do áudio no mapa do template_loader
+    fallback_path: Optional[str] = None  # Caminho direto se o código não estiver no mapa
+    audio_sent: Optional[str] = None  # Nome do áudio registrado no metadata
+    delay: float = DELAY_AFTER_AUDIO  # Delay após o áudio para garantir ordem de entrega
+
+
+_TRIGGER_SPECS: Dict[str, TriggerSpec] = {
+    "bf_oferta": TriggerSpec(
+        audio_code="bf_01_oferta_black_friday",
+        fallback_path="/audios/mini-funil-bf/01-oferta-black-friday.opus",
+        text=BF_OFERTA_TEXT,
+        label="BF",
+        new_stage=BF_AQUECIDO,
+        event="BF_ENTRADA",
+        audio_sent="01-oferta-black-friday",
+    ),
+    "bf_followup": TriggerSpec(
+        audio_code="bf_02_followup_sem_resposta",
+        fallback_path="/audios/mini-funil-bf/02-followup-sem-resposta.opus",
+        text=BF_FOLLOWUP_TEXT,
+        label="BF follow-up",
+        new_stage=BF_FOLLOWUP_ENVIADO,
+        event="BF_FOLLOWUP_1",
+        audio_sent="02-followup-sem-resposta",
+    ),
+    "recup_50_oferta": TriggerSpec(
+        template_code="recuperacao-50-oferta",
+        label="oferta 50%",
+        new_stage=RECUP_50_OFERTA_ENVIADA,
+        event="RECUP_50_DISPARADO",
+    ),
+    "recup_50_followup_1": TriggerSpec(
+        audio_code="recup_50_02_audio_followup",
+        fallback_path="/audios/recuperacao-50/02-audio-followup.opus",
+        text=RECUP_50_FOLLOWUP_1_TEXT,
+        label="recuperação 50% follow-up 1",
+        new_stage=RECUP_50_SEM_RESPOSTA_1,
+        event="RECUP_50_FOLLOWUP_1",
+        audio_sent="02-audio-followup",
+    ),
+    "recup_50_followup_2": TriggerSpec(
+        audio_code="recup_50_03_audio_ultimo_chamado",
+        fallback_path="/audios/recuperacao-50/03-audio-ultimo-chamado.opus",
+        text=RECUP_50_FOLLOWUP_2_TEXT,
+        label="recuperação 50% último chamado",
+        new_stage=RECUP_50_SEM_RESPOSTA_2,
+        event="RECUP_50_FOLLOWUP_2",
+        audio_sent="03-audio-ultimo-chamado",
+    ),
+}
+
+# URL pública final de cada áudio de campanha, preenchida no startup (init_audio_urls)
+_AUDIO_URLS: Dict[str, str] = {}
+
+
+def init_audio_urls() -> Dict[str, str]:
+    """
+    Resolve de uma vez as URLs públicas dos áudios das campanhas.
+    Chamado no startup da API; os códigos e a URL base são fixos no processo.
+    """
+    # Barra final na base + caminho relativo: urljoin mantém prefixos de path da base
+    # (ex: https://host/app/) e não gera "//" quando a variável termina com "/"
+    base_url = CONFIG.campaign_base_url.rstrip("/") + "/"
+    parsed = urlparse(base_url)
+    if parsed.scheme not in ("http", "https") or not parsed.netloc:
+        logger.warning("[AUTOMATION] ⚠️ URL base dos áudios inválida: %s", base_url)
+    
+    for code, audio_path in campaign_audio_paths().items():
+        _AUDIO_URLS[code] = urljoin(base_url, audio_path.lstrip("/"))
+    return _AUDIO_URLS
+
+
+def reload_templates() -> None:
+    """
+    Descarta os caches de templates/áudios usados pelas automações (loader, URLs dos
+    assets, do funil longo e das campanhas) e recalcula as URLs das campanhas.
+    """
+    _clear_template_caches()
+    _clear_asset_caches()
+    refresh_image_urls()
+    _public_audio_url.cache_clear()
+    _AUDIO_URLS.clear()
+    init_audio_urls()
+
+
+def campaign_audio_paths() -> Dict[str, str]:
+    """Caminho (/audios/...) de cada áudio de campanha, por código"""
+    return {
+        spec.audio_code: get_audio_path(spec.audio_code) or spec.fallback_path
+        for spec in _TRIGGER_SPECS.values()
+        if spec.audio_code
+    }
+
+
+def _campaign_audio_url(code: str) -> Optional[str]:
+    """URL pública de um áudio de campanha (inicializa o cache se o startup não rodou)"""
+    if not _AUDIO_URLS:
+        init_audio_urls()
+    return _AUDIO_URLS.get(code)
+
+
+# Textos agendados em background (referência forte para a task não ser coletada pelo GC)
+_PENDING_SENDS: Set[asyncio.Task] = set()
+
+
+async def _run_trigger(phone_number: str, spec: TriggerSpec) -> Tuple[str, TriggerMetadata]:
+    """
+    Executa um gatilho de campanha: áudio seguido do texto de acompanhamento.
+    
+    Returns:
+        Tuple de (new_lead_stage, metadata)
+    """
+    token = _log_context.set({"phone": phone_number, "trigger": spec.label})
+    try:
+        return await _send_trigger(phone_number, spec)
+    finally:
+        _log_context.reset(token)
+
+
+async def _send_trigger(phone_number: str, spec: TriggerSpec) -> Tuple[str, TriggerMetadata]:
+    """
+    Envios do gatilho (chamado por _run_trigger com o contexto de log já definido).
+    Falha de envio não interrompe o gatilho: a parte vai para a dead letter e a etapa é gravada.
+    
+    metadata["dead_letters"] lista só as partes que falharam antes do retorno. No modo
+    sequencial o texto sai em background depois do delay: se ele falhar, a dead letter é
+    gravada normalmente, mas não aparece na metadata (que já foi devolvida).
+    """
+    audio_url = _campaign_audio_url(spec.audio_code) if spec.audio_code else None
+    # Template ausente: nada a enviar como texto (a etapa muda do mesmo jeito)
+    text = get_template_by_code(spec.template_code) if spec.template_code else spec.text
+    failed: List[str] = []
+    
+    if audio_url and CONFIG.parallel_send:
+        audio_ok, text_ok = await asyncio.gather(
+            _deliver(phone_number, spec.label, "audio", audio_url),
+            _deliver(phone_number, spec.label, "text", text),
+        )
+        if audio_ok and text_ok:
+            logger.info("[AUTOMATION] ✅ Áudio + texto %s enviados em paralelo para %s", spec.label, phone_number)
+        failed = [kind for kind, ok in (("audio", audio_ok), ("text", text_ok)) if not ok]
+    elif audio_url:
+        # Início real do envio do áudio (após a fila do rate limit de mídia); sem envio, vale o agora
+        started = [time.monotonic()]
+        
+        def _mark_started() -> None:
+            started[0] = time.monotonic()
+        
+        if await _deliver(phone_number, spec.label, "audio", audio_url, on_send_start=_mark_started):
+            logger.info("[AUTOMATION] ✅ [ORDEM 1/2] Áudio %s enviado para %s", spec.label, phone_number)
+        else:
+            # O texto não pode chegar antes do áudio: vai direto para a dead letter, atrás do
+            # áudio, e o reenvio mantém a ordem
+            failed.append("audio")
+            if text:
+                failed.append("text")
+                await asyncio.to_thread(
+                    _record_dead_letter, phone_number, spec.label, "text", text,
+                    RuntimeError("Áudio anterior não enviado"),
+                )
+            return spec.new_stage, _trigger_metadata(spec, failed)
+        
+        # O delay conta desde a saída da requisição do áudio: o tempo da requisição já é folga
+        # de ordem, mas a espera na fila do rate limit não
+        remaining = max(0.0, spec.delay - (time.monotonic() - started[0]))
+        
+        # O texto sai após o delay em background: quem disparou o gatilho não fica preso no delay
+        task = asyncio.create_task(_delayed_text(phone_number, text, spec.label, remaining))
+        _PENDING_SENDS.add(task)
+        task.add_done_callback(_PENDING_SENDS.discard)
+    elif text:
+        if await _deliver(phone_number, spec.label, "text", text):
+            logger.info("[AUTOMATION] ✅ Texto %s enviado para %s", spec.label, phone_number)
+        else:
+            failed.append("text")
+    
+    return spec.new_stage, _trigger_metadata(spec, failed)
+
+
+def _trigger_metadata(spec: TriggerSpec, failed: List[str]) -> TriggerMetadata:
+    """Metadata gravada na thread após o gatilho"""
+    if spec.template_code:
+        metadata: TriggerMetadata = {"template_sent": spec.template_code, "event": spec.event}
+    else:
+        metadata = {"audio_sent": spec.audio_sent, "event": spec.event}
+    if failed:
+        metadata["dead_letters"] = failed
+    return metadata
+
+
+async def _delayed_text(phone_number: str, text: str, label: str, delay: float) -> None:
+    """Envia o texto de acompanhamento após o delay do áudio (roda como task em background)"""
+    # Delay após áudio para garantir ordem de entrega (só o que falta do DELAY_AFTER_AUDIO)
+    if delay > 0:
+        await asyncio.sleep(delay)
+        logger.debug("[AUTOMATION] ⏳ Delay de %.2fs após áudio %s aplicado (GARANTIR ORDEM DE ENTREGA)", delay, label)
+    if await _deliver(phone_number, label, "text", text):
+        logger.info("[AUTOMATION] ✅ [ORDEM 2/2] Texto %s enviado", label)
+
+
+async def _deliver(
+    phone_number: str,
+    label: str,
+    kind: str,
+    content: str,
+    on_send_start: Optional[Callable[[], None]] = None,
+) -> bool:
+    """Envia áudio ou texto; em caso de erro registra a dead letter e retorna False"""
+    try:
+        if kind == "audio":
+            await twilio_provider.send_audio_async(phone_number, content, "BOT", on_send_start=on_send_start)
+        else:
+            await twilio_provider.send_text_async(phone_number, content, "BOT")
+        return True
+    except Exception as e:
+        logger.exception("[AUTOMATION] ❌ Erro ao enviar %s %s para %s: %s", kind, label, phone_number, e)
+        await asyncio.to_thread(_record_dead_letter, phone_number, label, kind, content, e)
+        return False
+
+
+async def drain_pending_sends() -> None:
+    """Aguarda os textos agendados em background (usado no shutdown para não perder envios)"""
+    if _PENDING_SENDS:
+        await asyncio.gather(*list(_PENDING_SENDS), return_exceptions=True)
+
+
+# ==================== DEAD LETTERS (REENVIO DE FALHAS) ====================
+
+
+def _record_dead_letter(phone_number: str, label: str, kind: str, content: str, error: Exception) -> None:
+    """Grava o envio que falhou na tabela dead_letters (sessão própria, curta; rodar via to_thread)"""
+    db = SessionLocal()
+    try:
+        # last_attempt_at vem do Python (UTC): o backoff do reenvio compara com datetime.utcnow(),
+        # e o server_default usaria o fuso da sessão do banco
+        db.add(DeadLetter(
+            phone=phone_number, trigger=label, kind=kind, content=content,
+            error=str(error)[:500], last_attempt_at=datetime.utcnow(),
+        ))
+        db.commit()
+        logger.warning("[AUTOMATION] 📥 Envio de %s %s para %s guardado para reenvio", kind, label, phone_number)
+    except Exception:
+        db.rollback()
+        logger.exception("[AUTOMATION] ❌ Erro ao gravar dead letter de %s para %s", label, phone_number)
+    finally:
+        db.close()
+
+
+async def replay_dead_letters(db_session, limit: int = 100) -> int:
+    """
+    Reenvia as dead letters pendentes cujo backoff já passou.
+    
+    A espera antes da tentativa N+1 é CONFIG.dead_letter_backoff_seconds * 2^(N-1). Após
+    CONFIG.dead_letter_max_attempts tentativas a linha fica parada para análise manual.
+    O texto de um gatilho só é reenviado depois que o áudio do mesmo gatilho saiu (com o
+    DELAY_AFTER_AUDIO entre os dois); se o áudio esgotou as tentativas, o texto também é
+    dado como esgotado e nunca sai sozinho. As consultas rodam em thread para não travar o event loop.
+    
+    Args:
+        db_session: Sessão do banco
+        limit: Máximo de linhas por rodada
+    
+    Returns:
+        Número de envios reprocessados com sucesso
+    """
+    now = datetime.utcnow()
+    max_attempts = CONFIG.dead_letter_max_attempts
+    rows = await asyncio.to_thread(
+        lambda: db_session.query(DeadLetter)
+        .filter(DeadLetter.resolved_at.is_(None), DeadLetter.attempts < max_attempts)
+        .order_by(DeadLetter.id)
+        .limit(limit)
+        .all()
+    )
+    if not rows:
+        return 0
+    
+    # (telefone, gatilho) cujo áudio esgotou as tentativas: essas linhas não entram na consulta
+    # acima, então são buscadas à parte para o texto não sair sem o áudio
+    audio_exhausted: Set[Tuple[str, str]] = set(await asyncio.to_thread(
+        lambda: db_session.query(DeadLetter.phone, DeadLetter.trigger)
+        .filter(
+            DeadLetter.kind == "audio",
+            DeadLetter.resolved_at.is_(None),
+            DeadLetter.attempts >= max_attempts,
+            DeadLetter.phone.in_({row.phone for row in rows}),
+        )
+        .all()
+    ))
+    
+    delivered = 0
+    # (telefone, gatilho) com áudio ainda pendente: o texto espera o áudio sair primeiro
+    audio_pending: Set[Tuple[str, str]] = set()
+    audio_sent: Set[Tuple[str, str]] = set()
+    for row in rows:
+        key = (row.phone, row.trigger)
+        if row.kind != "audio" and key in audio_exhausted:
+            row.attempts = max_attempts
+            row.error = "Áudio do gatilho esgotou as tentativas; texto não enviado"
+            continue
+        if row.kind != "audio" and key in audio_pending:
+            continue
+        backoff = timedelta(seconds=CONFIG.dead_letter_backoff_seconds * 2 ** (row.attempts - 1))
+        if row.last_attempt_at and now < row.last_attempt_at + backoff:
+            if row.kind == "audio":
+                audio_pending.add(key)
+            continue
+        try:
+            if row.kind == "audio":
+                await twilio_provider.send_audio_async(row.phone, row.content, "BOT")
+                audio_sent.add(key)
+            else:
+                if key in audio_sent:
+                    await asyncio.sleep(DELAY_AFTER_AUDIO)
+                await twilio_provider.send_text_async(row.phone, row.content, "BOT")
+            row.resolved_at = now
+            delivered += 1
+        except Exception as e:
+            row.attempts += 1
+            row.error = str(e)[:500]
+            if row.kind == "audio":
+                audio_pending.add(key)
+                if row.attempts >= max_attempts:
+                    audio_exhausted.add(key)
+        row.last_attempt_at = now
+    
+    await asyncio.to_thread(db_session.commit)
+    if delivered:
+        logger.info("[AUTOMATION] 📤 %d dead letters reenviadas", delivered)
+    return delivered
+
+
+async def dead_letter_replay_loop(interval: float = CONFIG.dead_letter_replay_interval) -> None:
+    """Consumidor em background: reprocessa as dead letters a cada `interval` segundos"""
+    while True:
+        await asyncio.sleep(interval)
+        db = SessionLocal()
+        try:
+            await replay_dead_letters(db)
+        except Exception:
+            await asyncio.to_thread(db.rollback)
+            logger.exception("[AUTOMATION] ❌ Erro ao reprocessar dead letters")
+        finally:
+            db.close()
 
 
 # ==================== AUTOMAÇÃO MINI FUNIL BF ====================
@@ -613,7 +1111,7 @@ async def trigger_bf_funnel(
     phone_number: str,
     db_session = None,
     thread_id: Optional[int] = None
-) -> Tuple[str, Dict[str, Any]]:
+) -> Tuple[str, TriggerMetadata]:
     """
     Dispara entrada no mini funil Black Friday.
     
@@ -625,96 +1123,21 @@ async def trigger_bf_funnel(
     Returns:
         Tuple de (new_lead_stage, metadata)
     """
-    import os
-    
-    metadata = {}
-    
-    # Envia áudio de oferta BF
-    audio_path = get_audio_path("bf_01_oferta_black_friday")
-    if not audio_path:
-        # Fallback: tenta caminho direto
-        audio_path = "/audios/mini-funil-bf/01-oferta-black-friday.opus"
-    
-    if audio_path:
-        files_base = os.getenv("PUBLIC_FILES_BASE_URL", "")
-        public_base = os.getenv("PUBLIC_BASE_URL", "")
-        
-        if files_base and "localhost" not in files_base:
-            base_url = files_base
-        elif public_base and "localhost" not in public_base:
-            base_url = public_base
-        else:
-            base_url = "http://localhost:8000"
-        
-        audio_url = f"{base_url}{audio_path}"
-        await asyncio.to_thread(twilio_provider.send_audio, phone_number, audio_url, "BOT")
-        print(f"[AUTOMATION] ✅ [ORDEM 1/2] Áudio BF enviado para {phone_number}")
-        
-        # Delay após áudio para garantir ordem de entrega
-        await asyncio.sleep(3.0)  # 3.0s após áudio
-        print(f"[AUTOMATION] ⏳ Delay de 3.0s após áudio BF aplicado (GARANTIR ORDEM DE ENTREGA)")
-    
-    # Texto de acompanhamento (DEPOIS do áudio)
-    bf_text = "Gataaaaa, olha issoooo 🔥🔥🔥\n\nSaiu uma condição INSANA da Black Friday, só HOJE!!\n\nQuer saber como funciona pra você aproveitar?"
-    await asyncio.to_thread(twilio_provider.send_text, phone_number, bf_text, "BOT")
-    print(f"[AUTOMATION] ✅ [ORDEM 2/2] Texto BF enviado")
-    
-    new_stage = BF_AQUECIDO
-    metadata["audio_sent"] = "01-oferta-black-friday"
-    metadata["event"] = "BF_ENTRADA"
-    
-    return new_stage, metadata
+    return await _run_trigger(phone_number, _TRIGGER_SPECS["bf_oferta"])
 
 
 async def trigger_bf_followup(
     phone_number: str,
     db_session = None,
     thread_id: Optional[int] = None
-) -> Tuple[str, Dict[str, Any]]:
+) -> Tuple[str, TriggerMetadata]:
     """
     Dispara follow-up do mini funil BF (quando não respondeu).
     
     Returns:
         Tuple de (new_lead_stage, metadata)
     """
-    import os
-    
-    metadata = {}
-    
-    # Envia áudio de follow-up
-    audio_path = get_audio_path("bf_02_followup_sem_resposta")
-    if not audio_path:
-        audio_path = "/audios/mini-funil-bf/02-followup-sem-resposta.opus"
-    
-    if audio_path:
-        files_base = os.getenv("PUBLIC_FILES_BASE_URL", "")
-        public_base = os.getenv("PUBLIC_BASE_URL", "")
-        
-        if files_base and "localhost" not in files_base:
-            base_url = files_base
-        elif public_base and "localhost" not in public_base:
-            base_url = public_base
-        else:
-            base_url = "http://localhost:8000"
-        
-        audio_url = f"{base_url}{audio_path}"
-        await asyncio.to_thread(twilio_provider.send_audio, phone_number, audio_url, "BOT")
-        print(f"[AUTOMATION] ✅ [ORDEM 1/2] Áudio BF follow-up enviado para {phone_number}")
-        
-        # Delay após áudio para garantir ordem de entrega
-        await asyncio.sleep(3.0)  # 3.0s após áudio
-        print(f"[AUTOMATION] ⏳ Delay de 3.0s após áudio BF follow-up aplicado (GARANTIR ORDEM DE ENTREGA)")
-    
-    # Texto de acompanhamento (DEPOIS do áudio)
-    followup_text = "Só passando aqui rapidinho porque essa promoção é literalmente a mais forte do ano 🔥\n\nSe ainda fizer sentido pra você, me chama aqui que te explico antes de acabar!"
-    await asyncio.to_thread(twilio_provider.send_text, phone_number, followup_text, "BOT")
-    print(f"[AUTOMATION] ✅ [ORDEM 2/2] Texto BF follow-up enviado")
-    
-    new_stage = BF_FOLLOWUP_ENVIADO
-    metadata["audio_sent"] = "02-followup-sem-resposta"
-    metadata["event"] = "BF_FOLLOWUP_1"
-    
-    return new_stage, metadata
+    return await _run_trigger(phone_number, _TRIGGER_SPECS["bf_followup"])
 
 
 # ==================== AUTOMAÇÃO RECUPERAÇÃO 50% ====================
@@ -723,7 +1146,7 @@ async def trigger_recup_50_oferta(
     phone_number: str,
     db_session = None,
     thread_id: Optional[int] = None
-) -> Tuple[str, Dict[str, Any]]:
+) -> Tuple[str, TriggerMetadata]:
     """
     Dispara oferta de recuperação 50%.
     
@@ -734,118 +1157,32 @@ async def trigger_recup_50_oferta(
     Returns:
         Tuple de (new_lead_stage, metadata)
     """
-    metadata = {}
-    
-    # Envia template de oferta 50%
-    template_text = get_template_by_code("recuperacao-50-oferta")
-    if template_text:
-        await asyncio.to_thread(twilio_provider.send_text, phone_number, template_text, "BOT")
-        print(f"[AUTOMATION] ✅ Oferta 50% enviada para {phone_number}")
-    
-    new_stage = RECUP_50_OFERTA_ENVIADA
-    metadata["template_sent"] = "recuperacao-50-oferta"
-    metadata["event"] = "RECUP_50_DISPARADO"
-    
-    return new_stage, metadata
+    return await _run_trigger(phone_number, _TRIGGER_SPECS["recup_50_oferta"])
 
 
 async def trigger_recup_50_followup_1(
     phone_number: str,
     db_session = None,
     thread_id: Optional[int] = None
-) -> Tuple[str, Dict[str, Any]]:
+) -> Tuple[str, TriggerMetadata]:
     """
     Primeiro follow-up da recuperação 50% (se não respondeu).
     
     Returns:
         Tuple de (new_lead_stage, metadata)
     """
-    import os
-    
-    metadata = {}
-    
-    # Envia áudio de follow-up
-    audio_path = get_audio_path("recup_50_02_audio_followup")
-    if not audio_path:
-        audio_path = "/audios/recuperacao-50/02-audio-followup.opus"
-    
-    if audio_path:
-        files_base = os.getenv("PUBLIC_FILES_BASE_URL", "")
-        public_base = os.getenv("PUBLIC_BASE_URL", "")
-        
-        if files_base and "localhost" not in files_base:
-            base_url = files_base
-        elif public_base and "localhost" not in public_base:
-            base_url = public_base
-        else:
-            base_url = "http://localhost:8000"
-        
-        audio_url = f"{base_url}{audio_path}"
-        await asyncio.to_thread(twilio_provider.send_audio, phone_number, audio_url, "BOT")
-        print(f"[AUTOMATION] ✅ [ORDEM 1/2] Áudio recuperação 50% follow-up 1 enviado para {phone_number}")
-        
-        # Delay após áudio para garantir ordem de entrega
-        await asyncio.sleep(3.0)  # 3.0s após áudio
-        print(f"[AUTOMATION] ⏳ Delay de 3.0s após áudio recuperação 50% aplicado (GARANTIR ORDEM DE ENTREGA)")
-    
-    # Texto de acompanhamento
-    followup_text = "Te mandei uma condição muito especial pro LIFE e não queria que passasse batido por você, gata. 💖\n\nMe chama aqui se ainda tiver vontade de aproveitar essa oportunidade!"
-    await asyncio.to_thread(twilio_provider.send_text, phone_number, followup_text, "BOT")
-    
-    new_stage = RECUP_50_SEM_RESPOSTA_1
-    metadata["audio_sent"] = "02-audio-followup"
-    metadata["event"] = "RECUP_50_FOLLOWUP_1"
-    
-    return new_stage, metadata
+    return await _run_trigger(phone_number, _TRIGGER_SPECS["recup_50_followup_1"])
 
 
 async def trigger_recup_50_followup_2(
     phone_number: str,
     db_session = None,
     thread_id: Optional[int] = None
-) -> Tuple[str, Dict[str, Any]]:
+) -> Tuple[str, TriggerMetadata]:
     """
     Último follow-up da recuperação 50% (último chamado).
     
     Returns:
         Tuple de (new_lead_stage, metadata)
     """
-    import os
-    
-    metadata = {}
-    
-    # Envia áudio de último chamado
-    audio_path = get_audio_path("recup_50_03_audio_ultimo_chamado")
-    if not audio_path:
-        audio_path = "/audios/recuperacao-50/03-audio-ultimo-chamado.opus"
-    
-    if audio_path:
-        files_base = os.getenv("PUBLIC_FILES_BASE_URL", "")
-        public_base = os.getenv("PUBLIC_BASE_URL", "")
-        
-        if files_base and "localhost" not in files_base:
-            base_url = files_base
-        elif public_base and "localhost" not in public_base:
-            base_url = public_base
-        else:
-            base_url = "http://localhost:8000"
-        
-        audio_url = f"{base_url}{audio_path}"
-        await asyncio.to_thread(twilio_provider.send_audio, phone_number, audio_url, "BOT")
-        print(f"[AUTOMATION] ✅ [ORDEM 1/2] Áudio recuperação 50% último chamado enviado para {phone_number}")
-        
-        # Delay após áudio para garantir ordem de entrega
-        await asyncio.sleep(3.0)  # 3.0s após áudio
-        print(f"[AUTOMATION] ⏳ Delay de 3.0s após áudio recuperação 50% aplicado (GARANTIR ORDEM DE ENTREGA)")
-    
-    # Texto de acompanhamento (DEPOIS do áudio)
-    followup_text = "Prometo que é a última vez que apareço aqui sobre essa condição 🙈\n\nSe ainda bater aquela vontade de começar sua transformação com 50% OFF, é agora ou só na próxima… 😅🔥"
-    await asyncio.to_thread(twilio_provider.send_text, phone_number, followup_text, "BOT")
-    print(f"[AUTOMATION] ✅ [ORDEM 2/2] Texto recuperação 50% último chamado enviado")
-    
-    new_stage = RECUP_50_SEM_RESPOSTA_2
-    metadata["audio_sent"] = "03-audio-ultimo-chamado"
-    metadata["event"] = "RECUP_50_FOLLOWUP_2"
-    
-    return new_stage, metadata
-
+    return await _run_trigger(phone_number, _TRIGGER_SPECS["recup_50_followup_2"])
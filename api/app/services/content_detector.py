@@ -4,7 +4,83 @@ Detector de Conteúdo - Detecta planos e checkout por CONTEÚDO da resposta (nã
 REGRA 2: A decisão NÃO DEPENDE DO USUÁRIO, e sim do CONTEÚDO da resposta gerada pelo LLM
 """
 import re
-from typing import Literal
+from enum import Enum
+from typing import List, Sequence
+
+from .keyword_matcher import compile_keywords
+
+
+class ContentClass(str, Enum):
+    """Categoria do conteúdo da resposta (str: compara e serializa como o nome)"""
+    PLAN_EXPLANATION = "PLAN_EXPLANATION"
+    CHECKOUT = "CHECKOUT"
+    FASE_2 = "FASE_2"
+    OTHER = "OTHER"
+
+
+# Keywords que indicam explicação de planos
+PLAN_KEYWORDS = (
+    "plano mensal",
+    "plano anual",
+    "r$69",
+    "r$ 69",
+    "r$69,90",
+    "r$ 69,90",
+    "12x de r$",
+    "12x de r$ 49",
+    "598,80",
+    "598.80",
+    "acesso ao life",
+    "acesso à base do life",
+    "acesso completo",
+    "pode cancelar quando quiser",
+    "parcelar em até 12x",
+    "módulo exclusivo",
+    "shape slim"
+)
+
+# Keywords que indicam checkout
+CHECKOUT_KEYWORDS = (
+    "edzz.la",
+    "eduzz.la",
+    "finalizar",
+    "checkout",
+    "link pra você",
+    "aqui está o link",
+    "clique aqui",
+    "comprar agora",
+    "assinar agora",
+    "link de compra",
+    "link para comprar"
+)
+
+# Uma passada pela resposta do LLM em vez de uma busca `in` por keyword
+_PLAN_RE = compile_keywords(PLAN_KEYWORDS)
+_CHECKOUT_RE = compile_keywords(CHECKOUT_KEYWORDS)
+
+# Menor keyword de planos/checkout ("r$69"). Respostas mais curtas que isso não casam
+# nada (e o marcador da Fase 2 é bem mais longo), então nem são convertidas para minúsculas
+_MIN_CONTENT_KEYWORD_LEN = min(map(len, (*PLAN_KEYWORDS, *CHECKOUT_KEYWORDS)))
+
+
+def _is_plan_explanation_lower(text_lower: str) -> bool:
+    """is_plan_explanation para texto já em minúsculas"""
+    return _PLAN_RE.search(text_lower) is not None
+
+
+def _is_checkout_lower(text_lower: str) -> bool:
+    """is_checkout para texto já em minúsculas"""
+    return _CHECKOUT_RE.search(text_lower) is not None
+
+
+def _is_fase_2_lower(text_lower: str) -> bool:
+    """Fase 2 (áudio2 + imagens) para texto já em minúsculas"""
+    # Os três marcadores de áudio contêm "audio2": sem ele nenhum casa (caso comum)
+    if "audio2" not in text_lower:
+        return False
+    return ("[áudio enviado: audio2" in text_lower or 
+            "[áudio enviada: audio2" in text_lower or
+            "audio2_dor_generica" in text_lower) and "img_resultado" in text_lower
 
 
 def is_plan_explanation(text: str) -> bool:
@@ -19,33 +95,10 @@ def is_plan_explanation(text: str) -> bool:
     Returns:
         True se contém explicação de planos
     """
-    if not text:
+    if not text or len(text) < _MIN_CONTENT_KEYWORD_LEN:
         return False
     
-    text_lower = text.lower()
-    
-    # Keywords que indicam explicação de planos
-    plan_keywords = [
-        "plano mensal",
-        "plano anual",
-        "r$69",
-        "r$ 69",
-        "r$69,90",
-        "r$ 69,90",
-        "12x de r$",
-        "12x de r$ 49",
-        "598,80",
-        "598.80",
-        "acesso ao life",
-        "acesso à base do life",
-        "acesso completo",
-        "pode cancelar quando quiser",
-        "parcelar em até 12x",
-        "módulo exclusivo",
-        "shape slim"
-    ]
-    
-    return any(keyword in text_lower for keyword in plan_keywords)
+    return _is_plan_explanation_lower(text.lower())
 
 
 def is_checkout(text: str) -> bool:
@@ -58,30 +111,13 @@ def is_checkout(text: str) -> bool:
     Returns:
         True se contém checkout/link
     """
-    if not text:
+    if not text or len(text) < _MIN_CONTENT_KEYWORD_LEN:
         return False
     
-    text_lower = text.lower()
-    
-    # Keywords que indicam checkout
-    checkout_keywords = [
-        "edzz.la",
-        "eduzz.la",
-        "finalizar",
-        "checkout",
-        "link pra você",
-        "aqui está o link",
-        "clique aqui",
-        "comprar agora",
-        "assinar agora",
-        "link de compra",
-        "link para comprar"
-    ]
-    
-    return any(keyword in text_lower for keyword in checkout_keywords)
-
-
-def classify_response_content(text: str) -> Literal["PLAN_EXPLANATION", "CHECKOUT", "FASE_2", "OTHER"]:
+    return _is_checkout_lower(text.lower())
+
+
+def classify_response_content(text: str) -> ContentClass:
     """
     Classifica o conteúdo da resposta do LLM em categorias do funil.
     
@@ -89,29 +125,68 @@ def classify_response_content(text: str) -> Literal["PLAN_EXPLANATION", "CHECKOU
         text: Texto da resposta gerada pelo LLM
     
     Returns:
-        "PLAN_EXPLANATION": Contém explicação de planos
-        "CHECKOUT": Contém link de checkout
-        "FASE_2": Contém áudio2 + imagens (prova social)
-        "OTHER": Outro conteúdo
+        ContentClass.PLAN_EXPLANATION: Contém explicação de planos
+        ContentClass.CHECKOUT: Contém link de checkout
+        ContentClass.FASE_2: Contém áudio2 + imagens (prova social)
+        ContentClass.OTHER: Outro conteúdo
     """
-    if not text:
-        return "OTHER"
+    if not text or len(text) < _MIN_CONTENT_KEYWORD_LEN:
+        return ContentClass.OTHER
     
     text_lower = text.lower()
     
     # Prioridade 1: Checkout (não deve ter áudio3)
-    if is_checkout(text):
-        return "CHECKOUT"
+    if _is_checkout_lower(text_lower):
+        return ContentClass.CHECKOUT
     
     # Prioridade 2: Explicação de planos (deve ter áudio3 antes)
-    if is_plan_explanation(text):
-        return "PLAN_EXPLANATION"
+    if _is_plan_explanation_lower(text_lower):
+        return ContentClass.PLAN_EXPLANATION
     
     # Prioridade 3: Fase 2 (áudio2 + imagens)
-    if ("[áudio enviado: audio2" in text_lower or 
-        "[áudio enviada: audio2" in text_lower or
-        "audio2_dor_generica" in text_lower) and "img_resultado" in text_lower:
-        return "FASE_2"
+    if _is_fase_2_lower(text_lower):
+        return ContentClass.FASE_2
+    
+    return ContentClass.OTHER
+
+
+def classify_many(texts: Sequence[str]) -> List[ContentClass]:
+    """
+    classify_response_content em lote (backfill/reprocessamento de histórico).
     
-    return "OTHER"
+    Args:
+        texts: Respostas do LLM
+    
+    Returns:
+        Lista de ContentClass na mesma ordem de `texts`
+    """
+    # Regexes, helpers e constantes em variáveis locais: o laço não consulta globais a cada texto
+    checkout_search = _CHECKOUT_RE.search
+    plan_search = _PLAN_RE.search
+    is_fase_2 = _is_fase_2_lower
+    min_len = _MIN_CONTENT_KEYWORD_LEN
+    other = ContentClass.OTHER
+    checkout = ContentClass.CHECKOUT
+    plan_explanation = ContentClass.PLAN_EXPLANATION
+    fase_2 = ContentClass.FASE_2
+    
+    results = []
+    append = results.append
+    for text in texts:
+        if not text or len(text) < min_len:
+            append(other)
+            continue
+        
+        # Mesma prioridade de classify_response_content: checkout > planos > fase 2
+        text_lower = text.lower()
+        if checkout_search(text_lower):
+            append(checkout)
+        elif plan_search(text_lower):
+            append(plan_explanation)
+        elif is_fase_2(text_lower):
+            append(fase_2)
+        else:
+            append(other)
+    
+    return results
 
@@ -3,8 +3,26 @@
 Serviço para detectar e extrair emails de mensagens.
 """
 import re
+import logging
 from typing import Optional
 
+logger = logging.getLogger(__name__)
+
+# RE2 (autômato, sem backtracking) garante busca linear mesmo em mensagens hostis
+# como "a@a.a.a.a..." longas, que no `re` padrão custam tempo quadrático.
+# Sem a lib instalada, cai no `re` do Python com o mesmo padrão.
+try:
+    import re2 as _regex_engine
+    RE2_AVAILABLE = True
+except ImportError:
+    _regex_engine = re
+    RE2_AVAILABLE = False
+    logger.warning("[EMAIL_DETECTOR] google-re2 não instalado, usando re padrão. Instale: pip install google-re2")
+
+
+# Regex para email (bem comum), compilada uma vez no import
+_EMAIL_RE = _regex_engine.compile(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}\b')
+
 
 def extract_email_from_text(text: str) -> Optional[str]:
     """
@@ -16,17 +34,15 @@ def extract_email_from_text(text: str) -> Optional[str]:
     Returns:
         Email encontrado ou None
     """
-    if not text:
+    # Sem "@" não há email: evita rodar a regex na maioria das mensagens
+    if not text or "@" not in text:
         return None
     
-    # Regex para email (bem comum)
-    email_pattern = r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b'
-    
-    matches = re.findall(email_pattern, text)
+    # Só o primeiro email interessa: search() para no primeiro match, sem montar lista
+    match = _EMAIL_RE.search(text)
     
-    if matches:
-        # Retorna o primeiro email encontrado
-        email = matches[0].lower().strip()
+    if match:
+        email = match.group(0).lower()
         # Validação básica
         if len(email) > 5 and "@" in email and "." in email.split("@")[1]:
             return email
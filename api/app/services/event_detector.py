@@ -3,8 +3,168 @@
 Detector de Eventos - Converte mensagens do lead em EventType
 """
 import re
-from typing import Optional, Dict, Any
+from types import MappingProxyType
+from typing import Optional, Dict, Any, Callable, FrozenSet
 from .state_machine import EventType, FunilLongoStep, BFMiniStep
+from .keyword_matcher import compile_tagged_keywords, fold_accents, normalize_message
+
+
+# ==================== PALAVRAS-CHAVE POR EVENTO ====================
+# Todos os buckets numa varredura única por mensagem (compile_tagged_keywords devolve
+# o conjunto de buckets presentes); cada etapa só testa os buckets que lhe interessam.
+# A busca ignora acentos ("nao funciona" casa "não funciona")
+
+_EVENT_KEYWORDS = {
+    # Dor/objetivo (L1/L2)
+    "pain": (
+        "emagrecer", "secar", "perder peso", "gordura",
+        "massa", "bumbum", "ganhar", "aumentar",
+        "pochete", "flacidez", "celulite",
+        "alimentação", "dieta", "resultado não vem",
+        "autoestima", "motivação", "confiança"
+    ),
+    # Pedido de preço direto (L1/L2)
+    "asks_price": ("preço", "quanto custa", "valores", "planos"),
+    # Objeção (L2/L3)
+    "objection": (
+        "sem tempo", "sem dinheiro", "não sei se consigo",
+        "não funciona", "caro", "difícil", "não tenho",
+        "não dá", "impossível"
+    ),
+    # Interesse (L2/L3)
+    "interest": (
+        "sim", "pode", "quero", "legal", "ok", "entendi",
+        "faz sentido", "gostei", "quero saber", "me explica",
+        "conta pra mim", "me mostra"
+    ),
+    # Dúvida técnica (L2/L3)
+    "technical": (
+        "como funciona", "tem dieta", "tem treino",
+        "serve pra", "tem suporte", "tem app"
+    ),
+    # Confirma que quer ver os planos (L4)
+    "confirms_plans": ("sim", "pode", "quero", "claro", "pode ser"),
+    # Pede preço mesmo assim (L4)
+    "asks_price_again": ("preço", "quanto", "valores"),
+    # Escolha de plano / dúvida sobre planos (L5)
+    "chooses_mensal": ("mensal", "quero o mensal", "vou querer o mensal"),
+    "chooses_anual": ("anual", "quero o anual", "vou querer o anual"),
+    "plans_question": ("parcelamento", "cancelamento", "conteúdo", "suporte", "dúvida"),
+    # Compra confirmada / erro no pagamento (L6/L7/BF3)
+    "confirms_purchase_ok": ("comprei", "finalizei", "paguei", "ok"),
+    "confirms_purchase": ("comprei", "finalizei", "paguei"),
+    "purchase_error": ("erro", "não passou", "cartão negado", "deu erro"),
+    # Mini funil BF
+    "bf_confirms": ("quero", "manda", "sim", "pode"),
+    "bf_objection": ("caro", "sem dinheiro", "depois"),
+}
+
+_scan_event_keywords = compile_tagged_keywords(_EVENT_KEYWORDS, accent_insensitive=True)
+
+# Mensagens que contam como vazias (comparação exata, não substring)
+_EMPTY_TOKENS = frozenset({"?", "??", "1", "ok"})
+
+# Handler de etapa: (buckets encontrados, mensagem) -> evento, ou None para o default do fluxo
+StepHandler = Callable[[FrozenSet[str], str], Optional[EventType]]
+
+
+def _first_hit(*rules) -> StepHandler:
+    """Handler que devolve o evento do primeiro bucket (na ordem dada) presente na mensagem"""
+    def handler(hits: FrozenSet[str], message_lower: str) -> Optional[EventType]:
+        for bucket, event in rules:
+            if bucket in hits:
+                return event
+        return None
+    return handler
+
+
+def _check_dor(hits: FrozenSet[str], message_lower: str) -> Optional[EventType]:
+    """L1/L2: dor/objetivo, pedido de preço direto ou mensagem vazia"""
+    if "pain" in hits:
+        return EventType.DESCRIBES_PAIN
+    if "asks_price" in hits:
+        return EventType.ASKS_PRICE
+    if len(message_lower) <= 2 or message_lower in _EMPTY_TOKENS:
+        return EventType.EMPTY_MESSAGE
+    return None
+
+
+# L2/L3: objeção, interesse ou dúvida técnica
+_check_objecao = _first_hit(
+    ("objection", EventType.OBJECTION),
+    ("interest", EventType.INTEREST),
+    ("technical", EventType.ASKS_TECHNICAL),
+)
+
+
+def _check_coleta_dor(hits: FrozenSet[str], message_lower: str) -> Optional[EventType]:
+    """L2 participa dos dois grupos: primeiro dor, depois objeção"""
+    return _check_dor(hits, message_lower) or _check_objecao(hits, message_lower)
+
+
+# Só o handler da etapa atual roda; etapas sem handler caem direto no default
+_FUNIL_LONGO_STEP_HANDLERS = MappingProxyType({
+    FunilLongoStep.L1_ABERTURA: _check_dor,
+    FunilLongoStep.L2_COLETA_DOR: _check_coleta_dor,
+    FunilLongoStep.L3_DECISAO_OBJECAO: _check_objecao,
+    # Confirma que quer planos / pede preço mesmo assim
+    FunilLongoStep.L4_PERGUNTA_PLANOS: _first_hit(
+        ("confirms_plans", EventType.CONFIRMS_PLANS),
+        ("asks_price_again", EventType.ASKS_PRICE),
+    ),
+    # Escolhe mensal / anual / dúvida sobre planos
+    FunilLongoStep.L5_PLANOS: _first_hit(
+        ("chooses_mensal", EventType.CHOOSES_MENSAL),
+        ("chooses_anual", EventType.CHOOSES_ANUAL),
+        ("plans_question", EventType.ASKS_TECHNICAL),
+    ),
+    # Confirma compra / erro no pagamento
+    FunilLongoStep.L6_ESCOLHA_PLANO: _first_hit(
+        ("confirms_purchase_ok", EventType.CONFIRMS_PURCHASE),
+        ("purchase_error", EventType.PURCHASE_ERROR),
+    ),
+    # "deu erro" já contém "erro": mesmo bucket da L6
+    FunilLongoStep.L7_AGUARDANDO_COMPRA: _first_hit(
+        ("confirms_purchase", EventType.CONFIRMS_PURCHASE),
+        ("purchase_error", EventType.PURCHASE_ERROR),
+    ),
+})
+
+_BF_STEP_HANDLERS = MappingProxyType({
+    # Confirma interesse / objeção
+    BFMiniStep.BF1_OFERTA: _first_hit(
+        ("bf_confirms", EventType.BF_CONFIRMS),
+        ("bf_objection", EventType.BF_OBJECTION),
+    ),
+    BFMiniStep.BF2_AGUARDANDO: _first_hit(
+        ("bf_confirms", EventType.BF_CONFIRMS),
+        ("bf_objection", EventType.BF_OBJECTION),
+    ),
+    BFMiniStep.BF3_AGUARDANDO_COMPRA: _first_hit(
+        ("confirms_purchase", EventType.CONFIRMS_PURCHASE),
+    ),
+})
+
+# Webhook: uma varredura por campo; "paid"/"declined"/"chargeback" só valem no status
+_scan_webhook_status = compile_tagged_keywords({
+    EventType.WEBHOOK_PAID: ("approved", "paid"),
+    EventType.WEBHOOK_PENDING: ("pending",),
+    EventType.WEBHOOK_FAILED: ("failed", "declined"),
+    EventType.WEBHOOK_REFUNDED: ("refunded", "chargeback"),
+})
+_scan_webhook_event_type = compile_tagged_keywords({
+    EventType.WEBHOOK_PAID: ("approved",),
+    EventType.WEBHOOK_PENDING: ("pending",),
+    EventType.WEBHOOK_FAILED: ("failed",),
+    EventType.WEBHOOK_REFUNDED: ("refunded",),
+})
+# Se status e event_type indicarem eventos diferentes, vale o primeiro desta ordem
+_WEBHOOK_PRIORITY = (
+    EventType.WEBHOOK_PAID,
+    EventType.WEBHOOK_PENDING,
+    EventType.WEBHOOK_FAILED,
+    EventType.WEBHOOK_REFUNDED,
+)
 
 
 class EventDetector:
@@ -29,7 +189,8 @@ class EventDetector:
         Returns:
             EventType detectado
         """
-        message_lower = message.lower().strip()
+        # Sem acentos uma única vez (troca 1 para 1: tamanho e tokens exatos não mudam)
+        message_lower = fold_accents(normalize_message(message))
         
         # Primeira mensagem
         if is_first_message or not current_step:
@@ -47,117 +208,18 @@ class EventDetector:
     @staticmethod
     def _detect_first_contact(message_lower: str) -> EventType:
         """Detecta primeiro contato"""
-        first_contact_keywords = [
-            "oi", "olá", "bom dia", "boa tarde", "boa noite",
-            "quero saber", "quero entrar", "como funciona",
-            "valores", "preço", "quanto custa"
-        ]
-        
-        if any(keyword in message_lower for keyword in first_contact_keywords):
-            return EventType.FIRST_CONTACT
-        
-        return EventType.FIRST_CONTACT  # Default
+        # Saudação ("oi", "bom dia"), "quero saber", "quanto custa" etc. ou qualquer outra
+        # mensagem: o primeiro contato é sempre FIRST_CONTACT, então não há o que varrer
+        return EventType.FIRST_CONTACT
     
     @staticmethod
     def _detect_funil_longo_event(message_lower: str, current_step: str) -> EventType:
         """Detecta eventos do funil longo baseado na etapa atual"""
-        
-        # L1_ABERTURA ou L2_COLETA_DOR
-        if current_step in [FunilLongoStep.L1_ABERTURA, FunilLongoStep.L2_COLETA_DOR]:
-            # Detecta dor/objetivo
-            pain_keywords = [
-                "emagrecer", "secar", "perder peso", "gordura",
-                "massa", "bumbum", "ganhar", "aumentar",
-                "pochete", "flacidez", "celulite",
-                "alimentação", "dieta", "resultado não vem",
-                "autoestima", "motivação", "confiança"
-            ]
-            
-            if any(keyword in message_lower for keyword in pain_keywords):
-                return EventType.DESCRIBES_PAIN
-            
-            # Detecta pedido de preço direto
-            if any(word in message_lower for word in ["preço", "quanto custa", "valores", "planos"]):
-                return EventType.ASKS_PRICE
-            
-            # Mensagem vazia
-            if len(message_lower) <= 2 or message_lower in ["?", "??", "1", "ok"]:
-                return EventType.EMPTY_MESSAGE
-        
-        # L2_COLETA_DOR ou L3_DECISAO_OBJECAO
-        if current_step in [FunilLongoStep.L2_COLETA_DOR, FunilLongoStep.L3_DECISAO_OBJECAO]:
-            # Detecta objeção
-            objection_keywords = [
-                "sem tempo", "sem dinheiro", "não sei se consigo",
-                "não funciona", "caro", "difícil", "não tenho",
-                "não dá", "impossível"
-            ]
-            
-            if any(keyword in message_lower for keyword in objection_keywords):
-                return EventType.OBJECTION
-            
-            # Detecta interesse
-            interest_keywords = [
-                "sim", "pode", "quero", "legal", "ok", "entendi",
-                "faz sentido", "gostei", "quero saber", "me explica",
-                "conta pra mim", "me mostra"
-            ]
-            
-            if any(keyword in message_lower for keyword in interest_keywords):
-                return EventType.INTEREST
-            
-            # Detecta dúvida técnica
-            technical_keywords = [
-                "como funciona", "tem dieta", "tem treino",
-                "serve pra", "tem suporte", "tem app"
-            ]
-            
-            if any(keyword in message_lower for keyword in technical_keywords):
-                return EventType.ASKS_TECHNICAL
-        
-        # L4_PERGUNTA_PLANOS
-        if current_step == FunilLongoStep.L4_PERGUNTA_PLANOS:
-            # Confirma que quer planos
-            confirm_keywords = ["sim", "pode", "quero", "claro", "pode ser"]
-            
-            if any(keyword in message_lower for keyword in confirm_keywords):
-                return EventType.CONFIRMS_PLANS
-            
-            # Pede preço mesmo assim
-            if any(word in message_lower for word in ["preço", "quanto", "valores"]):
-                return EventType.ASKS_PRICE
-        
-        # L5_PLANOS
-        if current_step == FunilLongoStep.L5_PLANOS:
-            # Escolhe mensal
-            if any(word in message_lower for word in ["mensal", "quero o mensal", "vou querer o mensal"]):
-                return EventType.CHOOSES_MENSAL
-            
-            # Escolhe anual
-            if any(word in message_lower for word in ["anual", "quero o anual", "vou querer o anual"]):
-                return EventType.CHOOSES_ANUAL
-            
-            # Dúvida sobre planos
-            if any(word in message_lower for word in ["parcelamento", "cancelamento", "conteúdo", "suporte", "dúvida"]):
-                return EventType.ASKS_TECHNICAL
-        
-        # L6_ESCOLHA_PLANO
-        if current_step == FunilLongoStep.L6_ESCOLHA_PLANO:
-            # Confirma compra
-            if any(word in message_lower for word in ["comprei", "finalizei", "paguei", "ok"]):
-                return EventType.CONFIRMS_PURCHASE
-            
-            # Erro no pagamento
-            if any(word in message_lower for word in ["erro", "não passou", "cartão negado", "deu erro"]):
-                return EventType.PURCHASE_ERROR
-        
-        # L7_AGUARDANDO_COMPRA
-        if current_step == FunilLongoStep.L7_AGUARDANDO_COMPRA:
-            if any(word in message_lower for word in ["comprei", "finalizei", "paguei"]):
-                return EventType.CONFIRMS_PURCHASE
-            
-            if any(word in message_lower for word in ["erro", "não passou", "cartão negado"]):
-                return EventType.PURCHASE_ERROR
+        handler = _FUNIL_LONGO_STEP_HANDLERS.get(current_step)
+        if handler is not None:
+            event = handler(_scan_event_keywords(message_lower), message_lower)
+            if event is not None:
+                return event
         
         # Mensagem vazia ou sem sentido
         if len(message_lower) <= 2:
@@ -169,21 +231,11 @@ class EventDetector:
     @staticmethod
     def _detect_bf_event(message_lower: str, current_step: str) -> EventType:
         """Detecta eventos do mini funil BF"""
-        
-        # BF1_OFERTA ou BF2_AGUARDANDO
-        if current_step in [BFMiniStep.BF1_OFERTA, BFMiniStep.BF2_AGUARDANDO]:
-            # Confirma interesse
-            if any(word in message_lower for word in ["quero", "manda", "sim", "pode"]):
-                return EventType.BF_CONFIRMS
-            
-            # Objeção
-            if any(word in message_lower for word in ["caro", "sem dinheiro", "depois"]):
-                return EventType.BF_OBJECTION
-        
-        # BF3_AGUARDANDO_COMPRA
-        if current_step == BFMiniStep.BF3_AGUARDANDO_COMPRA:
-            if any(word in message_lower for word in ["comprei", "finalizei", "paguei"]):
-                return EventType.CONFIRMS_PURCHASE
+        handler = _BF_STEP_HANDLERS.get(current_step)
+        if handler is not None:
+            event = handler(_scan_event_keywords(message_lower), message_lower)
+            if event is not None:
+                return event
         
         return EventType.NO_RESPONSE
     
@@ -193,17 +245,12 @@ class EventDetector:
         status = webhook_data.get("status", "").lower()
         event_type = webhook_data.get("event_type", "").lower()
         
-        if "approved" in status or "paid" in status or "approved" in event_type:
-            return EventType.WEBHOOK_PAID
-        
-        if "pending" in status or "pending" in event_type:
-            return EventType.WEBHOOK_PENDING
-        
-        if "failed" in status or "declined" in status or "failed" in event_type:
-            return EventType.WEBHOOK_FAILED
-        
-        if "refunded" in status or "chargeback" in status or "refunded" in event_type:
-            return EventType.WEBHOOK_REFUNDED
+        hits = _scan_webhook_status(status) | _scan_webhook_event_type(event_type)
+        if not hits:
+            return None
         
+        for event in _WEBHOOK_PRIORITY:
+            if event in hits:
+                return event
         return None
 
@@ -1,8 +1,111 @@
 # api/app/services/funnel_detector.py
 """Detecta automaticamente qual funil e etapa um lead deve entrar baseado na mensagem"""
+from functools import lru_cache
 from typing import Dict, Any, Optional, Tuple
 import re
 
+from .keyword_matcher import compile_tagged_keywords, fold_accents, normalize_message
+
+
+# Funil Longo (LIFE) - padrão principal
+LIFE_KEYWORDS = (
+    "life", "quero saber", "como funciona", "emagrecer", "emagrecimento",
+    "transformar", "corpo", "barriga", "perder peso", "definir", "ganhar massa",
+    "treino", "dieta", "nutrição", "fitness", "academia", "exercício"
+)
+
+# Mini Funil Black Friday
+BF_KEYWORDS = ("black friday", "bf", "promoção", "oferta especial")
+
+# Funil de Recuperação 50%
+RECOVERY_KEYWORDS = ("desconto 50", "50%", "recuperação", "não comprei", "não comprou")
+
+# Mensagem que pode tirar o lead do funil atual (BF ou recuperação)
+FUNNEL_SWITCH_KEYWORDS = ("black friday", "bf", "promoção", "desconto 50", "50%")
+
+# Tags adicionais baseadas no conteúdo (nome da tag -> keywords)
+TAG_KEYWORDS = {
+    # Tags de dor/objetivo
+    "dor_barriga": ("barriga", "abdomen", "pochete", "flacidez"),
+    "dor_emagrecimento": ("emagrecer", "perder peso", "emagrecimento"),
+    "dor_ganho_massa": ("ganhar massa", "massa muscular", "hipertrofia"),
+    "dor_autoestima": ("autoestima", "auto estima", "vergonha", "espelho"),
+    "dor_composicao": ("celulite", "flacidez", "pele"),
+    # Tags de urgência
+    "urgente": ("urgente", "rápido", "logo", "agora"),
+    # Tags de interesse
+    "interessado": ("quero", "gostaria", "interessado", "interesse"),
+}
+
+# Funil, tags e source numa única varredura da mensagem ("members" cobre "the members").
+# A busca ignora acentos, então as listas não repetem a grafia sem acento
+_scan_funnel_keywords = compile_tagged_keywords({
+    "funnel_switch": FUNNEL_SWITCH_KEYWORDS,
+    "funnel_life": LIFE_KEYWORDS,
+    "funnel_bf": BF_KEYWORDS,
+    "funnel_recovery": RECOVERY_KEYWORDS,
+    **TAG_KEYWORDS,
+    "source_eduzz": ("eduzz",),
+    "source_comprou": ("comprou",),
+    "source_members": ("members",),
+}, accent_insensitive=True)
+
+
+@lru_cache(maxsize=2048)
+def _detect_cached(message_lower: str, is_first_message: bool) -> Tuple:
+    """
+    Parte da detecção que depende só da mensagem normalizada: a mesma mensagem
+    reprocessada (retries do webhook, checagens de idempotência) não refaz a varredura.
+    
+    Returns:
+        (pede_troca_de_funil, funnel_id, stage_id, source, tags); tags em tupla
+        para o resultado em cache não ser alterado por quem chama.
+    """
+    hits = _scan_funnel_keywords(message_lower)
+    
+    funnel_id = None
+    stage_id = None
+    source = "WhatsApp orgânico"  # Default
+    # Tags em ordem de detecção; duplicatas saem no final com dict.fromkeys
+    tags = []
+    
+    # 1. DETECÇÃO DE FUNIL
+    
+    # Detecta qual funil (BF > Recuperação > Funil Longo, o padrão)
+    if "funnel_bf" in hits:
+        funnel_id = "2"  # Mini Funil BF
+        stage_id = "1"  # Etapa inicial: Oferta Black Friday
+        source = "Black Friday"
+        tags.extend(("black_friday", "promoção"))
+    elif "funnel_recovery" in hits:
+        funnel_id = "3"  # Funil de Recuperação 50%
+        stage_id = "1"  # Etapa inicial: Oferta 50%
+        source = "Recuperação pós-plataforma"
+        tags.extend(("recuperação", "desconto_50"))
+    elif "funnel_life" in hits or is_first_message:
+        # Funil Longo é o padrão
+        funnel_id = "1"  # Funil Longo (LIFE)
+        stage_id = "1"  # Etapa inicial: Boas-vindas e Qualificação
+        source = "WhatsApp orgânico"
+        tags.extend(("life", "interessado"))
+    
+    # 2. DETECÇÃO DE TAGS ADICIONAIS baseadas no conteúdo
+    
+    # Tags de dor/objetivo, urgência e interesse
+    for tag in TAG_KEYWORDS:
+        if tag in hits:
+            tags.append(tag)
+    
+    # 3. DETECÇÃO DE SOURCE mais específica
+    
+    # Se menciona Eduzz, The Members, etc.
+    if "source_eduzz" in hits:
+        source = "Eduzz compra" if "source_comprou" in hits else "Eduzz abandono"
+    elif "source_members" in hits:
+        source = "The Members"
+    
+    return "funnel_switch" in hits, funnel_id, stage_id, source, tuple(dict.fromkeys(tags))
+
 
 def detect_funnel_and_stage(
     message: str,
@@ -20,12 +123,14 @@ def detect_funnel_and_stage(
     Returns:
         Dict com funnel_id, stage_id, source, tags, etc.
     """
-    message_lower = message.lower().strip()
+    switch, funnel_id, stage_id, source, tags = _detect_cached(
+        fold_accents(normalize_message(message)), bool(is_first_message)
+    )
     
     # Se já está em um funil, mantém (a menos que seja uma nova entrada explícita)
     if thread_meta and thread_meta.get("funnel_id") and not is_first_message:
         # Verifica se a mensagem indica mudança de funil
-        if any(keyword in message_lower for keyword in ["black friday", "bf", "promoção", "desconto 50", "50%"]):
+        if switch:
             # Pode ser um funil específico (BF ou recuperação)
             pass  # Continua para detectar
         else:
@@ -37,83 +142,13 @@ def detect_funnel_and_stage(
                 "tags": thread_meta.get("tags", []),
             }
     
-    # Detecção de funil baseada na mensagem
-    result = {
-        "funnel_id": None,
-        "stage_id": None,
-        "source": "WhatsApp orgânico",  # Default
-        "tags": [],
+    # Dict e lista novos a cada chamada: o cache guarda só valores imutáveis
+    return {
+        "funnel_id": funnel_id,
+        "stage_id": stage_id,
+        "source": source,
+        "tags": list(tags),
     }
-    
-    # 1. DETECÇÃO DE FUNIL
-    
-    # Funil Longo (LIFE) - padrão principal
-    # Palavras-chave: "life", "quero saber", "como funciona", "emagrecer", "transformar", etc.
-    life_keywords = [
-        "life", "quero saber", "como funciona", "emagrecer", "emagrecimento",
-        "transformar", "corpo", "barriga", "perder peso", "definir", "ganhar massa",
-        "treino", "dieta", "nutrição", "fitness", "academia", "exercício"
-    ]
-    
-    # Mini Funil Black Friday
-    bf_keywords = ["black friday", "bf", "promoção", "promocao", "oferta especial"]
-    
-    # Funil de Recuperação 50%
-    recovery_keywords = ["desconto 50", "50%", "recuperação", "recuperacao", "não comprei", "não comprou"]
-    
-    # Detecta qual funil
-    if any(keyword in message_lower for keyword in bf_keywords):
-        result["funnel_id"] = "2"  # Mini Funil BF
-        result["stage_id"] = "1"  # Etapa inicial: Oferta Black Friday
-        result["source"] = "Black Friday"
-        result["tags"] = ["black_friday", "promoção"]
-    elif any(keyword in message_lower for keyword in recovery_keywords):
-        result["funnel_id"] = "3"  # Funil de Recuperação 50%
-        result["stage_id"] = "1"  # Etapa inicial: Oferta 50%
-        result["source"] = "Recuperação pós-plataforma"
-        result["tags"] = ["recuperação", "desconto_50"]
-    elif any(keyword in message_lower for keyword in life_keywords) or is_first_message:
-        # Funil Longo é o padrão
-        result["funnel_id"] = "1"  # Funil Longo (LIFE)
-        result["stage_id"] = "1"  # Etapa inicial: Boas-vindas e Qualificação
-        result["source"] = "WhatsApp orgânico"
-        result["tags"] = ["life", "interessado"]
-    
-    # 2. DETECÇÃO DE TAGS ADICIONAIS baseadas no conteúdo
-    
-    tags = result.get("tags", [])
-    
-    # Tags de dor/objetivo
-    if any(word in message_lower for word in ["barriga", "abdomen", "pochete", "flacidez"]):
-        tags.append("dor_barriga")
-    if any(word in message_lower for word in ["emagrecer", "perder peso", "emagrecimento"]):
-        tags.append("dor_emagrecimento")
-    if any(word in message_lower for word in ["ganhar massa", "massa muscular", "hipertrofia"]):
-        tags.append("dor_ganho_massa")
-    if any(word in message_lower for word in ["autoestima", "auto estima", "vergonha", "espelho"]):
-        tags.append("dor_autoestima")
-    if any(word in message_lower for word in ["celulite", "flacidez", "pele"]):
-        tags.append("dor_composicao")
-    
-    # Tags de urgência
-    if any(word in message_lower for word in ["urgente", "rápido", "logo", "agora"]):
-        tags.append("urgente")
-    
-    # Tags de interesse
-    if any(word in message_lower for word in ["quero", "gostaria", "interessado", "interesse"]):
-        tags.append("interessado")
-    
-    result["tags"] = list(set(tags))  # Remove duplicatas
-    
-    # 3. DETECÇÃO DE SOURCE mais específica
-    
-    # Se menciona Eduzz, The Members, etc.
-    if "eduzz" in message_lower:
-        result["source"] = "Eduzz compra" if "comprou" in message_lower else "Eduzz abandono"
-    elif "the members" in message_lower or "members" in message_lower:
-        result["source"] = "The Members"
-    
-    return result
 
 
 def should_advance_stage(
@@ -4,12 +4,22 @@ Pacotes fixos do funil - execução determinística sem LLM.
 Garante ordem, quebras e delays fixos para pontos críticos.
 """
 import asyncio
+import logging
 import os
-from typing import List, Dict, Any, Optional, Tuple
+import random
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
 
+import httpx
+
+from ..db import SessionLocal
+from ..models import Message
 from ..providers import twilio as twilio_provider
 from .assets_library import resolve_audio_url, resolve_image_url
 
+logger = logging.getLogger(__name__)
+
 
 # ==================== DELAYS FIXOS ====================
 # CRÍTICO: Delays aumentados para garantir que WhatsApp processe e entregue cada mensagem
@@ -44,129 +54,217 @@ FASE_3_PLANOS = """✅ Plano Mensal — R$69,90/mês
 • Pode parcelar em até 12x."""
 FASE_3_PERGUNTA = "Agora me fala: qual plano faz mais sentido pra você?"
 
+# Textos fixos codificados para o corpo do POST uma única vez
+twilio_provider.preencode_form_values(FASE_2_PERGUNTA, FASE_3_INTRO, FASE_3_PLANOS, FASE_3_PERGUNTA)
 
-# ==================== PACOTE FASE 2 (DOR/OBJETIVO) ====================
 
-async def execute_pacote_fase_2(
-    phone_number: str,
-    audio_id: str = "audio2_dor_generica",
-    db_session = None,
-    thread_id: Optional[int] = None
-) -> Tuple[List[str], Dict[str, Any]]:
+# ==================== ASSETS FIXOS ====================
+
+# 8 imagens de prova social do PACOTE_FASE_2, na ordem de envio
+FASE_2_IMAGE_IDS = (
+    "img_resultado_01", "img_resultado_02", "img_resultado_03", "img_resultado_04",
+    "img_resultado_05", "img_resultado_06", "img_resultado_07", "img_resultado_08",
+)
+
+# (image_id, url) já resolvidos no startup: o laço de envio não resolve nada por lead.
+# Não resolve no import para não fixar a URL base antes da configuração do app
+_FASE_2_IMAGES: Tuple[Tuple[str, Optional[str]], ...] = ()
+
+
+def refresh_image_urls() -> None:
+    """Resolve as URLs das imagens fixas (no startup e no reload de templates/assets)"""
+    global _FASE_2_IMAGES
+    _FASE_2_IMAGES = tuple((image_id, resolve_image_url(image_id)) for image_id in FASE_2_IMAGE_IDS)
+
+
+# ==================== RETRY DE ENVIO ====================
+
+# Falhas transitórias do Twilio/WhatsApp (limite de vazão, indisponibilidade)
+RETRYABLE_STATUS = frozenset({429, 500, 502, 503, 504})
+SEND_MAX_ATTEMPTS = 4  # Espera 1s, 4s e 16s (+ jitter) entre as tentativas
+
+
+def _is_retryable(error: Exception) -> bool:
+    """Só erros HTTP transitórios; erro de rede não, pois o Twilio pode ter aceitado a mensagem"""
+    if not isinstance(error, httpx.HTTPStatusError):
+        return False
+    if error.response.status_code in RETRYABLE_STATUS:
+        return True
+    detail = error.response.text.lower()
+    return "rate limit" in detail or "quota" in detail
+
+
+async def _send_with_retry(send: Callable[..., Awaitable[str]], *args, max_attempts: int = SEND_MAX_ATTEMPTS) -> str:
     """
-    Executa PACOTE_FASE_2 fixo: áudio + 8 imagens + textos.
-    
-    Args:
-        phone_number: Número do destinatário (E.164)
-        audio_id: ID do áudio (padrão: audio2_dor_generica)
-        db_session: Sessão do banco (opcional)
-        thread_id: ID da thread (opcional)
-    
-    Returns:
-        Tuple de (mensagens_enviadas, metadados)
+    Executa o envio com backoff exponencial + jitter nas falhas transitórias.
+    A ordem do pacote se mantém: a próxima mensagem só sai depois que esta terminar.
     """
-    messages_sent = []
-    metadata = {
-        "package": "PACOTE_FASE_2",
-        "audio_id": audio_id,
-        "images_count": 8,
-        "texts_count": 1  # CORREÇÃO A: Apenas 1 texto (pergunta final)
-    }
-    
+    for attempt in range(max_attempts):
+        try:
+            return await send(*args)
+        except Exception as e:
+            if attempt == max_attempts - 1 or not _is_retryable(e):
+                raise
+            delay = min(64, 4 ** attempt) + random.uniform(0, 1)
+            logger.warning("[PACOTES] ⚠️ Falha transitória no envio (%s); tentativa %s/%s em %.1fs", e, attempt + 2, max_attempts, delay)
+            await asyncio.sleep(delay)
+
+
+# ==================== ORDEM POR DESTINATÁRIO ====================
+
+# Vez de envio por telefone: [lock, quantos estão usando/esperando]. A entrada some
+# quando ninguém mais espera, então o dict não cresce com o número de leads
+_RECIPIENT_TURNS: Dict[str, list] = {}
+
+
+@asynccontextmanager
+async def _recipient_turn(phone_number: str):
+    """
+    Garante uma sequência de envio por destinatário por vez, em ordem de chegada (FIFO).
+    Destinatários diferentes continuam em paralelo.
+    """
+    turn = _RECIPIENT_TURNS.get(phone_number)
+    if turn is None:
+        turn = _RECIPIENT_TURNS[phone_number] = [asyncio.Lock(), 0]
+    turn[1] += 1
+    try:
+        async with turn[0]:
+            yield
+    finally:
+        turn[1] -= 1
+        if turn[1] == 0:
+            _RECIPIENT_TURNS.pop(phone_number, None)
+
+
+# ==================== PERSISTÊNCIA EM BACKGROUND ====================
+
+# Gravações em andamento (referência forte até terminar; drenadas no shutdown)
+_PENDING_PERSISTS: Set[asyncio.Task] = set()
+
+
+def _persist_messages(thread_id: int, messages_sent: List[str], package: str) -> None:
+    """Grava as mensagens do pacote num único INSERT multi-linha (sessão própria, curta)"""
+    db = SessionLocal()
+    try:
+        db.bulk_insert_mappings(Message, [
+            {"thread_id": thread_id, "role": "assistant", "content": msg_content}
+            for msg_content in messages_sent
+        ])
+        db.commit()
+        logger.info("[%s] ✅ %s mensagens salvas no banco", package, len(messages_sent))
+    except Exception as e:
+        db.rollback()
+        logger.exception("[%s] ❌ Erro ao salvar mensagens no banco: %s", package, e)
+    finally:
+        db.close()
+
+
+def _schedule_persist(thread_id: int, messages_sent: List[str], package: str) -> None:
+    """
+    Salva as mensagens em background: o envio (o que o lead vê) não espera o banco.
+    A gravação roda numa thread para o INSERT não travar o event loop.
+    """
+    if not messages_sent:
+        return
+    task = asyncio.create_task(
+        asyncio.to_thread(_persist_messages, thread_id, list(messages_sent), package)
+    )
+    _PENDING_PERSISTS.add(task)
+    task.add_done_callback(_PENDING_PERSISTS.discard)
+
+
+async def drain_pending_persists() -> None:
+    """Aguarda as gravações em background (usado no shutdown para não perder mensagens)"""
+    if _PENDING_PERSISTS:
+        await asyncio.gather(*list(_PENDING_PERSISTS), return_exceptions=True)
+
+
+# ==================== PACOTE FASE 2 (DOR/OBJETIVO) ====================
+
+async def _send_fase_2(phone_number: str, audio_id: str, messages_sent: List[str]) -> None:
+    """Envios do PACOTE_FASE_2 em ordem (chamado com a vez do destinatário garantida)"""
     # 1. Enviar áudio (delay: 0s)
     # ORDEM GARANTIDA: Sequencial com await - NUNCA paralelo
     audio_url = resolve_audio_url(audio_id)
     if audio_url:
         try:
-            sid = await asyncio.to_thread(twilio_provider.send_audio, phone_number, audio_url, "BOT")
+            sid = await _send_with_retry(twilio_provider.send_audio_async, phone_number, audio_url, "BOT")
             if sid:
                 messages_sent.append(f"[Áudio enviado: {audio_id}]")
-                print(f"[PACOTE_FASE_2] ✅ [ORDEM 1/10] Áudio enviado: {audio_id}")
+                logger.info("[PACOTE_FASE_2] ✅ [ORDEM 1/10] Áudio enviado: %s", audio_id)
             else:
-                print(f"[PACOTE_FASE_2] ⚠️ Twilio não configurado. Áudio não enviado.")
+                logger.warning("[PACOTE_FASE_2] ⚠️ Twilio não configurado. Áudio não enviado.")
         except Exception as e:
-            print(f"[PACOTE_FASE_2] ❌ Erro ao enviar áudio: {e}")
+            logger.exception("[PACOTE_FASE_2] ❌ Erro ao enviar áudio: %s", e)
     else:
-        print(f"[PACOTE_FASE_2] ❌ Áudio não encontrado: {audio_id}")
+        logger.error("[PACOTE_FASE_2] ❌ Áudio não encontrado: %s", audio_id)
     
     # Delay após áudio - CRÍTICO para garantir ordem de entrega
     await asyncio.sleep(DELAY_AFTER_AUDIO)  # 3.0s após áudio
-    print(f"[PACOTE_FASE_2] ⏳ Delay de {DELAY_AFTER_AUDIO}s após áudio aplicado (GARANTIR ORDEM DE ENTREGA)")
+    logger.debug("[PACOTE_FASE_2] ⏳ Delay de %ss após áudio aplicado (GARANTIR ORDEM DE ENTREGA)", DELAY_AFTER_AUDIO)
     
     # 2. Enviar 8 imagens de prova social SEM legenda (delay: 0.5s entre cada)
     # CORREÇÃO: Todas as imagens SEM legenda - texto vem DEPOIS como mensagem separada
-    image_ids = [
-        "img_resultado_01", "img_resultado_02", "img_resultado_03", "img_resultado_04",
-        "img_resultado_05", "img_resultado_06", "img_resultado_07", "img_resultado_08"
-    ]
+    if not _FASE_2_IMAGES:
+        # Envio antes do hook de startup (scripts/CLI): resolve agora
+        refresh_image_urls()
+    images = _FASE_2_IMAGES
     
     # CORREÇÃO: Garantir ordem sequencial - todas as imagens ANTES do texto
     # ORDEM GARANTIDA: Loop sequencial com await - NUNCA paralelo
-    for i, image_id in enumerate(image_ids):
-        image_url = resolve_image_url(image_id)
+    for i, (image_id, image_url) in enumerate(images):
         if image_url:
             try:
                 # Todas as imagens SEM legenda (incluindo a última)
                 # ORDEM: Sequencial com await - garante ordem determinística
-                sid = await asyncio.to_thread(twilio_provider.send_image, phone_number, image_url, "BOT")
+                sid = await _send_with_retry(twilio_provider.send_image_async, phone_number, image_url, "BOT")
                 if sid:
                     messages_sent.append(f"[Imagem enviada: {image_id}]")
-                    print(f"[PACOTE_FASE_2] ✅ [ORDEM {i+2}/10] Imagem {i+1}/8 enviada: {image_id}")
+                    logger.info("[PACOTE_FASE_2] ✅ [ORDEM %s/10] Imagem %s/8 enviada: %s", i + 2, i + 1, image_id)
                 else:
-                    print(f"[PACOTE_FASE_2] ⚠️ Twilio não configurado. Imagem não enviada.")
+                    logger.warning("[PACOTE_FASE_2] ⚠️ Twilio não configurado. Imagem não enviada.")
             except Exception as e:
-                print(f"[PACOTE_FASE_2] ❌ Erro ao enviar imagem {i+1}: {e}")
+                logger.exception("[PACOTE_FASE_2] ❌ Erro ao enviar imagem %s: %s", i + 1, e)
         
         # Delay entre imagens para garantir ordem no WhatsApp
         # CRÍTICO: Delay aumentado para garantir que WhatsApp processe e entregue antes da próxima
         # ORDEM GARANTIDA: Delay aplicado ANTES de próxima imagem
-        if i < len(image_ids) - 1:
+        if i < len(images) - 1:
             await asyncio.sleep(DELAY_BETWEEN_IMAGES)  # 2.5s entre cada imagem
-            print(f"[PACOTE_FASE_2] ⏳ Delay de {DELAY_BETWEEN_IMAGES}s após imagem {i+1} aplicado (GARANTIR ORDEM DE ENTREGA)")
+            logger.debug("[PACOTE_FASE_2] ⏳ Delay de %ss após imagem %s aplicado (GARANTIR ORDEM DE ENTREGA)", DELAY_BETWEEN_IMAGES, i + 1)
     
     # Delay após TODAS as 8 imagens - espera 5s antes de enviar texto
     # CRÍTICO: Delay aumentado para garantir que WhatsApp processe todas as imagens antes do texto
     # ORDEM GARANTIDA: Delay aplicado ANTES do texto final
     await asyncio.sleep(DELAY_AFTER_IMAGES)  # 5.0s após última imagem
-    print(f"[PACOTE_FASE_2] ⏳ Delay de {DELAY_AFTER_IMAGES}s após TODAS as 8 imagens aplicado (GARANTIR ORDEM DE ENTREGA)")
+    logger.debug("[PACOTE_FASE_2] ⏳ Delay de %ss após TODAS as 8 imagens aplicado (GARANTIR ORDEM DE ENTREGA)", DELAY_AFTER_IMAGES)
     
     # 3. Enviar texto final como MENSAGEM SEPARADA (DEPOIS de todas as 8 imagens)
     # CORREÇÃO: Texto vem DEPOIS de todas as imagens, não junto nem no meio
     # ORDEM GARANTIDA: Sequencial com await - NUNCA paralelo
     try:
-        sid = await asyncio.to_thread(twilio_provider.send_text, phone_number, FASE_2_PERGUNTA, "BOT")
+        sid = await _send_with_retry(twilio_provider.send_text_async, phone_number, FASE_2_PERGUNTA, "BOT")
         if sid:
             messages_sent.append(FASE_2_PERGUNTA)
-            print(f"[PACOTE_FASE_2] ✅ [ORDEM 10/10] Texto final enviado como MENSAGEM SEPARADA (DEPOIS de todas as 8 imagens, após {DELAY_AFTER_IMAGES}s)")
+            logger.info("[PACOTE_FASE_2] ✅ [ORDEM 10/10] Texto final enviado como MENSAGEM SEPARADA (DEPOIS de todas as 8 imagens, após %ss)", DELAY_AFTER_IMAGES)
         else:
-            print(f"[PACOTE_FASE_2] ⚠️ Twilio não configurado. Pergunta não enviada.")
+            logger.warning("[PACOTE_FASE_2] ⚠️ Twilio não configurado. Pergunta não enviada.")
     except Exception as e:
-        print(f"[PACOTE_FASE_2] ❌ Erro ao enviar pergunta: {e}")
-    
-    # Salva mensagens no banco se tiver thread_id e db_session
-    if thread_id and db_session:
-        from ..models import Message
-        for msg_content in messages_sent:
-            msg = Message(thread_id=thread_id, role="assistant", content=msg_content)
-            db_session.add(msg)
-        db_session.commit()
-        print(f"[PACOTE_FASE_2] ✅ {len(messages_sent)} mensagens salvas no banco")
-    
-    return messages_sent, metadata
-
+        logger.exception("[PACOTE_FASE_2] ❌ Erro ao enviar pergunta: %s", e)
 
-# ==================== PACOTE FASE 3 (PLANOS) ====================
 
-async def execute_pacote_fase_3(
+async def execute_pacote_fase_2(
     phone_number: str,
+    audio_id: str = "audio2_dor_generica",
     db_session = None,
     thread_id: Optional[int] = None
 ) -> Tuple[List[str], Dict[str, Any]]:
     """
-    Executa PACOTE_FASE_3 fixo: intro + áudio3 + planos + pergunta.
+    Executa PACOTE_FASE_2 fixo: áudio + 8 imagens + textos.
     
     Args:
         phone_number: Número do destinatário (E.164)
+        audio_id: ID do áudio (padrão: audio2_dor_generica)
         db_session: Sessão do banco (opcional)
         thread_id: ID da thread (opcional)
     
@@ -175,26 +273,42 @@ async def execute_pacote_fase_3(
     """
     messages_sent = []
     metadata = {
-        "package": "PACOTE_FASE_3",
-        "audio_id": "audio3_explicacao_planos",
-        "texts_count": 3
+        "package": "PACOTE_FASE_2",
+        "audio_id": audio_id,
+        "images_count": 8,
+        "texts_count": 1  # CORREÇÃO A: Apenas 1 texto (pergunta final)
     }
     
+    # Um pacote por destinatário por vez: dois disparos simultâneos não intercalam mensagens
+    async with _recipient_turn(phone_number):
+        await _send_fase_2(phone_number, audio_id, messages_sent)
+    
+    # Salva mensagens no banco se tiver thread_id e db_session (em background, fora do envio)
+    if thread_id and db_session:
+        _schedule_persist(thread_id, messages_sent, "PACOTE_FASE_2")
+    
+    return messages_sent, metadata
+
+
+# ==================== PACOTE FASE 3 (PLANOS) ====================
+
+async def _send_fase_3(phone_number: str, messages_sent: List[str]) -> None:
+    """Envios do PACOTE_FASE_3 em ordem (chamado com a vez do destinatário garantida)"""
     # 1. Enviar mensagem intro curta (delay: 0s)
     # ORDEM GARANTIDA: Sequencial com await - NUNCA paralelo
     try:
-        sid = await asyncio.to_thread(twilio_provider.send_text, phone_number, FASE_3_INTRO, "BOT")
+        sid = await _send_with_retry(twilio_provider.send_text_async, phone_number, FASE_3_INTRO, "BOT")
         if sid:
             messages_sent.append(FASE_3_INTRO)
-            print(f"[PACOTE_FASE_3] ✅ [ORDEM 1/4] Intro enviada")
+            logger.info("[PACOTE_FASE_3] ✅ [ORDEM 1/4] Intro enviada")
         else:
-            print(f"[PACOTE_FASE_3] ⚠️ Twilio não configurado. Intro não enviada.")
+            logger.warning("[PACOTE_FASE_3] ⚠️ Twilio não configurado. Intro não enviada.")
     except Exception as e:
-        print(f"[PACOTE_FASE_3] ❌ Erro ao enviar intro: {e}")
+        logger.exception("[PACOTE_FASE_3] ❌ Erro ao enviar intro: %s", e)
     
     # Delay antes do áudio - CRÍTICO para garantir ordem de entrega
     await asyncio.sleep(DELAY_AFTER_AUDIO)  # 3.0s após intro
-    print(f"[PACOTE_FASE_3] ⏳ Delay de {DELAY_AFTER_AUDIO}s após intro aplicado (GARANTIR ORDEM DE ENTREGA)")
+    logger.debug("[PACOTE_FASE_3] ⏳ Delay de %ss após intro aplicado (GARANTIR ORDEM DE ENTREGA)", DELAY_AFTER_AUDIO)
     
     # 2. Enviar áudio3 (delay: 3.0s após intro)
     # CRÍTICO: Áudio SEMPRE antes do texto de planos - delay aumentado para garantir ordem
@@ -203,79 +317,86 @@ async def execute_pacote_fase_3(
     audio_url = resolve_audio_url(audio_id)
     if audio_url:
         try:
-            sid = await asyncio.to_thread(twilio_provider.send_audio, phone_number, audio_url, "BOT")
+            sid = await _send_with_retry(twilio_provider.send_audio_async, phone_number, audio_url, "BOT")
             if sid:
                 messages_sent.append(f"[Áudio enviado: {audio_id}]")
-                print(f"[PACOTE_FASE_3] ✅ [ORDEM 2/4] Áudio enviado: {audio_id}")
+                logger.info("[PACOTE_FASE_3] ✅ [ORDEM 2/4] Áudio enviado: %s", audio_id)
             else:
-                print(f"[PACOTE_FASE_3] ⚠️ Twilio não configurado. Áudio não enviado.")
+                logger.warning("[PACOTE_FASE_3] ⚠️ Twilio não configurado. Áudio não enviado.")
         except Exception as e:
-            print(f"[PACOTE_FASE_3] ❌ Erro ao enviar áudio: {e}")
+            logger.exception("[PACOTE_FASE_3] ❌ Erro ao enviar áudio: %s", e)
     else:
-        print(f"[PACOTE_FASE_3] ❌ Áudio não encontrado: {audio_id}")
+        logger.error("[PACOTE_FASE_3] ❌ Áudio não encontrado: %s", audio_id)
     
     # Delay após áudio antes do texto dos planos - CRÍTICO para garantir ordem de entrega
     await asyncio.sleep(DELAY_AFTER_AUDIO)  # 3.0s após áudio
-    print(f"[PACOTE_FASE_3] ⏳ Delay de {DELAY_AFTER_AUDIO}s após áudio aplicado (GARANTIR ORDEM DE ENTREGA)")
+    logger.debug("[PACOTE_FASE_3] ⏳ Delay de %ss após áudio aplicado (GARANTIR ORDEM DE ENTREGA)", DELAY_AFTER_AUDIO)
     
     # 3. Enviar bloco de planos (delay: 0.5s após áudio - REGRA 4)
     # ORDEM GARANTIDA: Texto DEPOIS do áudio
     try:
-        sid = await asyncio.to_thread(twilio_provider.send_text, phone_number, FASE_3_PLANOS, "BOT")
+        sid = await _send_with_retry(twilio_provider.send_text_async, phone_number, FASE_3_PLANOS, "BOT")
         if sid:
             messages_sent.append(FASE_3_PLANOS)
-            print(f"[PACOTE_FASE_3] ✅ [ORDEM 3/4] Planos enviados")
+            logger.info("[PACOTE_FASE_3] ✅ [ORDEM 3/4] Planos enviados")
         else:
-            print(f"[PACOTE_FASE_3] ⚠️ Twilio não configurado. Planos não enviados.")
+            logger.warning("[PACOTE_FASE_3] ⚠️ Twilio não configurado. Planos não enviados.")
     except Exception as e:
-        print(f"[PACOTE_FASE_3] ❌ Erro ao enviar planos: {e}")
+        logger.exception("[PACOTE_FASE_3] ❌ Erro ao enviar planos: %s", e)
     
     # Delay antes da pergunta (mantido 1.2s entre textos)
     await asyncio.sleep(DELAY_BETWEEN_TEXTS)
-    print(f"[PACOTE_FASE_3] ⏳ Delay de {DELAY_BETWEEN_TEXTS}s após planos aplicado")
+    logger.debug("[PACOTE_FASE_3] ⏳ Delay de %ss após planos aplicado", DELAY_BETWEEN_TEXTS)
     
     # 4. Enviar pergunta final em mensagem separada (delay: 1.2s após planos)
     # ORDEM GARANTIDA: Pergunta DEPOIS do texto de planos
     try:
-        sid = await asyncio.to_thread(twilio_provider.send_text, phone_number, FASE_3_PERGUNTA, "BOT")
+        sid = await _send_with_retry(twilio_provider.send_text_async, phone_number, FASE_3_PERGUNTA, "BOT")
         if sid:
             messages_sent.append(FASE_3_PERGUNTA)
-            print(f"[PACOTE_FASE_3] ✅ [ORDEM 4/4] Pergunta enviada")
+            logger.info("[PACOTE_FASE_3] ✅ [ORDEM 4/4] Pergunta enviada")
         else:
-            print(f"[PACOTE_FASE_3] ⚠️ Twilio não configurado. Pergunta não enviada.")
+            logger.warning("[PACOTE_FASE_3] ⚠️ Twilio não configurado. Pergunta não enviada.")
     except Exception as e:
-        print(f"[PACOTE_FASE_3] ❌ Erro ao enviar pergunta: {e}")
+        logger.exception("[PACOTE_FASE_3] ❌ Erro ao enviar pergunta: %s", e)
+
+
+async def execute_pacote_fase_3(
+    phone_number: str,
+    db_session = None,
+    thread_id: Optional[int] = None
+) -> Tuple[List[str], Dict[str, Any]]:
+    """
+    Executa PACOTE_FASE_3 fixo: intro + áudio3 + planos + pergunta.
     
-    # Marca que planos foram explicados
-    if thread_id and db_session:
-        try:
-            from ..models import Thread
-            from datetime import datetime
-            thread = db_session.get(Thread, thread_id)
-            if thread:
-                meta = thread.meta or {}
-                if isinstance(meta, str):
-                    try:
-                        import json
-                        meta = json.loads(meta)
-                    except:
-                        meta = {}
-                meta["plans_already_explained"] = True
-                meta["plans_sent_at"] = datetime.now().isoformat()
-                thread.meta = meta
-                db_session.commit()
-                print(f"[PACOTE_FASE_3] ✅ Marcado plans_already_explained=True")
-        except Exception as e:
-            print(f"[PACOTE_FASE_3] ⚠️ Erro ao marcar plans_already_explained: {e}")
+    Args:
+        phone_number: Número do destinatário (E.164)
+        db_session: Sessão do banco (opcional)
+        thread_id: ID da thread (opcional)
+    
+    Returns:
+        Tuple de (mensagens_enviadas, metadados)
+    """
+    messages_sent = []
+    metadata = {
+        "package": "PACOTE_FASE_3",
+        "audio_id": "audio3_explicacao_planos",
+        "texts_count": 3
+    }
+    
+    # Um pacote por destinatário por vez: dois disparos simultâneos não intercalam mensagens
+    async with _recipient_turn(phone_number):
+        await _send_fase_3(phone_number, messages_sent)
+    
+    # Marca que planos foram explicados. Vai no metadata devolvido: quem chama grava junto
+    # com a etapa no mesmo commit do meta (um commit separado aqui era sobrescrito pelo
+    # meta que quem chama já tinha em mãos, e custava um SELECT + commit a mais)
+    metadata["plans_already_explained"] = True
+    metadata["plans_sent_at"] = datetime.now().isoformat()
     
-    # Salva mensagens no banco se tiver thread_id e db_session
+    # Salva mensagens no banco se tiver thread_id e db_session (em background, fora do envio)
     if thread_id and db_session:
-        from ..models import Message
-        for msg_content in messages_sent:
-            msg = Message(thread_id=thread_id, role="assistant", content=msg_content)
-            db_session.add(msg)
-        db_session.commit()
-        print(f"[PACOTE_FASE_3] ✅ {len(messages_sent)} mensagens salvas no banco")
+        _schedule_persist(thread_id, messages_sent, "PACOTE_FASE_3")
     
     return messages_sent, metadata
 
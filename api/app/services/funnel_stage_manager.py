@@ -1,177 +1,62 @@
 # api/app/services/funnel_stage_manager.py
 """Gerencia atualização automática de etapas do funil baseado em eventos"""
+from collections import namedtuple
 from typing import Dict, Optional, Any
 import json
 from datetime import datetime
+from types import MappingProxyType
 
+from .keyword_matcher import compile_tagged_keywords, normalize_message
 
-# Mapeamento de eventos para etapas do funil
-EVENT_TO_STAGE = {
+
+# Etapa do funil associada a um evento (imutável, criada uma vez no import)
+StageData = namedtuple("StageData", "funnel_id stage_id lead_level phase name")
+
+# Campos da etapa gravados no meta da thread ("name" é só descritivo)
+_STAGE_META_FIELDS = ("funnel_id", "stage_id", "lead_level", "phase")
+
+# Mapeamento de eventos para etapas do funil (somente leitura: alterar levanta TypeError)
+# StageData(funnel_id, stage_id, lead_level, phase, name)
+EVENT_TO_STAGE = MappingProxyType({
     # ========== FUNIL LONGO (funnel_id = 1) ==========
     
     # FASE 1 - Lead Frio
-    "USER_SENT_FIRST_MESSAGE": {
-        "funnel_id": "1",
-        "stage_id": "1",
-        "lead_level": "frio",
-        "phase": "frio",
-        "name": "Lead Frio"
-    },
-    "IA_SENT_AUDIO1_BOAS_VINDAS": {
-        "funnel_id": "1",
-        "stage_id": "1",
-        "lead_level": "frio",
-        "phase": "frio",
-        "name": "Lead Frio - Áudio 1 enviado"
-    },
+    "USER_SENT_FIRST_MESSAGE": StageData("1", "1", "frio", "frio", "Lead Frio"),
+    "IA_SENT_AUDIO1_BOAS_VINDAS": StageData("1", "1", "frio", "frio", "Lead Frio - Áudio 1 enviado"),
     
     # FASE 2 - Aquecimento (Descoberta da Dor)
-    "USER_SENT_DOR": {
-        "funnel_id": "1",
-        "stage_id": "2",
-        "lead_level": "morno",
-        "phase": "aquecimento",
-        "name": "Aquecimento - Dor detectada"
-    },
-    "IA_SENT_AUDIO2_DOR": {
-        "funnel_id": "1",
-        "stage_id": "2",
-        "lead_level": "morno",
-        "phase": "aquecimento",
-        "name": "Aquecimento - Áudio 2 enviado"
-    },
-    "IA_SENT_PROVAS_SOCIAIS": {
-        "funnel_id": "1",
-        "stage_id": "2",
-        "lead_level": "morno",
-        "phase": "aquecimento",
-        "name": "Aquecimento - Provas sociais enviadas"
-    },
+    "USER_SENT_DOR": StageData("1", "2", "morno", "aquecimento", "Aquecimento - Dor detectada"),
+    "IA_SENT_AUDIO2_DOR": StageData("1", "2", "morno", "aquecimento", "Aquecimento - Áudio 2 enviado"),
+    "IA_SENT_PROVAS_SOCIAIS": StageData("1", "2", "morno", "aquecimento", "Aquecimento - Provas sociais enviadas"),
     
     # FASE 3 - Aquecido (Objeção ou Interesse)
-    "USER_SENT_OBJECAO": {
-        "funnel_id": "1",
-        "stage_id": "3",
-        "lead_level": "morno",
-        "phase": "aquecido",
-        "name": "Aquecido - Objeção detectada"
-    },
-    "USER_SENT_INTERESSE": {
-        "funnel_id": "1",
-        "stage_id": "3",
-        "lead_level": "morno",
-        "phase": "aquecido",
-        "name": "Aquecido - Interesse detectado"
-    },
-    "IA_QUEBROU_OBJECAO": {
-        "funnel_id": "1",
-        "stage_id": "3",
-        "lead_level": "morno",
-        "phase": "aquecido",
-        "name": "Aquecido - Objeção quebrada"
-    },
+    "USER_SENT_OBJECAO": StageData("1", "3", "morno", "aquecido", "Aquecido - Objeção detectada"),
+    "USER_SENT_INTERESSE": StageData("1", "3", "morno", "aquecido", "Aquecido - Interesse detectado"),
+    "IA_QUEBROU_OBJECAO": StageData("1", "3", "morno", "aquecido", "Aquecido - Objeção quebrada"),
     
     # FASE 4 - Quente (Apresentação dos Planos)
-    "USER_PEDIU_PLANOS": {
-        "funnel_id": "1",
-        "stage_id": "4",
-        "lead_level": "quente",
-        "phase": "quente",
-        "name": "Quente - Planos solicitados"
-    },
-    "IA_SENT_EXPLICACAO_PLANOS": {
-        "funnel_id": "1",
-        "stage_id": "4",
-        "lead_level": "quente",
-        "phase": "quente",
-        "name": "Quente - Planos apresentados"
-    },
+    "USER_PEDIU_PLANOS": StageData("1", "4", "quente", "quente", "Quente - Planos solicitados"),
+    "IA_SENT_EXPLICACAO_PLANOS": StageData("1", "4", "quente", "quente", "Quente - Planos apresentados"),
     
     # FASE 5 - Fechamento
-    "USER_ESCOLHEU_PLANO": {
-        "funnel_id": "1",
-        "stage_id": "5",
-        "lead_level": "quente",
-        "phase": "quente",
-        "name": "Fechamento - Plano escolhido"
-    },
-    "IA_ENVIOU_LINK_CHECKOUT": {
-        "funnel_id": "1",
-        "stage_id": "5",
-        "lead_level": "quente",
-        "phase": "quente",
-        "name": "Fechamento - Link enviado"
-    },
+    "USER_ESCOLHEU_PLANO": StageData("1", "5", "quente", "quente", "Fechamento - Plano escolhido"),
+    "IA_ENVIOU_LINK_CHECKOUT": StageData("1", "5", "quente", "quente", "Fechamento - Link enviado"),
     
     # FASE 6 - Pós-Venda
-    "EDUZZ_WEBHOOK_APROVADA": {
-        "funnel_id": "1",
-        "stage_id": "6",
-        "lead_level": "quente",
-        "phase": "assinante",
-        "name": "Pós-Venda - Compra aprovada"
-    },
-    "IA_ENVIOU_ACESSOS": {
-        "funnel_id": "1",
-        "stage_id": "6",
-        "lead_level": "quente",
-        "phase": "assinante",
-        "name": "Pós-Venda - Acessos enviados"
-    },
+    "EDUZZ_WEBHOOK_APROVADA": StageData("1", "6", "quente", "assinante", "Pós-Venda - Compra aprovada"),
+    "IA_ENVIOU_ACESSOS": StageData("1", "6", "quente", "assinante", "Pós-Venda - Acessos enviados"),
     
     # FASE 7 - Carrinho Abandonado
-    "CARRINHO_ABANDONADO": {
-        "funnel_id": "1",
-        "stage_id": "7",
-        "lead_level": "quente",
-        "phase": "quente_recebeu_oferta",
-        "name": "Carrinho Abandonado"
-    },
-    "IA_ENVIOU_RECUPERACAO": {
-        "funnel_id": "1",
-        "stage_id": "7",
-        "lead_level": "quente",
-        "phase": "quente_recebeu_oferta",
-        "name": "Recuperação enviada"
-    },
+    "CARRINHO_ABANDONADO": StageData("1", "7", "quente", "quente_recebeu_oferta", "Carrinho Abandonado"),
+    "IA_ENVIOU_RECUPERACAO": StageData("1", "7", "quente", "quente_recebeu_oferta", "Recuperação enviada"),
     
     # ========== MINI FUNIL BF (funnel_id = 2) ==========
-    "BF_IMAGEM_ENVIADA": {
-        "funnel_id": "2",
-        "stage_id": "1",
-        "lead_level": "frio",
-        "phase": "frio",
-        "name": "BF - Imagem enviada"
-    },
-    "BF_AUDIO_OFERTA_ENVIADO": {
-        "funnel_id": "2",
-        "stage_id": "2",
-        "lead_level": "morno",
-        "phase": "aquecimento",
-        "name": "BF - Áudio de oferta enviado"
-    },
-    "BF_FOLLOWUP_1_ENVIADO": {
-        "funnel_id": "2",
-        "stage_id": "3",
-        "lead_level": "morno",
-        "phase": "aquecido",
-        "name": "BF - Follow-up 1 enviado"
-    },
-    "BF_FOLLOWUP_2_ENVIADO": {
-        "funnel_id": "2",
-        "stage_id": "4",
-        "lead_level": "morno",
-        "phase": "aquecido",
-        "name": "BF - Follow-up 2 enviado"
-    },
-    "BF_FOLLOWUP_3_ENVIADO": {
-        "funnel_id": "2",
-        "stage_id": "5",
-        "lead_level": "morno",
-        "phase": "aquecido",
-        "name": "BF - Follow-up 3 enviado"
-    },
-}
+    "BF_IMAGEM_ENVIADA": StageData("2", "1", "frio", "frio", "BF - Imagem enviada"),
+    "BF_AUDIO_OFERTA_ENVIADO": StageData("2", "2", "morno", "aquecimento", "BF - Áudio de oferta enviado"),
+    "BF_FOLLOWUP_1_ENVIADO": StageData("2", "3", "morno", "aquecido", "BF - Follow-up 1 enviado"),
+    "BF_FOLLOWUP_2_ENVIADO": StageData("2", "4", "morno", "aquecido", "BF - Follow-up 2 enviado"),
+    "BF_FOLLOWUP_3_ENVIADO": StageData("2", "5", "morno", "aquecido", "BF - Follow-up 3 enviado"),
+})
 
 
 def update_stage_from_event(
@@ -190,19 +75,15 @@ def update_stage_from_event(
     Returns:
         Metadata atualizado
     """
-    if event not in EVENT_TO_STAGE:
+    stage_data = EVENT_TO_STAGE.get(event)
+    if stage_data is None:
         return thread_meta
     
-    stage_data = EVENT_TO_STAGE[event]
-    
     # Atualiza metadata
     updated_meta = thread_meta.copy() if thread_meta else {}
     
     # Atualiza etapa do funil
-    updated_meta["funnel_id"] = stage_data["funnel_id"]
-    updated_meta["stage_id"] = stage_data["stage_id"]
-    updated_meta["lead_level"] = stage_data["lead_level"]
-    updated_meta["phase"] = stage_data["phase"]
+    updated_meta.update(zip(_STAGE_META_FIELDS, stage_data))
     updated_meta["last_stage_update"] = datetime.now().isoformat()
     updated_meta["last_event"] = event
     
@@ -213,6 +94,56 @@ def update_stage_from_event(
     return updated_meta
 
 
+# ==================== PALAVRAS-CHAVE POR EVENTO ====================
+# Compiladas uma vez no import numa única varredura (detect_stage_from_message roda a
+# cada mensagem). Keywords mais genéricas primeiro, só por legibilidade: a ordem dentro
+# de cada lista não muda o resultado
+
+# Dor/objetivo (FASE 2)
+DOR_KEYWORDS = (
+    "dor", "barriga", "problema", "incomoda", "autoestima", "vergonha",
+    "dieta", "não gosto", "objetivo", "quero emagrecer",
+    "pochete", "flacidez", "celulite", "perder gordura", "ganhar massa",
+    "bunda", "coxas", "alimentação", "constância", "falta de foco",
+    "quero perder peso", "me derruba", "travamento", "me incomoda"
+)
+
+# Objeções (FASE 3)
+OBJECTION_KEYWORDS = (
+    "sem tempo", "sem dinheiro", "não sei se consigo",
+    "não sei se funciona pra mim", "tô sem tempo", "tô sem dinheiro"
+)
+
+# Interesse alto (FASE 3)
+INTEREST_KEYWORDS = (
+    "quero", "sim", "pode", "ok", "legal", "entendi", "gostei",
+    "faz sentido", "me explica", "conta pra mim", "me mostra",
+    "quero saber", "pode ser"
+)
+
+# Pedido de planos (FASE 4)
+PLANOS_KEYWORDS = (
+    "preço", "planos", "valores", "quanto custa", "investimento",
+    "quero ver os precos", "como funciona o pagamento",
+    "preços", "me passa os preços", "quais os valores",
+    "quero saber dos planos", "me mostra os planos", "quais são os planos"
+)
+
+# Escolha de plano (FASE 5)
+PLANO_ANUAL_KEYWORDS = ("anual", "plano anual", "quero o anual", "vou querer o anual")
+PLANO_MENSAL_KEYWORDS = ("mensal", "plano mensal", "quero o mensal", "vou querer o mensal")
+
+# Uma passada pela mensagem devolve todas as categorias presentes; a prioridade
+# (dor > objeção > interesse > planos > escolha) fica em detect_stage_from_message
+_scan_stage_keywords = compile_tagged_keywords({
+    "dor": DOR_KEYWORDS,
+    "objecao": OBJECTION_KEYWORDS,
+    "interesse": INTEREST_KEYWORDS,
+    "planos": PLANOS_KEYWORDS,
+    "escolha_plano": PLANO_ANUAL_KEYWORDS + PLANO_MENSAL_KEYWORDS,
+})
+
+
 def detect_stage_from_message(
     message: str,
     thread_meta: Optional[Dict[str, Any]] = None,
@@ -224,64 +155,35 @@ def detect_stage_from_message(
     Returns:
         Nome do evento ou None
     """
-    message_lower = message.lower().strip()
-    
     # Primeira mensagem
     if is_first_message or not thread_meta or not thread_meta.get("stage_id"):
         return "USER_SENT_FIRST_MESSAGE"
     
-    # Detecta se mencionou dor/objetivo (FASE 2)
-    dor_keywords = [
-        "perder gordura", "pochete", "flacidez", "celulite",
-        "ganhar massa", "bunda", "coxas", "falta de foco",
-        "dieta", "alimentação", "constância",
-        "dor", "problema", "incomoda", "quero emagrecer", "quero perder peso",
-        "barriga", "autoestima", "vergonha",
-        "não gosto", "me incomoda", "me derruba", "travamento", "objetivo"
-    ]
+    hits = _scan_stage_keywords(normalize_message(message))
     
-    if any(keyword in message_lower for keyword in dor_keywords):
+    # Detecta se mencionou dor/objetivo (FASE 2)
+    if "dor" in hits:
         current_stage = thread_meta.get("stage_id", "1")
         # Só atualiza se ainda não está na etapa de dor
         if current_stage == "1":
             return "USER_SENT_DOR"
     
     # Detecta objeções (FASE 3)
-    objection_keywords = [
-        "tô sem tempo", "tô sem dinheiro", "não sei se consigo",
-        "não sei se funciona pra mim", "sem tempo", "sem dinheiro"
-    ]
-    if any(keyword in message_lower for keyword in objection_keywords):
+    if "objecao" in hits:
         return "USER_SENT_OBJECAO"
     
     # Detecta interesse alto (FASE 3)
-    interest_keywords = [
-        "sim", "pode ser", "legal", "ok", "entendi", "faz sentido",
-        "gostei", "quero saber", "me explica", "conta pra mim",
-        "pode", "quero", "me mostra"
-    ]
-    if any(keyword in message_lower for keyword in interest_keywords):
+    if "interesse" in hits:
         current_stage = thread_meta.get("stage_id", "2")
         if current_stage == "2":  # Se está na fase 2, avança para fase 3
             return "USER_SENT_INTERESSE"
     
     # Detecta pedido de planos (FASE 4)
-    planos_keywords = [
-        "preço", "preços", "quanto custa", "valores", "planos",
-        "quero ver os precos", "me passa os preços", "quais os valores",
-        "quero saber dos planos", "me mostra os planos", "investimento",
-        "como funciona o pagamento", "quais são os planos"
-    ]
-    if any(keyword in message_lower for keyword in planos_keywords):
+    if "planos" in hits:
         return "USER_PEDIU_PLANOS"
     
-    # Detecta escolha de plano (FASE 5)
-    plano_anual_keywords = ["anual", "plano anual", "quero o anual", "vou querer o anual"]
-    plano_mensal_keywords = ["mensal", "plano mensal", "quero o mensal", "vou querer o mensal"]
-    
-    if any(keyword in message_lower for keyword in plano_anual_keywords):
-        return "USER_ESCOLHEU_PLANO"
-    if any(keyword in message_lower for keyword in plano_mensal_keywords):
+    # Detecta escolha de plano (FASE 5): anual ou mensal, mesmo evento
+    if "escolha_plano" in hits:
         return "USER_ESCOLHEU_PLANO"
     
     return None
@@ -6,6 +6,70 @@ Determinístico, sem LLM
 import re
 from typing import Literal
 
+from .keyword_matcher import compile_keywords, normalize_message
+
+# Padrões de escolha direta (CHOOSE_PLAN)
+# IMPORTANTE: Verificar escolha ANTES de verificar perguntas genéricas
+CHOOSE_PATTERNS = (
+    r'\bquero\s+o\s+anual\b',
+    r'\bquero\s+anual\b',
+    r'\bvou\s+de\s+anual\b',
+    r'\bescolho\s+anual\b',
+    r'\bfechar\s+anual\b',
+    r'\bassinar\s+anual\b',
+    r'\bquero\s+o\s+mensal\b',
+    r'\bquero\s+mensal\b',
+    r'\bvou\s+de\s+mensal\b',
+    r'\bescolho\s+mensal\b',
+    r'\bfechar\s+mensal\b',
+    r'\bassinar\s+mensal\b',
+    # Padrões simples: "plano anual" ou "plano mensal" (especialmente após receber planos)
+    r'\bplano\s+anual\b',
+    r'\bplano\s+mensal\b',
+    # Variações comuns
+    r'\bo\s+anual\b',
+    r'\bo\s+mensal\b',
+    r'\banual\s+mesmo\b',
+    r'\bmensal\s+mesmo\b',
+)
+
+# Padrões de pergunta/conhecimento (ASK_PLANS)
+ASK_PATTERNS = (
+    r'\bquero\s+saber\s+(dos|sobre|os)\s+planos?\b',
+    r'\bme\s+explica\s+(os|dos)\s+planos?\b',
+    r'\bquanto\s+custa\b',
+    r'\bvalores?\b',
+    r'\bpreço\b',
+    r'\bpreços\b',
+    r'\bcomo\s+funciona\s+(o|os)\s+planos?\b',
+    r'\bopções\s+de\s+planos?\b',
+    r'\bquais\s+(são|os)\s+planos?\b',
+    # Padrão genérico "planos" só se NÃO for escolha específica
+    r'\bplanos?\b',  # Genérico, mas só se não for escolha
+)
+
+# Palavras que indicam escolha disfarçada dentro de uma pergunta sobre planos
+CHOICE_HINT_KEYWORDS = (
+    "quero o", "vou de", "escolho", "fechar", "assinar",
+    "plano anual", "plano mensal", "o anual", "o mensal"
+)
+
+# Frases da última mensagem do bot que pedem para escolher um plano
+LAST_BOT_CHOICE_KEYWORDS = (
+    "qual plano faz mais sentido",
+    "qual plano",
+    "mensal ou anual",
+    "escolhe",
+    "faz mais sentido"
+)
+
+# Cada grupo vira uma única alternância compilada. CHOOSE e ASK ficam separados
+# porque a escolha tem prioridade sobre a pergunta, independentemente da posição no texto.
+_CHOOSE_RE = re.compile("|".join(CHOOSE_PATTERNS))
+_ASK_RE = re.compile("|".join(ASK_PATTERNS))
+_CHOICE_HINT_RE = compile_keywords(CHOICE_HINT_KEYWORDS)
+_LAST_BOT_CHOICE_RE = compile_keywords(LAST_BOT_CHOICE_KEYWORDS)
+
 
 def detect_plans_intent(
     text: str,
@@ -28,37 +92,11 @@ def detect_plans_intent(
     if not text:
         return "OTHER"
     
-    text_lower = text.lower().strip()
-    
-    # Padrões de escolha direta (CHOOSE_PLAN)
-    # IMPORTANTE: Verificar escolha ANTES de verificar perguntas genéricas
-    choose_patterns = [
-        r'\bquero\s+o\s+anual\b',
-        r'\bquero\s+anual\b',
-        r'\bvou\s+de\s+anual\b',
-        r'\bescolho\s+anual\b',
-        r'\bfechar\s+anual\b',
-        r'\bassinar\s+anual\b',
-        r'\bquero\s+o\s+mensal\b',
-        r'\bquero\s+mensal\b',
-        r'\bvou\s+de\s+mensal\b',
-        r'\bescolho\s+mensal\b',
-        r'\bfechar\s+mensal\b',
-        r'\bassinar\s+mensal\b',
-        # Padrões simples: "plano anual" ou "plano mensal" (especialmente após receber planos)
-        r'\bplano\s+anual\b',
-        r'\bplano\s+mensal\b',
-        # Variações comuns
-        r'\bo\s+anual\b',
-        r'\bo\s+mensal\b',
-        r'\banual\s+mesmo\b',
-        r'\bmensal\s+mesmo\b',
-    ]
+    text_lower = normalize_message(text)
     
     # Verifica padrões de escolha
-    for pattern in choose_patterns:
-        if re.search(pattern, text_lower):
-            return "CHOOSE_PLAN"
+    if _CHOOSE_RE.search(text_lower):
+        return "CHOOSE_PLAN"
     
     # Caso especial: mensagem curta "anual" ou "mensal" isolada OU "plano anual/mensal"
     # Só é CHOOSE_PLAN se estiver em contexto apropriado (já recebeu planos)
@@ -69,42 +107,13 @@ def detect_plans_intent(
         # Verifica se a última mensagem do bot foi sobre escolher plano
         if last_bot_message:
             last_bot_lower = last_bot_message.lower()
-            if any(phrase in last_bot_lower for phrase in [
-                "qual plano faz mais sentido",
-                "qual plano",
-                "mensal ou anual",
-                "escolhe",
-                "faz mais sentido"
-            ]):
+            if _LAST_BOT_CHOICE_RE.search(last_bot_lower):
                 return "CHOOSE_PLAN"
     
-    # Padrões de pergunta/conhecimento (ASK_PLANS)
-    # IMPORTANTE: Verificar ANTES se não é escolha (já verificado acima)
-    ask_patterns = [
-        r'\bquero\s+saber\s+(dos|sobre|os)\s+planos?\b',
-        r'\bme\s+explica\s+(os|dos)\s+planos?\b',
-        r'\bquanto\s+custa\b',
-        r'\bvalores?\b',
-        r'\bpreço\b',
-        r'\bpreços\b',
-        r'\bcomo\s+funciona\s+(o|os)\s+planos?\b',
-        r'\bopções\s+de\s+planos?\b',
-        r'\bquais\s+(são|os)\s+planos?\b',
-        # Padrão genérico "planos" só se NÃO for escolha específica
-        r'\bplanos?\b',  # Genérico, mas só se não for escolha
-    ]
-    
     # Verifica padrões de pergunta
-    for pattern in ask_patterns:
-        if re.search(pattern, text_lower):
-            # Garante que não é escolha disfarçada
-            # Verifica se contém palavras de escolha ou se é "plano anual/mensal"
-            is_choice = any(choose in text_lower for choose in [
-                "quero o", "vou de", "escolho", "fechar", "assinar",
-                "plano anual", "plano mensal", "o anual", "o mensal"
-            ])
-            if not is_choice:
-                return "ASK_PLANS"
+    # Garante que não é escolha disfarçada (palavras de escolha ou "plano anual/mensal")
+    if _ASK_RE.search(text_lower) and not _CHOICE_HINT_RE.search(text_lower):
+        return "ASK_PLANS"
     
     return "OTHER"
 
@@ -153,7 +162,7 @@ def extract_plan_choice(text: str) -> Literal["MENSAL", "ANUAL", None]:
     if not text:
         return None
     
-    text_lower = text.lower().strip()
+    text_lower = normalize_message(text)
     
     if "anual" in text_lower:
         return "ANUAL"
@@ -0,0 +1,211 @@
+# api/app/services/keyword_matcher.py
+"""
+Matcher de palavras-chave - compila listas de keywords em uma única regex.
+Substitui `any(keyword in texto for keyword in LISTA)` por uma passada em C.
+"""
+import re
+from functools import lru_cache
+from typing import Callable, Dict, FrozenSet, Iterable, List, Mapping, Pattern, Set
+
+
+# Acentos do português -> letra sem acento (1 para 1, o tamanho do texto não muda)
+_ACCENT_TABLE = str.maketrans("áàâãäéèêëíìîïóòôõöúùûüç", "aaaaaeeeeiiiiooooouuuuc")
+
+
+# Mensagens até esse tamanho ("ok", "sim", "quero", reenvios) passam pelo cache
+_SHORT_MESSAGE_LEN = 64
+
+
+@lru_cache(maxsize=1024)
+def _normalize_short(message: str) -> str:
+    return message.lower().strip()
+
+
+def normalize_message(message: str) -> str:
+    """
+    `message.lower().strip()` usado na entrada de todos os detectores.
+    Mensagens curtas e repetidas saem do cache em vez de alocar uma string nova
+    a cada detector; as longas (raramente repetidas) não ocupam o cache.
+    """
+    if len(message) <= _SHORT_MESSAGE_LEN:
+        return _normalize_short(message)
+    return message.lower().strip()
+
+
+def fold_accents(text: str) -> str:
+    """Remove os acentos de um texto já em minúsculas ("não" -> "nao", "preço" -> "preco")"""
+    # Texto ASCII (a maioria das mensagens) não tem o que trocar: isascii() é O(1)
+    # em str do CPython, enquanto translate() percorre e copia o texto inteiro
+    if text.isascii():
+        return text
+    return text.translate(_ACCENT_TABLE)
+
+
+def _unique_keywords(keywords: Iterable[str], accent_insensitive: bool) -> List[str]:
+    """Keywords sem repetição e sem vazias, opcionalmente já sem acentos"""
+    if accent_insensitive:
+        keywords = map(fold_accents, keywords)
+    return [keyword for keyword in dict.fromkeys(keywords) if keyword]
+
+
+def _contains_at_word_start(keyword: str, shorter: str) -> bool:
+    """True se `shorter` aparece em `keyword` no início dela ou logo após um caractere que não é de palavra"""
+    start = keyword.find(shorter)
+    while start != -1:
+        if start == 0 or not (keyword[start - 1].isalnum() or keyword[start - 1] == "_"):
+            return True
+        start = keyword.find(shorter, start + 1)
+    return False
+
+
+def _prune_redundant(keywords: List[str], word_start: bool = False) -> List[str]:
+    """
+    Remove keywords que contêm outra keyword da lista.
+    Para testar presença isso não muda nada: se "me sinto gorda" está no texto,
+    "me sinto" também está. Como efeito colateral, nenhuma keyword restante é
+    prefixo de outra. Com `word_start`, só conta a ocorrência em início de palavra.
+    """
+    by_length = sorted(keywords, key=len)
+    kept: List[str] = []
+    for keyword in by_length:
+        if word_start:
+            redundant = any(_contains_at_word_start(keyword, shorter) for shorter in kept)
+        else:
+            redundant = any(shorter in keyword for shorter in kept)
+        if not redundant:
+            kept.append(keyword)
+    return kept
+
+
+def _trie_pattern(keywords: List[str]) -> str:
+    """
+    Gera a alternância fatorada por prefixo comum (trie), ex: ["não sei", "não gosto"]
+    vira `não\\ (?:sei|gosto)`. O engine do `re` testa cada prefixo uma única vez por
+    posição em vez de recomeçar em cada alternativa.
+
+    Keyword que é prefixo de outra (só em `compile_tagged_keywords`, as demais listas
+    passam por _prune_redundant) vira sufixo opcional guloso: `pode(?:\ ser)?` casa
+    sempre a keyword mais longa possível na posição.
+    """
+    trie: Dict[str, dict] = {}
+    for keyword in keywords:
+        node = trie
+        for char in keyword:
+            node = node.setdefault(char, {})
+        node[""] = {}  # fim de keyword
+
+    def build(node: Dict[str, dict]) -> str:
+        alternatives = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not alternatives:
+            return ""
+        body = alternatives[0] if len(alternatives) == 1 else "(?:" + "|".join(alternatives) + ")"
+        if "" in node:
+            return "(?:" + body + ")?"
+        return body
+
+    return build(trie)
+
+
+def compile_keywords(
+    keywords: Iterable[str], word_start: bool = False, accent_insensitive: bool = False
+) -> Pattern[str]:
+    """
+    Compila uma lista de palavras-chave (substrings literais) em uma regex de alternância.
+
+    `pattern.search(texto)` é equivalente a `any(k in texto for k in keywords)`,
+    mas percorre o texto uma única vez no engine do `re` em vez de N buscas em Python.
+    Serve apenas para testar presença: keywords redundantes são descartadas, então o
+    trecho casado pode não ser a keyword original da lista.
+
+    Args:
+        keywords: Substrings literais (já em minúsculas, como nas listas originais)
+        word_start: Se True, a keyword só casa no início de uma palavra ("anual" não
+            casa em "manualmente", "dor" não casa em "adoro"); sufixos continuam
+            aceitos ("dor" casa em "dores")
+        accent_insensitive: Se True, as keywords são compiladas sem acentos e o texto
+            buscado deve passar antes por `fold_accents` ("nao sei" casa "não sei")
+
+    Returns:
+        Regex compilada (nunca casa se a lista estiver vazia)
+    """
+    unique = _unique_keywords(keywords, accent_insensitive)
+    if not unique:
+        return re.compile(r"(?!)")
+    pattern = _trie_pattern(_prune_redundant(unique, word_start))
+    if word_start:
+        pattern = r"(?<!\w)(?:" + pattern + ")"
+    return re.compile(pattern)
+
+
+# Letras do português da mais para a menos frequente; o que não está aqui
+# (acentos, dígitos, pontuação) conta como mais raro que qualquer letra
+_PT_FREQUENCY = " aeosrinmdutclpvghqbfzjxkwy"
+
+
+def _rarity(char: str) -> int:
+    index = _PT_FREQUENCY.find(char)
+    return len(_PT_FREQUENCY) if index == -1 else index
+
+
+def anchor_chars(
+    keywords: Iterable[str], word_start: bool = False, accent_insensitive: bool = False
+) -> FrozenSet[str]:
+    """
+    Pré-filtro barato para `compile_keywords`: um caractere (o mais raro) de cada keyword.
+
+    Para uma keyword estar no texto, todos os seus caracteres precisam estar lá; então
+    se o texto não contém nenhuma das âncoras, a regex não tem como casar e pode ser
+    pulada. `anchors.isdisjoint(texto)` é uma passada em C sobre o texto, bem mais
+    barata que a regex para as mensagens curtas ("oi", "sim", "kkk") que não casam nada.
+
+    Args:
+        keywords: As mesmas keywords passadas para `compile_keywords`
+        word_start: O mesmo valor passado para `compile_keywords`
+        accent_insensitive: O mesmo valor passado para `compile_keywords`
+
+    Returns:
+        Conjunto de âncoras (vazio se a lista estiver vazia)
+    """
+    unique = _unique_keywords(keywords, accent_insensitive)
+    return frozenset(max(keyword, key=_rarity) for keyword in _prune_redundant(unique, word_start))
+
+
+def compile_tagged_keywords(
+    buckets: Mapping[str, Iterable[str]], accent_insensitive: bool = False
+) -> Callable[[str], FrozenSet[str]]:
+    """
+    Compila vários buckets de keywords numa varredura única que devolve TODOS os buckets
+    presentes no texto (não só o primeiro), ex: {"interesse": [...], "objecao": [...]}.
+
+    A regex é um lookahead `(?=(trie))`, então `finditer` testa cada posição do texto e
+    casa a keyword mais longa que começa ali. Casar uma keyword K implica que toda keyword
+    contida em K também está no texto, por isso cada K carrega os buckets de todas as
+    keywords contidas nela: nenhuma ocorrência se perde por sobreposição.
+
+    Args:
+        buckets: Nome do bucket -> substrings literais (já em minúsculas)
+        accent_insensitive: Como em `compile_keywords` (o texto deve passar por `fold_accents`)
+
+    Returns:
+        Função `scan(texto) -> frozenset` com os nomes dos buckets encontrados
+    """
+    tags_by_keyword: Dict[str, Set[str]] = {}
+    for tag, keywords in buckets.items():
+        for keyword in _unique_keywords(keywords, accent_insensitive):
+            tags_by_keyword.setdefault(keyword, set()).add(tag)
+    if not tags_by_keyword:
+        return lambda text: frozenset()
+
+    tags_by_match = {
+        keyword: frozenset().union(*(tags for other, tags in tags_by_keyword.items() if other in keyword))
+        for keyword in tags_by_keyword
+    }
+    pattern = re.compile("(?=(" + _trie_pattern(list(tags_by_keyword)) + "))")
+
+    def scan(text: str) -> FrozenSet[str]:
+        found: Set[str] = set()
+        for match in pattern.finditer(text):
+            found |= tags_by_match[match.group(1)]
+        return frozenset(found)
+
+    return scan
@@ -4,14 +4,35 @@ import os
 import json
 import re
 import asyncio
-import traceback
+import logging
+from datetime import datetime, timedelta
 from typing import Dict, Any, Optional, Tuple
 
 from .multimedia_parser import parse_multimedia_reply, validate_actions
 from .assets_library import resolve_audio_url, resolve_image_url
 from .template_loader import load_template, get_audio_path, get_template_by_code
+from .content_detector import ContentClass, classify_response_content
+from .funnel_stage_manager import update_stage_from_event
+from .keyword_matcher import compile_keywords
+from ..models import Message, Thread
 from ..providers import twilio
 
+logger = logging.getLogger(__name__)
+
+
+# Marcadores da mensagem de planos (split em 4 mensagens / não mesclar)
+_PLANS_SPLIT_RE = compile_keywords([
+    "plano mensal", "plano anual", "r$69", "r$598", "12x de r$", "r$ 69", "r$ 598"
+])
+_PLANS_FINAL_QUESTION_RE = compile_keywords([
+    "qual plano faz mais sentido",
+    "agora me fala, gata",
+    "agora me fala"
+])
+_PLANS_MESSAGE_RE = compile_keywords([
+    "plano mensal", "plano anual", "r$69", "r$598", "12x de r$"
+])
+
 
 async def process_llm_response(
     reply: Any,
@@ -71,8 +92,6 @@ async def process_llm_response(
     # 🚨 VERIFICAÇÃO DE DUPLICAÇÃO ANTES DE PROCESSAR
     # Verifica se já enviou áudio 2 + imagens recentemente (últimas 30 minutos)
     if thread_id and db_session:
-        from datetime import datetime, timedelta
-        from ..models import Message
         
         recent_messages = (
             db_session.query(Message)
@@ -134,13 +153,12 @@ async def process_llm_response(
     
     # REGRA 2: Detecção por CONTEÚDO da resposta (não por intent do usuário)
     # A decisão NÃO DEPENDE DO USUÁRIO, e sim do CONTEÚDO da resposta gerada pelo LLM
-    from .content_detector import classify_response_content, is_checkout
     
     content_type = classify_response_content(reply_str)
-    print(f"[RESPONSE_PROCESSOR] 🎯 Conteúdo detectado: {content_type}")
+    print(f"[RESPONSE_PROCESSOR] 🎯 Conteúdo detectado: {content_type.value}")
     
     # REGRA 5: Se for checkout, NUNCA injeta áudio3
-    if content_type == "CHECKOUT":
+    if content_type is ContentClass.CHECKOUT:
         print(f"[RESPONSE_PROCESSOR] ⚠️ Conteúdo é CHECKOUT - NÃO injeta áudio3 (REGRA 5)")
     else:
         # REGRA 2: Injeta áudio3 se for explicação de planos (por conteúdo, não intent)
@@ -166,7 +184,7 @@ async def process_llm_response(
         print(f"[RESPONSE_PROCESSOR] 📝 Resposta original (primeiros 500 chars): {reply_str[:500]}")
         # Fallback: envia como texto simples
         try:
-            sid = await asyncio.to_thread(twilio.send_text, phone_number, reply_str, "BOT")
+            sid = await twilio.send_text_async(phone_number, reply_str, "BOT")
             if not sid:
                 print(f"[RESPONSE_PROCESSOR] ⚠️ Twilio não configurado. Fallback não enviado.")
             return reply_str, metadata
@@ -188,7 +206,7 @@ async def process_llm_response(
                     audio_url = resolve_audio_url(audio_id)
                     if audio_url:
                         try:
-                            sid = await asyncio.to_thread(twilio.send_audio, phone_number, audio_url, "BOT")
+                            sid = await twilio.send_audio_async(phone_number, audio_url, "BOT")
                             if sid:
                                 print(f"[RESPONSE_PROCESSOR] ✅ Áudio enviado: {audio_id}")
                                 # NÃO adiciona ao final_message_parts - comando é processado, não aparece no texto
@@ -208,7 +226,7 @@ async def process_llm_response(
                     image_url = resolve_image_url(image_id)
                     if image_url:
                         try:
-                            sid = await asyncio.to_thread(twilio.send_image, phone_number, image_url, "BOT")
+                            sid = await twilio.send_image_async(phone_number, image_url, "BOT")
                             if sid:
                                 print(f"[RESPONSE_PROCESSOR] ✅ Imagem enviada: {image_id}")
                                 # NÃO adiciona ao final_message_parts - comando é processado, não aparece no texto
@@ -226,7 +244,7 @@ async def process_llm_response(
                 message = action.get("message", "").strip()
                 if message:
                     try:
-                        sid = await asyncio.to_thread(twilio.send_text, phone_number, message, "BOT")
+                        sid = await twilio.send_text_async(phone_number, message, "BOT")
                         if sid:
                             print(f"[RESPONSE_PROCESSOR] ✅ Texto enviado: {len(message)} chars")
                         else:
@@ -258,8 +276,7 @@ async def process_llm_response(
                     await asyncio.sleep(2.0)  # 2.0 segundos entre textos
                 
         except Exception as e:
-            print(f"[RESPONSE_PROCESSOR] ❌ Erro ao processar ação {i+1} ({action_type}): {e}")
-            print(f"[RESPONSE_PROCESSOR] Traceback: {traceback.format_exc()}")
+            logger.exception("[RESPONSE_PROCESSOR] ❌ Erro ao processar ação %d (%s): %s", i + 1, action_type, e)
             final_message_parts.append(f"[Erro ao processar {action_type}]")
     
     # Monta mensagem final para salvar no banco
@@ -276,7 +293,7 @@ def _inject_audio3_if_plans_detected_by_content(
     reply_str: str,
     thread_id: Optional[int],
     db_session,
-    content_type: str
+    content_type: ContentClass
 ) -> list:
     """
     REGRA 2: Injeta áudio3 automaticamente baseado no CONTEÚDO da resposta (não intent do usuário).
@@ -286,15 +303,15 @@ def _inject_audio3_if_plans_detected_by_content(
     REGRA 3: Verifica flags de estado para evitar duplicação.
     REGRA 5: NUNCA injeta se for checkout.
     """
-    from .content_detector import is_plan_explanation, is_checkout
     
     # REGRA 5: Se for checkout, NUNCA injeta áudio3
-    if is_checkout(reply_str):
+    # (content_type já é a classificação de reply_str: não varre o texto de novo)
+    if content_type is ContentClass.CHECKOUT:
         print(f"[POST_PROCESSOR] ⚠️ Conteúdo é CHECKOUT - NÃO injeta áudio3 (REGRA 5)")
         return actions
     
     # REGRA 2: Só injeta se o CONTEÚDO da resposta contém explicação de planos
-    if not is_plan_explanation(reply_str):
+    if content_type is not ContentClass.PLAN_EXPLANATION:
         print(f"[POST_PROCESSOR] ⚠️ Conteúdo NÃO contém explicação de planos - NÃO injeta áudio3")
         return actions
     
@@ -314,7 +331,6 @@ def _inject_audio3_if_plans_detected_by_content(
     plans_already_explained = False
     if thread_id and db_session:
         try:
-            from ..models import Thread
             thread = db_session.get(Thread, thread_id)
             if thread:
                 meta = thread.meta or {}
@@ -343,8 +359,6 @@ def _inject_audio3_if_plans_detected_by_content(
     # REGRA 3: Marca que planos foram explicados (flags de estado)
     if thread_id and db_session:
         try:
-            from ..models import Thread
-            from datetime import datetime
             thread = db_session.get(Thread, thread_id)
             if thread:
                 meta = thread.meta or {}
@@ -385,14 +399,8 @@ def _split_plans_message(actions: list) -> list:
         message_lower = message.lower()
         
         # Detecta se contém planos
-        has_plans = any(keyword in message_lower for keyword in [
-            "plano mensal", "plano anual", "r$69", "r$598", "12x de r$", "r$ 69", "r$ 598"
-        ])
-        has_final_question = any(phrase in message_lower for phrase in [
-            "qual plano faz mais sentido",
-            "agora me fala, gata",
-            "agora me fala"
-        ])
+        has_plans = bool(_PLANS_SPLIT_RE.search(message_lower))
+        has_final_question = bool(_PLANS_FINAL_QUESTION_RE.search(message_lower))
         
         print(f"[PLANS_SPLIT] 🔍 Analisando mensagem: has_plans={has_plans}, has_final_question={has_final_question}")
         if has_plans:
@@ -535,9 +543,7 @@ def _merge_sequential_texts(actions: list) -> list:
         
         # Verifica se é mensagem de planos (não mescla mensagens de planos)
         current_text = current.get("message", "").lower()
-        is_plans_message = any(keyword in current_text for keyword in [
-            "plano mensal", "plano anual", "r$69", "r$598", "12x de r$"
-        ])
+        is_plans_message = bool(_PLANS_MESSAGE_RE.search(current_text))
         
         if is_plans_message:
             # Mensagem de planos: NÃO mescla, mantém separada
@@ -558,9 +564,7 @@ def _merge_sequential_texts(actions: list) -> list:
                 break  # Para de mesclar se tiver marcador
             
             # Verifica se é mensagem de planos (não mescla com planos)
-            is_next_plans = any(keyword in next_text_lower for keyword in [
-                "plano mensal", "plano anual", "r$69", "r$598", "12x de r$"
-            ])
+            is_next_plans = bool(_PLANS_MESSAGE_RE.search(next_text_lower))
             if is_next_plans:
                 break  # Para de mesclar se próxima for planos
             
@@ -589,7 +593,6 @@ def _update_thread_stage(thread_id: Optional[int], next_stage: str, db_session):
         return
     
     try:
-        from ..models import Thread
         thread = db_session.get(Thread, thread_id)
         if thread:
             current_meta = {}
@@ -620,8 +623,6 @@ def _detect_and_update_stage(actions: list, thread_id: Optional[int], db_session
         return
     
     try:
-        from ..models import Thread
-        from .funnel_stage_manager import update_stage_from_event
         
         thread = db_session.get(Thread, thread_id)
         if not thread:
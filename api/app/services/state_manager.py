@@ -4,6 +4,8 @@ Gerenciador de Máquina de Estados - Implementa toda a lógica de transição
 """
 import time
 import json
+import asyncio
+import logging
 from typing import Optional, Dict, Any, Tuple, List
 from datetime import datetime, timedelta
 
@@ -15,8 +17,22 @@ from .state_machine import (
 )
 from .funnel_packages import execute_pacote_fase_2, execute_pacote_fase_3
 from .assets_library import resolve_audio_url, resolve_image_url
+from .post_purchase import send_post_purchase_message
+from .keyword_matcher import compile_tagged_keywords
 from ..providers import twilio as twilio_provider
 
+logger = logging.getLogger(__name__)
+
+# Dor -> keywords, na ordem de prioridade (se a mensagem cita mais de uma, vale a primeira)
+PAIN_POINT_KEYWORDS = {
+    PainPoint.EMAGRECIMENTO_SECAR: ("emagrecer", "secar", "perder peso", "gordura"),
+    PainPoint.GANHO_MASSA_BUMBUM: ("massa", "bumbum", "ganhar", "aumentar"),
+    PainPoint.POCHEte_FLACIDEZ_CELULITE: ("pochete", "flacidez", "celulite"),
+    PainPoint.ALIMENTACAO_RESULTADO_NAO_VEM: ("alimentação", "dieta", "resultado não vem"),
+    PainPoint.AUTOESTIMA_MOTIVACAO: ("autoestima", "motivação", "confiança"),
+}
+_scan_pain_points = compile_tagged_keywords(PAIN_POINT_KEYWORDS)
+
 
 class StateManager:
     """Gerenciador principal da máquina de estados"""
@@ -146,9 +162,7 @@ class StateManager:
             )
             return True, result
         except Exception as e:
-            print(f"[STATE_MANAGER] ❌ Erro ao executar {transition.action}: {e}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("[STATE_MANAGER] ❌ Erro ao executar %s: %s", transition.action, e)
             return False, None
     
     # ==================== HANDLERS DO FUNIL LONGO ====================
@@ -160,14 +174,13 @@ class StateManager:
         # Envia áudio1
         audio_url = resolve_audio_url("audio1_boas_vindas")
         if audio_url:
-            await twilio_provider.send_audio(phone_number, audio_url, "BOT")
+            await twilio_provider.send_audio_async(phone_number, audio_url, "BOT")
         
         # Aguarda um pouco
-        import asyncio
         await asyncio.sleep(1.0)
         
         # Envia pergunta
-        await twilio_provider.send_text(phone_number, MessageTemplates.L1_PERGUNTA_DOR, "BOT")
+        await twilio_provider.send_text_async(phone_number, MessageTemplates.L1_PERGUNTA_DOR, "BOT")
         
         self.update_state(
             current_flow=CurrentFlow.FUNIL_LONGO,
@@ -205,18 +218,11 @@ class StateManager:
     
     def _classify_pain(self, message: str) -> str:
         """Classifica a dor mencionada (simplificado por enquanto)"""
-        message_lower = message.lower()
-        
-        if any(word in message_lower for word in ["emagrecer", "secar", "perder peso", "gordura"]):
-            return PainPoint.EMAGRECIMENTO_SECAR
-        elif any(word in message_lower for word in ["massa", "bumbum", "ganhar", "aumentar"]):
-            return PainPoint.GANHO_MASSA_BUMBUM
-        elif any(word in message_lower for word in ["pochete", "flacidez", "celulite"]):
-            return PainPoint.POCHEte_FLACIDEZ_CELULITE
-        elif any(word in message_lower for word in ["alimentação", "dieta", "resultado não vem"]):
-            return PainPoint.ALIMENTACAO_RESULTADO_NAO_VEM
-        elif any(word in message_lower for word in ["autoestima", "motivação", "confiança"]):
-            return PainPoint.AUTOESTIMA_MOTIVACAO
+        hits = _scan_pain_points(message.lower())
+        if hits:
+            for pain_point in PAIN_POINT_KEYWORDS:
+                if pain_point in hits:
+                    return pain_point
         
         return PainPoint.NONE
     
@@ -229,7 +235,7 @@ class StateManager:
         # TODO: Usar LLM para quebrar objeção de forma personalizada
         response = "Entendo, gata. Mas dá pra resolver sim! Posso te explicar rapidinho os planos pra você ver o que encaixa melhor?"
         
-        await twilio_provider.send_text(phone_number, response, "BOT")
+        await twilio_provider.send_text_async(phone_number, response, "BOT")
         
         self.update_state(
             flow_step=FunilLongoStep.L4_PERGUNTA_PLANOS,
@@ -243,7 +249,7 @@ class StateManager:
         """L3_DECISAO_OBJECAO: Interesse direto"""
         phone_number = self.thread.external_user_phone
         
-        await twilio_provider.send_text(phone_number, MessageTemplates.L3_INTERESSE, "BOT")
+        await twilio_provider.send_text_async(phone_number, MessageTemplates.L3_INTERESSE, "BOT")
         
         self.update_state(
             flow_step=FunilLongoStep.L4_PERGUNTA_PLANOS,
@@ -257,7 +263,7 @@ class StateManager:
         """L4_PERGUNTA_PLANOS: Pergunta se quer saber dos planos"""
         phone_number = self.thread.external_user_phone
         
-        await twilio_provider.send_text(phone_number, MessageTemplates.L4_PERGUNTA, "BOT")
+        await twilio_provider.send_text_async(phone_number, MessageTemplates.L4_PERGUNTA, "BOT")
         
         self.update_timestamps(outbound=True)
         
@@ -270,7 +276,7 @@ class StateManager:
         # Valida e pede contexto mínimo
         response = "Tem mensal e anual! Mas antes, me conta rapidinho: teu foco é mais secar ou ganhar massa?"
         
-        await twilio_provider.send_text(phone_number, response, "BOT")
+        await twilio_provider.send_text_async(phone_number, response, "BOT")
         
         self.update_state(
             flow_step=FunilLongoStep.L4_PERGUNTA_PLANOS,
@@ -285,15 +291,18 @@ class StateManager:
         phone_number = self.thread.external_user_phone
         
         # Executa pacote fixo
-        await execute_pacote_fase_3(
+        _, pkg_metadata = await execute_pacote_fase_3(
             phone_number=phone_number,
             db_session=self.db_session,
             thread_id=self.thread.id
         )
         
+        # plans_already_explained/plans_sent_at vão no mesmo commit da etapa
         self.update_state(
             flow_step=FunilLongoStep.L6_ESCOLHA_PLANO,
-            lead_stage=LeadStage.QUENTE
+            lead_stage=LeadStage.QUENTE,
+            plans_already_explained=pkg_metadata["plans_already_explained"],
+            plans_sent_at=pkg_metadata["plans_sent_at"]
         )
         self.update_timestamps(outbound=True, offer=True)
         
@@ -311,7 +320,7 @@ Aqui tá o link do MENSAL pra você finalizar:
 
 Assim que finalizar, me avisa que já te envio todos os acessos... Fico te esperando aqui!! 🩷"""
         
-        await twilio_provider.send_text(phone_number, template, "BOT")
+        await twilio_provider.send_text_async(phone_number, template, "BOT")
         
         self.update_state(
             flow_step=FunilLongoStep.L7_AGUARDANDO_COMPRA,
@@ -336,7 +345,7 @@ _💳 Na hora da compra, basta antes ajustar o limite do cartão, lá no app do
 
 Assim que finalizar, me avisa que já te envio todos os acessos... Fico te esperando aqui!! 🩷"""
         
-        await twilio_provider.send_text(phone_number, template, "BOT")
+        await twilio_provider.send_text_async(phone_number, template, "BOT")
         
         self.update_state(
             flow_step=FunilLongoStep.L7_AGUARDANDO_COMPRA,
@@ -351,7 +360,7 @@ Assim que finalizar, me avisa que já te envio todos os acessos... Fico te esper
         """L7_AGUARDANDO_COMPRA: Lead confirma compra"""
         phone_number = self.thread.external_user_phone
         
-        await twilio_provider.send_text(phone_number, MessageTemplates.L7_CONFIRMA, "BOT")
+        await twilio_provider.send_text_async(phone_number, MessageTemplates.L7_CONFIRMA, "BOT")
         
         self.update_timestamps(outbound=True)
         
@@ -364,13 +373,13 @@ Assim que finalizar, me avisa que já te envio todos os acessos... Fico te esper
         # Envia áudio de resgate
         audio_url = resolve_audio_url("audio5_resgate_boleto")
         if audio_url:
-            await twilio_provider.send_audio(phone_number, audio_url, "BOT")
+            await twilio_provider.send_audio_async(phone_number, audio_url, "BOT")
         
         # Reenvia link
         plan_interest = self.meta.get("plan_interest", PlanInterest.UNKNOWN)
         link = MessageTemplates.LINK_ANUAL if plan_interest == PlanInterest.ANUAL else MessageTemplates.LINK_MENSAL
         
-        await twilio_provider.send_text(phone_number, f"Segue o link novamente: {link}", "BOT")
+        await twilio_provider.send_text_async(phone_number, f"Segue o link novamente: {link}", "BOT")
         
         self.update_timestamps(outbound=True)
         
@@ -378,14 +387,13 @@ Assim que finalizar, me avisa que já te envio todos os acessos... Fico te esper
     
     async def handle_l8_pendente(self, event_data: Dict = None) -> str:
         """L8_COMPRA_PENDENTE: Compra ficou pendente"""
-        import asyncio
         phone_number = self.thread.external_user_phone
         
         # CRÍTICO: Ordem garantida - áudio ANTES do texto
         # Envia áudio de resgate primeiro
         audio_url = resolve_audio_url("audio5_resgate_boleto")
         if audio_url:
-            await asyncio.to_thread(twilio_provider.send_audio, phone_number, audio_url, "BOT")
+            await twilio_provider.send_audio_async(phone_number, audio_url, "BOT")
             print(f"[L8_PENDENTE] ✅ [ORDEM 1/2] Áudio enviado: audio5_resgate_boleto")
             
             # Delay após áudio para garantir ordem de entrega
@@ -393,7 +401,7 @@ Assim que finalizar, me avisa que já te envio todos os acessos... Fico te esper
             print(f"[L8_PENDENTE] ⏳ Delay de 3.0s após áudio aplicado (GARANTIR ORDEM DE ENTREGA)")
         
         # Depois envia texto
-        await asyncio.to_thread(twilio_provider.send_text, phone_number, MessageTemplates.L8_PERGUNTA, "BOT")
+        await twilio_provider.send_text_async(phone_number, MessageTemplates.L8_PERGUNTA, "BOT")
         print(f"[L8_PENDENTE] ✅ [ORDEM 2/2] Texto enviado: {MessageTemplates.L8_PERGUNTA[:50]}...")
         
         self.update_state(
@@ -406,7 +414,6 @@ Assim que finalizar, me avisa que já te envio todos os acessos... Fico te esper
     
     async def handle_l9_pos_compra(self, event_data: Dict = None) -> str:
         """L9_POS_COMPRA: Webhook PAID - Envia mensagem pós-compra completa"""
-        from .post_purchase import send_post_purchase_message
         
         phone_number = self.thread.external_user_phone
         webhook_data = event_data.get("webhook_data", {})
@@ -445,7 +452,7 @@ Assim que finalizar, me avisa que já te envio todos os acessos... Fico te esper
         """Trata mensagem vazia ou sem sentido"""
         phone_number = self.thread.external_user_phone
         
-        await twilio_provider.send_text(phone_number, MessageTemplates.EMPTY_MESSAGE_RESPONSE, "BOT")
+        await twilio_provider.send_text_async(phone_number, MessageTemplates.EMPTY_MESSAGE_RESPONSE, "BOT")
         
         self.update_timestamps(outbound=True)
         
@@ -457,7 +464,7 @@ Assim que finalizar, me avisa que já te envio todos os acessos... Fico te esper
         phone_number = self.thread.external_user_phone
         
         response = "Claro! Qual sua dúvida específica sobre os planos?"
-        await twilio_provider.send_text(phone_number, response, "BOT")
+        await twilio_provider.send_text_async(phone_number, response, "BOT")
         
         self.update_timestamps(outbound=True)
         
@@ -467,13 +474,13 @@ Assim que finalizar, me avisa que já te envio todos os acessos... Fico te esper
         """L7_AGUARDANDO_COMPRA: Erro no pagamento"""
         phone_number = self.thread.external_user_phone
         
-        await twilio_provider.send_text(phone_number, MessageTemplates.L7_ERRO, "BOT")
+        await twilio_provider.send_text_async(phone_number, MessageTemplates.L7_ERRO, "BOT")
         
         # Reenvia link
         plan_interest = self.meta.get("plan_interest", PlanInterest.UNKNOWN)
         link = MessageTemplates.LINK_ANUAL if plan_interest == PlanInterest.ANUAL else MessageTemplates.LINK_MENSAL
         
-        await twilio_provider.send_text(phone_number, f"Segue o link novamente: {link}", "BOT")
+        await twilio_provider.send_text_async(phone_number, f"Segue o link novamente: {link}", "BOT")
         
         self.update_timestamps(outbound=True)
         
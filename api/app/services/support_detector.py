@@ -3,9 +3,11 @@
 import re
 from typing import Dict, Optional, Tuple
 
+from .keyword_matcher import compile_keywords, normalize_message
+
 
 # Palavras-chave que indicam suporte (não venda)
-SUPPORT_KEYWORDS = [
+SUPPORT_KEYWORDS = (
     # Problemas de acesso
     "não consigo acessar",
     "meu app não funciona",
@@ -59,7 +61,24 @@ SUPPORT_KEYWORDS = [
     "ajuda técnica",
     "problema",
     "dúvida técnica",
-]
+)
+
+
+# Padrões adicionais (variações que as palavras-chave não cobrem)
+SUPPORT_PATTERNS = (
+    r"não\s+(consigo|consegui|conseguir)\s+(acessar|entrar|abrir|usar)",
+    r"(app|plataforma|site)\s+(não|não\s+está|está\s+com)\s+(funcionando|abrindo|carregando)",
+    r"(quero|preciso|gostaria)\s+(cancelar|estornar|reembolso)",
+    r"(problema|erro|bug)\s+(com|no|na)\s+(app|plataforma|sistema)",
+    r"já\s+(sou|tenho)\s+(aluna|cliente|conta|assinante)",
+)
+
+# Palavras-chave e padrões numa única regex: uma passada pela mensagem em vez de
+# ~50 buscas `in` + 5 regex. O grupo que casou diz se foi keyword ou padrão (log)
+_SUPPORT_RE = re.compile(
+    "(?P<keyword>" + compile_keywords(SUPPORT_KEYWORDS).pattern + ")"
+    + "|(?P<pattern>" + "|".join(SUPPORT_PATTERNS) + ")"
+)
 
 
 def detect_support(message: str) -> Tuple[bool, Optional[str]]:
@@ -77,27 +96,14 @@ def detect_support(message: str) -> Tuple[bool, Optional[str]]:
     if not message or not message.strip():
         return False, None
     
-    message_lower = message.lower().strip()
-    
-    # Verifica cada palavra-chave
-    for keyword in SUPPORT_KEYWORDS:
-        if keyword in message_lower:
-            return True, f"Palavra-chave detectada: '{keyword}'"
+    message_lower = normalize_message(message)
     
-    # Padrões adicionais
-    patterns = [
-        r"não\s+(consigo|consegui|conseguir)\s+(acessar|entrar|abrir|usar)",
-        r"(app|plataforma|site)\s+(não|não\s+está|está\s+com)\s+(funcionando|abrindo|carregando)",
-        r"(quero|preciso|gostaria)\s+(cancelar|estornar|reembolso)",
-        r"(problema|erro|bug)\s+(com|no|na)\s+(app|plataforma|sistema)",
-        r"já\s+(sou|tenho)\s+(aluna|cliente|conta|assinante)",
-    ]
-    
-    for pattern in patterns:
-        if re.search(pattern, message_lower):
-            return True, f"Padrão detectado: {pattern}"
-    
-    return False, None
+    match = _SUPPORT_RE.search(message_lower)
+    if match is None:
+        return False, None
+    if match.lastgroup == "keyword":
+        return True, f"Palavra-chave detectada: '{match.group()}'"
+    return True, f"Padrão detectado: '{match.group()}'"
 
 
 def should_trigger_takeover(message: str, thread_meta: Optional[Dict] = None) -> Tuple[bool, Optional[str]]:
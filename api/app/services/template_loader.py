@@ -2,6 +2,7 @@
 """Carrega templates de texto do frontend/public/templates/ (ou frontend/public/images/templates/ para compatibilidade)"""
 import os
 import json
+from functools import lru_cache
 from pathlib import Path
 from typing import Optional, Dict, Any
 
@@ -23,6 +24,52 @@ FALLBACK_PATHS = [
 ]
 
 
+# Mapeamento de audio_id para arquivo (montado uma vez no import)
+AUDIO_MAP: Dict[str, str] = {
+    # Funil Longo - FASE 1 (Boas-vindas)
+    "audio1_boas_vindas": "/audios/funil-longo/01-boas-vindas-qualificacao.opus",
+    "life_funil_longo_01_boas_vindas_e_qualificacao_inicial": "/audios/funil-longo/01-boas-vindas-qualificacao.opus",
+    # Funil Longo - FASE 2 (Dores) - Temporário: todos usam o mesmo arquivo até ter os 5 específicos
+    "audio2_inconstancia": "/audios/funil-longo/02-dor-generica.opus",
+    "audio2_barriga_inchaco": "/audios/funil-longo/02-dor-generica.opus",
+    "audio2_rotina_corrida": "/audios/funil-longo/02-dor-generica.opus",
+    "audio2_resultado_avancado": "/audios/funil-longo/02-dor-generica.opus",
+    "audio2_compulsao_doces": "/audios/funil-longo/02-dor-generica.opus",
+    "life_funil_longo_02_dor_generica": "/audios/funil-longo/02-dor-generica.opus",
+    # Funil Longo - FASE 3 (Planos)
+    "audio3_explicacao_planos": "/audios/funil-longo/03-explicacao-planos.opus",
+    "life_funil_longo_03_explicacao_planos": "/audios/funil-longo/03-explicacao-planos.opus",
+    # Funil Longo - FASE 4 (Recuperação)
+    "audio4_recuperacao": "/audios/funil-longo/04-recuperacao-pos-nao-compra.opus",
+    "life_funil_longo_04_recuperacao_pos_nao_compra": "/audios/funil-longo/04-recuperacao-pos-nao-compra.opus",
+    # Mini Funil BF
+    "audio_bf_oferta": "/audios/mini-funil-bf/01-oferta-black-friday.opus",
+    "life_mini_funil_bf_01_oferta_black_friday": "/audios/mini-funil-bf/01-oferta-black-friday.opus",
+    "audio_bf_followup": "/audios/mini-funil-bf/02-followup-sem-resposta.opus",
+    "life_mini_funil_bf_02_followup_sem_resposta": "/audios/mini-funil-bf/02-followup-sem-resposta.opus",
+    # Recuperação 50%
+    "audio_recuperacao_50_1": "/audios/recuperacao-50/02-audio-followup.opus",
+    "life_recuperacao_50_02_audio_followup": "/audios/recuperacao-50/02-audio-followup.opus",
+    "audio_recuperacao_50_2": "/audios/recuperacao-50/03-audio-ultimo-chamado.opus",
+    "life_recuperacao_50_03_audio_ultimo_chamado": "/audios/recuperacao-50/03-audio-ultimo-chamado.opus",
+}
+
+# Mapeamento de código interno para arquivo de template
+TEMPLATE_MAP: Dict[str, str] = {
+    "life_funil_longo_plano_anual": "fechamento-anual.txt",
+    "life_funil_longo_plano_mensal": "fechamento-mensal.txt",
+    "life_funil_longo_planos": "planos-life.json",
+    "life_recuperacao_50_01_texto_oferta_50": "recuperacao-50-oferta.txt",
+    "life_pos_compra": "pos-compra-life.txt",
+    "planos_life": "planos-life.json",
+    "planos-life": "planos-life.json",  # Alias
+    "fechamento-anual": "fechamento-anual.txt",  # Alias
+    "fechamento-mensal": "fechamento-mensal.txt",  # Alias
+    "recuperacao-50-oferta": "recuperacao-50-oferta.txt",  # Alias
+    "pos-compra-life": "pos-compra-life.txt",  # Alias
+}
+
+
 def load_template(template_name: str) -> Optional[str]:
     """
     Carrega um template de texto.
@@ -95,6 +142,7 @@ Plano Anual – {anual.get('preco', 'R$598,80 (ou 12x de R$49,90)')}
     return None
 
 
+@lru_cache(maxsize=64)
 def get_audio_path(audio_id: str) -> Optional[str]:
     """
     Retorna o caminho do arquivo de áudio baseado no audio_id.
@@ -106,44 +154,15 @@ def get_audio_path(audio_id: str) -> Optional[str]:
         Caminho relativo do arquivo (ex: "/audios/funil-longo/01-boas-vindas-qualificacao.opus")
         ou None se não encontrado
     """
-    # Mapeamento de audio_id para arquivo
-    audio_map: Dict[str, str] = {
-        # Funil Longo - FASE 1 (Boas-vindas)
-        "audio1_boas_vindas": "/audios/funil-longo/01-boas-vindas-qualificacao.opus",
-        "life_funil_longo_01_boas_vindas_e_qualificacao_inicial": "/audios/funil-longo/01-boas-vindas-qualificacao.opus",
-        # Funil Longo - FASE 2 (Dores) - Temporário: todos usam o mesmo arquivo até ter os 5 específicos
-        "audio2_inconstancia": "/audios/funil-longo/02-dor-generica.opus",
-        "audio2_barriga_inchaco": "/audios/funil-longo/02-dor-generica.opus",
-        "audio2_rotina_corrida": "/audios/funil-longo/02-dor-generica.opus",
-        "audio2_resultado_avancado": "/audios/funil-longo/02-dor-generica.opus",
-        "audio2_compulsao_doces": "/audios/funil-longo/02-dor-generica.opus",
-        "life_funil_longo_02_dor_generica": "/audios/funil-longo/02-dor-generica.opus",
-        # Funil Longo - FASE 3 (Planos)
-        "audio3_explicacao_planos": "/audios/funil-longo/03-explicacao-planos.opus",
-        "life_funil_longo_03_explicacao_planos": "/audios/funil-longo/03-explicacao-planos.opus",
-        # Funil Longo - FASE 4 (Recuperação)
-        "audio4_recuperacao": "/audios/funil-longo/04-recuperacao-pos-nao-compra.opus",
-        "life_funil_longo_04_recuperacao_pos_nao_compra": "/audios/funil-longo/04-recuperacao-pos-nao-compra.opus",
-        # Mini Funil BF
-        "audio_bf_oferta": "/audios/mini-funil-bf/01-oferta-black-friday.opus",
-        "life_mini_funil_bf_01_oferta_black_friday": "/audios/mini-funil-bf/01-oferta-black-friday.opus",
-        "audio_bf_followup": "/audios/mini-funil-bf/02-followup-sem-resposta.opus",
-        "life_mini_funil_bf_02_followup_sem_resposta": "/audios/mini-funil-bf/02-followup-sem-resposta.opus",
-        # Recuperação 50%
-        "audio_recuperacao_50_1": "/audios/recuperacao-50/02-audio-followup.opus",
-        "life_recuperacao_50_02_audio_followup": "/audios/recuperacao-50/02-audio-followup.opus",
-        "audio_recuperacao_50_2": "/audios/recuperacao-50/03-audio-ultimo-chamado.opus",
-        "life_recuperacao_50_03_audio_ultimo_chamado": "/audios/recuperacao-50/03-audio-ultimo-chamado.opus",
-    }
-    
     # Se o audio_id já é um caminho, retorna direto
     if audio_id.startswith("/audios/"):
         return audio_id
     
     # Busca no mapa
-    return audio_map.get(audio_id)
+    return AUDIO_MAP.get(audio_id)
 
 
+@lru_cache(maxsize=64)
 def get_template_by_code(template_code: str) -> Optional[str]:
     """
     Carrega template por código interno.
@@ -154,23 +173,14 @@ def get_template_by_code(template_code: str) -> Optional[str]:
     Returns:
         Conteúdo do template ou None
     """
-    template_map: Dict[str, str] = {
-        "life_funil_longo_plano_anual": "fechamento-anual.txt",
-        "life_funil_longo_plano_mensal": "fechamento-mensal.txt",
-        "life_funil_longo_planos": "planos-life.json",
-        "life_recuperacao_50_01_texto_oferta_50": "recuperacao-50-oferta.txt",
-        "life_pos_compra": "pos-compra-life.txt",
-        "planos_life": "planos-life.json",
-        "planos-life": "planos-life.json",  # Alias
-        "fechamento-anual": "fechamento-anual.txt",  # Alias
-        "fechamento-mensal": "fechamento-mensal.txt",  # Alias
-        "recuperacao-50-oferta": "recuperacao-50-oferta.txt",  # Alias
-        "pos-compra-life": "pos-compra-life.txt",  # Alias
-    }
-    
-    filename = template_map.get(template_code)
+    filename = TEMPLATE_MAP.get(template_code)
     if filename:
         return load_template(filename)
     
     return None
 
+
+def clear_caches() -> None:
+    """Limpa os caches de caminhos de áudio e de templates (após editar arquivos em runtime)"""
+    get_audio_path.cache_clear()
+    get_template_by_code.cache_clear()